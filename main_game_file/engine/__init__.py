@@ -0,0 +1,37 @@
+# The checkers engine: rules, move generation, evaluation and search.
+# Nothing in this package imports pygame, so it runs without a display, e.g.
+# in worker processes and batch jobs; the game draws it with board.Board.
+#
+# The names below are imported from their modules on first use (PEP 562), so
+# that `python -m engine.<module>` does not import the module it runs a second
+# time through the package.
+
+import importlib
+
+_EXPORTS = {
+    'piece': ['Piece'],
+    'bitboard': ['BitBoard'],
+    'evaluation': ['Evaluation', 'DEFAULT_EVALUATION'],
+    'state': ['GameState', 'create_checkerboard_array', 'BOARD_SIZE', 'DIRECTIONS'],
+    'algorithm': ['DIFFICULTY_BUDGETS', 'MAX_SEARCH_DEPTH', 'SearchAborted', 'SearchControl', 'SearchStats',
+                  'minimax_alpha_beta', 'generate_best_move', 'iterative_deepening'],
+    'transposition': ['TranspositionTable'],
+    'move_ordering': ['MoveOrdering'],
+    'opening_book': ['OpeningBook', 'BOOK_MIN_LEVEL'],
+    'endgame_tables': ['EndgameTables'],
+    'game_record': ['GameRecord', 'GameRecordWriter', 'PdnWriter', 'read_records', 'read_pdn'],
+}
+_MODULES = {name: module for module, names in _EXPORTS.items() for name in names}
+__all__ = list(_MODULES)
+
+
+def __getattr__(name):
+    if name not in _MODULES:
+        raise AttributeError('module %r has no attribute %r' % (__name__, name))
+    value = getattr(importlib.import_module('.' + _MODULES[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,509 @@
+import time
+from .bitboard import BitBoard
+from .transposition import TranspositionTable, EXACT, LOWER_BOUND, UPPER_BOUND, NO_MOVE, decode_move
+from .move_ordering import MoveOrdering
+from .endgame_tables import EndgameTables, WIN_SCORE
+
+# Search budget for each difficulty level of the menu: (node limit, time limit in seconds).
+# The node limit sets the strength of a level, the time limit caps how long a move can take.
+# Every level searches serially: the parallel root search has not been measured faster than the
+# serial search yet (see engine/parallel_search.py).
+DIFFICULTY_BUDGETS = {
+    1: (200, 1.5),
+    2: (600, 1.5),
+    3: (1500, 1.5),
+    4: (4000, 1.5),
+    5: (10000, 1.5),
+    6: (25000, 2.0),
+    7: (60000, 3.0),
+    8: (150000, 4.5),
+    9: (400000, 6.0),
+}
+# Deepest iteration of iterative deepening, only reached in very simple positions
+MAX_SEARCH_DEPTH = 40
+# Nodes the quiescence search may add below each horizon node; 0 turns it off
+QUIESCENCE_NODE_LIMIT = 64
+# Exact results of positions with few pieces, or None if the tables were not built
+_endgame_tables = EndgameTables.default()
+# Scores beyond WIN_BOUND are known wins, and those below -WIN_BOUND known losses, less the plies to
+# the end of the game counted from the root of the search
+WIN_BOUND = WIN_SCORE - 1000
+
+
+def _to_table(score, ply):
+    # Known wins and losses are stored with the plies counted from the position, so that they hold
+    # wherever the position is reached again
+    if score > WIN_BOUND:
+        return score + ply
+    if score < -WIN_BOUND:
+        return score - ply
+    return score
+
+
+def _from_table(score, ply):
+    # A stored score counted from the root again, for a position ply plies deep
+    if score > WIN_BOUND:
+        return score - ply
+    if score < -WIN_BOUND:
+        return score + ply
+    return score
+
+
+class SearchAborted(Exception):
+    # Raised inside the search when its time or node budget runs out
+    pass
+
+
+class SearchControl:
+    """
+    Counts the nodes of a search and stops it when a time or node budget runs out.
+    :param time_limit: Seconds the search may run for, or None for no limit.
+    :param node_limit: Number of nodes the search may visit, or None for no limit.
+    """
+    # The clock is only read every CLOCK_INTERVAL nodes
+    CLOCK_INTERVAL = 512
+
+    def __init__(self, time_limit=None, node_limit=None):
+        self.stopped = False
+        self.reset(time_limit, node_limit)
+
+    def reset(self, time_limit=None, node_limit=None):
+        # Starts a new budget for another search; a stop() request stays in force
+        self.start_time = time.perf_counter()
+        self.deadline = self.start_time + time_limit if time_limit is not None else None
+        self.node_limit = node_limit
+        self.nodes = 0
+        self.enabled = True
+
+    def stop(self):
+        # Asks the search to abort at its next node; safe to call from another thread
+        self.stopped = True
+
+    def tick(self):
+        # Called once per node; raises SearchAborted when the budget is spent or stop() was called
+        self.nodes += 1
+        if self.stopped:
+            raise SearchAborted()
+        if not self.enabled:
+            return
+        if self.node_limit is not None and self.nodes > self.node_limit:
+            raise SearchAborted()
+        if self.deadline is not None and self.nodes % self.CLOCK_INTERVAL == 0 and time.perf_counter() >= self.deadline:
+            raise SearchAborted()
+
+    def elapsed(self):
+        return time.perf_counter() - self.start_time
+
+
+class SearchStats:
+    """
+    Statistics of a search, filled in when passed as `stats` to generate_best_move,
+    iterative_deepening or minimax_alpha_beta. Without one the search only pays
+    for an `is not None` check per node.
+    """
+
+    def __init__(self):
+        self.nodes = 0
+        self.leaf_evaluations = 0
+        self.quiescence_nodes = 0
+        self.endgame_hits = 0
+        self.table_cutoffs = 0
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.max_ply = 0
+        # (depth, seconds, nodes) of every finished iteration
+        self.depths = []
+        self.start_time = time.perf_counter()
+        self._iteration_start = (self.start_time, 0)
+
+    def finish_depth(self, depth):
+        # Records the time and nodes of the iteration that just finished at depth
+        now = time.perf_counter()
+        start, nodes = self._iteration_start
+        self.depths.append((depth, now - start, self.nodes - nodes))
+        self._iteration_start = (now, self.nodes)
+
+    def first_move_cutoff_rate(self):
+        # Share of the cutoffs caused by the first move searched; close to 1 means good move ordering
+        return self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0
+
+    def branching_factor(self):
+        # Effective branching factor: how much the last iteration grew over the one before it,
+        # or for a single fixed-depth search the depth-th root of its node count
+        if len(self.depths) >= 2 and self.depths[-2][2]:
+            return self.depths[-1][2] / self.depths[-2][2]
+        if self.depths:
+            depth, seconds, nodes = self.depths[-1]
+            return nodes ** (1 / depth)
+        return 0.0
+
+    def elapsed(self):
+        return time.perf_counter() - self.start_time
+
+    def add(self, other):
+        # Adds the counts of another search, e.g. of a root move searched in a worker process
+        self.nodes += other.nodes
+        self.leaf_evaluations += other.leaf_evaluations
+        self.quiescence_nodes += other.quiescence_nodes
+        self.endgame_hits += other.endgame_hits
+        self.table_cutoffs += other.table_cutoffs
+        self.cutoffs += other.cutoffs
+        self.first_move_cutoffs += other.first_move_cutoffs
+        self.max_ply = max(self.max_ply, other.max_ply)
+
+    def as_dict(self):
+        return {
+            'nodes': self.nodes,
+            'leaf_evaluations': self.leaf_evaluations,
+            'quiescence_nodes': self.quiescence_nodes,
+            'endgame_hits': self.endgame_hits,
+            'table_cutoffs': self.table_cutoffs,
+            'cutoffs': self.cutoffs,
+            'first_move_cutoff_rate': round(self.first_move_cutoff_rate(), 4),
+            'branching_factor': round(self.branching_factor(), 4),
+            'max_ply': self.max_ply,
+            'depths': [{'depth': depth, 'time': round(seconds, 6), 'nodes': nodes} for depth, seconds, nodes in self.depths],
+            'time': round(self.elapsed(), 6),
+        }
+
+    def summary(self):
+        # One line for logs
+        depth = self.depths[-1][0] if self.depths else 0
+        return ('depth %d (max ply %d), %d nodes in %.2f s (%d in quiescence), %d leaves, %d cutoffs (%.0f%% on the '
+                'first move), branching factor %.2f' % (depth, self.max_ply, self.nodes, self.elapsed(),
+                                                        self.quiescence_nodes, self.leaf_evaluations, self.cutoffs,
+                                                        100 * self.first_move_cutoff_rate(), self.branching_factor()))
+
+
+def minimax_alpha_beta(game_state, depth, alpha, beta, is_maximizing, table=None, control=None, ordering=None, ply=0, stats=None):
+    """
+    Implementation of the minimax algorithm with alpha-beta pruning for game AI.
+    :param game_state: Current state of the game, as a BitBoard or a GameState.
+    :param depth: The depth of the search tree.
+    :param alpha: The maximum lower bound of possible values.
+    :param beta: The minimum upper bound of possible values.
+    :param is_maximizing: Boolean indicating whether to maximize or minimize the evaluation score.
+    :param table: Optional TranspositionTable used to reuse results of positions already searched.
+    :param control: Optional SearchControl that counts nodes and raises SearchAborted when its budget runs out.
+    :param ordering: Optional MoveOrdering used to search the most promising moves first.
+    :param ply: Distance of game_state from the root of the search.
+    :param stats: Optional SearchStats to count the work of the search in.
+    :return: The evaluation score of the game state.
+    """
+    if not isinstance(game_state, BitBoard):
+        game_state = BitBoard.from_grid(game_state.board)
+    if control is not None:
+        control.tick()
+    if stats is not None:
+        stats.nodes += 1
+        if ply > stats.max_ply:
+            stats.max_ply = ply
+    # The position is searched in place with make_move/unmake_move, so the side
+    # to move always follows is_maximizing
+    game_state.set_player(1 if is_maximizing else -1)
+    if _endgame_tables is not None:
+        # Endgames with few pieces are looked up instead of searched
+        score = _endgame_tables.score(game_state, ply)
+        if score is not None:
+            if stats is not None:
+                stats.endgame_hits += 1
+            return score
+    if depth == 0:
+        if QUIESCENCE_NODE_LIMIT and game_state.has_captures():
+            # Stopping in the middle of an exchange would misjudge it
+            return quiescence(game_state, alpha, beta, is_maximizing, control, ply, stats, [QUIESCENCE_NODE_LIMIT])
+        if stats is not None:
+            stats.leaf_evaluations += 1
+        return game_state.evaluate()
+
+    original_alpha, original_beta = alpha, beta
+    tt_move_code = NO_MOVE
+    if table is not None:
+        entry = table.probe(game_state.hash)
+        if entry is not None:
+            tt_move_code = entry[3]
+            if entry[0] >= depth:
+                score, bound = _from_table(entry[1], ply), entry[2]
+                if bound == EXACT:
+                    if stats is not None:
+                        stats.table_cutoffs += 1
+                    return score
+                if bound == LOWER_BOUND:
+                    alpha = max(alpha, score)
+                else:
+                    beta = min(beta, score)
+                if beta <= alpha:
+                    if stats is not None:
+                        stats.table_cutoffs += 1
+                    return score
+
+    # The side to move has lost when it has no moves, no pieces included; it is scored like a loss
+    # in the endgame tables, ply plies from the root. Game over positions are never stored, so checking after the table
+    # probe changes nothing.
+    moves = game_state.legal_moves(1 if is_maximizing else -1)
+    if not moves:
+        if stats is not None:
+            stats.leaf_evaluations += 1
+        return -(WIN_SCORE - ply) * game_state.player
+    if ordering is not None:
+        ordering.order(game_state, moves, ply, decode_move(tt_move_code, moves))
+
+    best_move = None
+    if is_maximizing:
+        max_eval = float('-inf')
+        for move in moves:
+            undo = game_state.make_move(move)
+            eval = minimax_alpha_beta(game_state, depth - 1, alpha, beta, False, table, control, ordering, ply + 1, stats)
+            game_state.unmake_move(undo)
+            if eval > max_eval:
+                max_eval = eval
+                best_move = move
+            alpha = max(alpha, eval)
+            if beta <= alpha:
+                if ordering is not None:
+                    ordering.record_cutoff(game_state, move, ply, depth)
+                if stats is not None:
+                    stats.cutoffs += 1
+                    if move is moves[0]:
+                        stats.first_move_cutoffs += 1
+                break
+        best_eval = max_eval
+    else:
+        min_eval = float('inf')
+        for move in moves:
+            undo = game_state.make_move(move)
+            eval = minimax_alpha_beta(game_state, depth - 1, alpha, beta, True, table, control, ordering, ply + 1, stats)
+            game_state.unmake_move(undo)
+            if eval < min_eval:
+                min_eval = eval
+                best_move = move
+            beta = min(beta, eval)
+            if beta <= alpha:
+                if ordering is not None:
+                    ordering.record_cutoff(game_state, move, ply, depth)
+                if stats is not None:
+                    stats.cutoffs += 1
+                    if move is moves[0]:
+                        stats.first_move_cutoffs += 1
+                break
+        best_eval = min_eval
+
+    if table is not None:
+        if best_eval <= original_alpha:
+            bound = UPPER_BOUND
+        elif best_eval >= original_beta:
+            bound = LOWER_BOUND
+        else:
+            bound = EXACT
+        table.store(game_state.hash, depth, _to_table(best_eval, ply), bound, best_move)
+    return best_eval
+
+def quiescence(game_state, alpha, beta, is_maximizing, control=None, ply=0, stats=None, budget=None):
+    """
+    Searches the captures below a horizon node until the position is quiet.
+    Captures are compulsory, so a side that can jump has no quiet score to stand on: every jump is
+    searched, and only a position without captures is evaluated. Quiescence nodes are not stored in
+    the transposition table.
+    :param game_state: The BitBoard at the horizon, already counted as a node by the caller.
+    :param alpha: The maximum lower bound of possible values.
+    :param beta: The minimum upper bound of possible values.
+    :param is_maximizing: Boolean indicating whether the side to move is maximizing.
+    :param control: Optional SearchControl, which counts the quiescence nodes too.
+    :param ply: Distance of game_state from the root of the search.
+    :param stats: Optional SearchStats.
+    :param budget: One-element list with the number of quiescence nodes left; once they are used up,
+        positions are evaluated as they stand.
+    :return: The evaluation score of the game state.
+    """
+    if budget is None:
+        budget = [QUIESCENCE_NODE_LIMIT]
+    moves = game_state.legal_moves()
+    if not moves:
+        # The side to move has lost
+        if stats is not None:
+            stats.leaf_evaluations += 1
+        return -(WIN_SCORE - ply) * game_state.player
+    if not moves[0][2] or budget[0] <= 0:
+        # Quiet, or out of budget
+        if stats is not None:
+            stats.leaf_evaluations += 1
+        return game_state.evaluate()
+
+    best_eval = float('-inf') if is_maximizing else float('inf')
+    for move in moves:
+        budget[0] -= 1
+        if control is not None:
+            control.tick()
+        undo = game_state.make_move(move)
+        if stats is not None:
+            stats.nodes += 1
+            stats.quiescence_nodes += 1
+            if ply + 1 > stats.max_ply:
+                stats.max_ply = ply + 1
+        eval = _endgame_tables.score(game_state, ply + 1) if _endgame_tables is not None else None
+        if eval is None:
+            eval = quiescence(game_state, alpha, beta, not is_maximizing, control, ply + 1, stats, budget)
+        elif stats is not None:
+            stats.endgame_hits += 1
+        game_state.unmake_move(undo)
+        if is_maximizing:
+            best_eval = max(best_eval, eval)
+            alpha = max(alpha, eval)
+        else:
+            best_eval = min(best_eval, eval)
+            beta = min(beta, eval)
+        if beta <= alpha:
+            break
+    return best_eval
+
+def search_root(position, depth, table=None, control=None, first_move=None, ordering=None, stats=None):
+    """
+    Scores every legal move of the side to move in position to the given depth.
+    Each root move is searched with the best score so far as its bound, which can
+    only rule out moves that would not have been chosen anyway.
+    :param position: The BitBoard to search. It is searched in place and restored afterwards.
+    :param depth: The depth of the search tree.
+    :param table: Optional TranspositionTable.
+    :param control: Optional SearchControl; SearchAborted propagates to the caller.
+    :param first_move: Optional move to search first, e.g. the best move of a shallower search.
+    :param ordering: Optional MoveOrdering for the moves below the root. The root moves keep their
+        generation order so that ties are always broken the same way.
+    :param stats: Optional SearchStats.
+    :return: A (best score, best bitboard move) tuple; the move is None if there are no legal moves.
+    """
+    if stats is not None:
+        stats.nodes += 1
+    player = position.player
+    best_score = float('-inf') if player == 1 else float('inf')
+    best_move = None
+
+    moves = position.legal_moves(player)
+    if first_move in moves:
+        moves.remove(first_move)
+        moves.insert(0, first_move)
+    for move in moves:
+        undo = position.make_move(move)
+        if player == 1:
+            score = minimax_alpha_beta(position, depth - 1, best_score, float('inf'), False, table, control, ordering, 1, stats)
+        else:
+            score = minimax_alpha_beta(position, depth - 1, float('-inf'), best_score, True, table, control, ordering, 1, stats)
+        position.unmake_move(undo)
+
+        if player == 1 and score > best_score:
+            best_score = score
+            best_move = move
+        elif player == -1 and score < best_score:
+            best_score = score
+            best_move = move
+
+    if best_move is not None and table is not None:
+        table.store(position.hash, depth, best_score, EXACT, best_move)
+    return best_score, best_move
+
+def _search_position(board, player, evaluation=None):
+    # The BitBoard to search for a GameState or BitBoard, with player (default: the side to move) to move,
+    # scored with evaluation (default: that of a BitBoard, or DEFAULT_EVALUATION for a GameState)
+    if isinstance(board, BitBoard):
+        position = board.copy() if evaluation is None else BitBoard(*board.key(), evaluation=evaluation)
+        if player is not None:
+            position.set_player(player)
+        return position
+    return BitBoard.from_grid(board.board, board.current_player if player is None else player, evaluation)
+
+def generate_best_move(board, depth: int, player=None, table=None, control=None, stats=None, workers=None,
+                       evaluation=None):
+    """
+    Generates the best move for the given player at the given depth using the minimax algorithm.
+    The search makes and unmakes moves on a BitBoard copy of the position, so the GameState itself is never modified.
+    :param board: Current state of the game board.
+    :param depth: The depth of the search tree.
+    :param player: The player for whom the best move is to be generated.
+    :param table: Optional TranspositionTable, kept between calls to reuse earlier searches.
+    :param control: Optional SearchControl, e.g. to count the nodes searched.
+    :param stats: Optional SearchStats, filled in with the statistics of the search.
+    :param workers: Optional number of worker processes to spread the root moves over (see
+        engine/parallel_search.py).
+    :param evaluation: Optional Evaluation to score the positions with, by default that of board if it is
+        a BitBoard, or else DEFAULT_EVALUATION. A table shared between searches should only be used with one.
+    :return: The best move as a bitboard (from_sq, to_sq, captured_mask) tuple, or None if there are no
+        legal moves. BitBoard.move_to_rc turns it into the move tuple GameState plays, path included.
+    """
+    position = _search_position(board, player, evaluation)
+    if table is not None:
+        table.new_search()
+    if workers:
+        # Imported here: the parallel search is built on this module
+        from .parallel_search import parallel_search_root
+        best_score, best_move = parallel_search_root(workers, position, depth, table, control, stats=stats)
+    else:
+        best_score, best_move = search_root(position, depth, table, control, ordering=MoveOrdering(), stats=stats)
+    if stats is not None:
+        stats.finish_depth(depth)
+    return best_move
+
+def iterative_deepening(board, player=None, table=None, time_limit=None, node_limit=None, max_depth=MAX_SEARCH_DEPTH, control=None, callback=None, stats=None, workers=None,
+                        evaluation=None):
+    """
+    Searches to depth 1, 2, 3, ... until the time or node budget runs out and returns the
+    best move of the deepest search that finished. The depth 1 search always finishes
+    unless the search is stopped.
+    :param board: Current state of the game board, as a GameState or a BitBoard.
+    :param player: The player for whom the best move is to be generated.
+    :param table: Optional TranspositionTable, kept between calls to reuse earlier searches.
+    :param time_limit: Seconds the search may take, or None.
+    :param node_limit: Number of nodes the search may visit, or None.
+    :param max_depth: Deepest iteration to run.
+    :param control: Optional SearchControl to use instead of one built from time_limit and node_limit,
+        e.g. to stop the search from another thread.
+    :param callback: Optional function called after every finished iteration with
+        (depth, score, best move, nodes searched so far).
+    :param stats: Optional SearchStats, filled in with the statistics of the search and of every iteration.
+    :param workers: Optional number of worker processes to spread the root moves of every iteration over
+        (see engine/parallel_search.py).
+    :param evaluation: Optional Evaluation to score the positions with, as for generate_best_move.
+    :return: A (best move, depth completed) tuple; the move is None if there are no legal moves. Moves are
+        bitboard (from_sq, to_sq, captured_mask) tuples, so a capture sequence is the exact one searched.
+    """
+    position = _search_position(board, player, evaluation)
+    player = position.player
+    if table is not None:
+        table.new_search()
+    if control is None:
+        control = SearchControl(time_limit, node_limit)
+
+    moves = position.legal_moves(player)
+    if not moves:
+        return None, 0
+    if len(moves) == 1:
+        # A forced move needs no search
+        return moves[0], 0
+
+    # Killer and history tables carry over from one iteration to the next, in the workers too
+    ordering = MoveOrdering()
+    if workers:
+        from .parallel_search import parallel_search_root, new_search_id
+        search_id = new_search_id()
+    best_move = None
+    completed_depth = 0
+    for depth in range(1, max_depth + 1):
+        # Depth 1 runs without limits so there is always a move to play
+        control.enabled = depth > 1
+        try:
+            if workers:
+                score, move = parallel_search_root(workers, position, depth, table, control, best_move, stats,
+                                                   search_id)
+            else:
+                score, move = search_root(position, depth, table, control, best_move, ordering, stats)
+        except SearchAborted:
+            break
+        best_move, completed_depth = move, depth
+        if stats is not None:
+            stats.finish_depth(depth)
+        if callback is not None:
+            callback(depth, score, move, control.nodes)
+        if control.deadline is not None and time.perf_counter() >= control.deadline:
+            break
+    if best_move is None:
+        # Stopped before the first iteration finished
+        return None, 0
+    return best_move, completed_depth
@@ -0,0 +1,302 @@
+# Self-play arena: plays engine-against-engine matches without a display and
+# rates the players from the results.
+#
+#   python -m engine.arena --players 1 3 5 9 --openings 20 --workers 4
+#   python -m engine.arena --players 5 /path/to/old/main_game_file/engine:5
+#   python -m engine.arena --players 3 5 --record games.ckgr
+#
+# (from the main_game_file directory). A player is a difficulty level of this
+# engine, or `<engine directory>:<level>` for the engine package of another
+# checkout. Every pair of players meets over a number of randomized openings,
+# each played twice with the colours swapped. Players search with the node
+# budget of their level but without its time limit, so results do not depend
+# on how busy the machine is. Games run in parallel over a process pool, and
+# can be recorded to a game archive (see game_record.py).
+
+import argparse
+import importlib.util
+import json
+import math
+import multiprocessing
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+from .bitboard import BitBoard
+from .endgame_tables import EndgameTables, WIN, LOSS
+from .game_record import GameRecord, GameRecordWriter, encode_record
+
+# Plies after which an unfinished game is adjudicated a draw
+MAX_PLIES = 200
+# Random plies played from the start position to vary the openings
+OPENING_PLIES = 4
+# z value of the error bars: 1.96 for a 95% confidence interval
+CONFIDENCE_Z = 1.96
+
+# Engines loaded by this process, by directory (None for this package)
+_engines = {}
+
+
+def _engine(path):
+    # The engine package at path, imported under its own name so that several versions can be loaded at once
+    if path not in _engines:
+        if path is None:
+            _engines[path] = sys.modules[__package__]
+        else:
+            name = '_arena_engine_%d' % len(_engines)
+            spec = importlib.util.spec_from_file_location(name, os.path.join(path, '__init__.py'),
+                                                          submodule_search_locations=[path])
+            module = importlib.util.module_from_spec(spec)
+            sys.modules[name] = module
+            spec.loader.exec_module(module)
+            _engines[path] = module
+    return _engines[path]
+
+
+def parse_player(text):
+    # A player given as `<level>` or `<engine directory>:<level>`, as a (path, level) tuple
+    path, _, level = text.rpartition(':')
+    return (os.path.abspath(path) if path else None), int(level)
+
+
+def player_name(player):
+    path, level = player
+    return 'level %d' % level if path is None else '%s:%d' % (path, level)
+
+
+def node_limit(player):
+    # The node budget of a player's level
+    path, level = player
+    return _engine(path).DIFFICULTY_BUDGETS[level][0]
+
+
+class ArenaPlayer:
+    """
+    One side of a game: an engine searching with the node budget of a difficulty level.
+    It keeps a transposition table for the whole game, like the AI of the game does.
+    :param player: A (engine directory or None, level) tuple.
+    """
+
+    def __init__(self, player):
+        self.engine = _engine(player[0])
+        self.node_limit = node_limit(player)
+        self.table = self.engine.TranspositionTable()
+        # Engines from before the book was limited to some levels use it at every level
+        book_min_level = getattr(self.engine, 'BOOK_MIN_LEVEL', 0)
+        self.book = self.engine.OpeningBook.default() if player[1] >= book_min_level else None
+
+    def move(self, position):
+        # The move to play in position (a BitBoard of this package), as a move of its legal_moves, or None
+        own = self.engine.BitBoard(position.red_men, position.red_kings, position.white_men,
+                                   position.white_kings, position.player)
+        move = self.book.lookup(own) if self.book is not None else None
+        if move is None:
+            move, depth = self.engine.iterative_deepening(own, table=self.table, node_limit=self.node_limit)
+        if move is None:
+            return None
+        if len(move) == 4:
+            # Engines from before the search returned BitBoard moves give (start_row, start_col, end_row,
+            # end_col); of the capture sequences between the same squares, the first one is played
+            move = next((candidate for candidate in position.legal_moves()
+                         if position.move_to_rc(candidate)[:4] == tuple(move)), None)
+        return tuple(move)
+
+
+def _adjudicate(position):
+    """
+    The result of a finished game, or None while it goes on.
+    :return: 1 if red won, -1 if white won, 0 for a draw.
+    """
+    if not position.has_moves():
+        # No pieces or no moves left: the side to move loses
+        return -position.player
+    if position.count(1) == 1 and position.count(-1) == 1:
+        # Like GameState.check_winner
+        return 0
+    tables = EndgameTables.default()
+    if tables is not None:
+        entry = tables.probe(position)
+        if entry is not None:
+            result = entry[0]
+            return result * position.player if result in (WIN, LOSS) else 0
+    return None
+
+
+def random_opening(seed, plies=OPENING_PLIES, record=None):
+    # The start position after plies random moves, chosen by seed. The moves are added to record, if given
+    rng = random.Random(seed)
+    position = BitBoard.initial()
+    for _ in range(plies):
+        moves = position.legal_moves()
+        if not moves:
+            break
+        move = rng.choice(moves)
+        position.make_move(move)
+        if record is not None:
+            record.add(move)
+    return position
+
+
+def play_game(red, white, opening_seed, opening_plies=OPENING_PLIES, max_plies=MAX_PLIES, record=None):
+    """
+    Plays one game.
+    :param red: The player of red (player 1), as a (engine directory or None, level) tuple.
+    :param white: The player of white (player -1).
+    :param opening_seed: Seed of the random opening.
+    :param opening_plies: Number of random plies of the opening.
+    :param max_plies: Plies after which the game is adjudicated a draw.
+    :param record: Optional GameRecord that gets the moves, with the time of each, and the result.
+    :return: A (result, plies) tuple; result is 1 if red won, -1 if white won and 0 for a draw.
+    """
+    position = random_opening(opening_seed, opening_plies, record)
+    players = {1: ArenaPlayer(red), -1: ArenaPlayer(white)}
+    result, plies = None, max_plies
+    for ply in range(max_plies):
+        result = _adjudicate(position)
+        if result is not None:
+            plies = ply
+            break
+        start = time.perf_counter()
+        move = players[position.player].move(position)
+        position.make_move(move)
+        if record is not None:
+            record.add(move, int((time.perf_counter() - start) * 1000))
+    else:
+        result = _adjudicate(position)
+    result = result if result is not None else 0
+    if record is not None:
+        record.result = result
+    return result, plies
+
+
+def _play_pairing(task):
+    first, second, seed, opening_plies, max_plies, recording = task
+    # Score of the first player, after playing both colours of the same opening, and the encoded game records
+    scores = []
+    records = []
+    for red, white, sign in ((first, second, 1), (second, first, -1)):
+        record = GameRecord(tags={'Event': 'arena', 'Black': player_name(red), 'White': player_name(white),
+                                  'Opening': '%d plies, seed %d' % (opening_plies, seed),
+                                  'BlackNodeLimit': str(node_limit(red)),
+                                  'WhiteNodeLimit': str(node_limit(white))}) if recording else None
+        result, plies = play_game(red, white, seed, opening_plies, max_plies, record)
+        scores.append((result * sign + 1) / 2)
+        if record is not None:
+            records.append(encode_record(record))
+    return first, second, scores, records
+
+
+def elo(score):
+    # Elo difference that gives an expected score of score
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400 * math.log10(1 / score - 1) + 0.0
+
+
+def elo_estimate(scores):
+    """
+    Elo difference of a player over an opponent from its game scores (1, 0.5 or 0 per game).
+    :return: (Elo difference, error) where the error is the half-width of the confidence interval.
+    """
+    n = len(scores)
+    mean = sum(scores) / n
+    deviation = math.sqrt(sum((score - mean) ** 2 for score in scores) / n)
+    margin = CONFIDENCE_Z * deviation / math.sqrt(n)
+    low, high = elo(mean - margin), elo(mean + margin)
+    return elo(mean), (high - low) / 2
+
+
+def ratings(players, results, iterations=200):
+    """
+    Ratings of all players from every game they played, anchored at 0 for the first player
+    (a Bradley-Terry fit where a draw counts as half a win for each side).
+    :param results: Dict of (player, opponent) -> list of the player's scores against that opponent.
+    :return: Dict of player -> rating.
+    """
+    strength = {player: 1.0 for player in players}
+    for _ in range(iterations):
+        for player in players:
+            won = sum(sum(scores) for (a, b), scores in results.items() if a == player)
+            expected = sum(len(scores) / (strength[player] + strength[b])
+                           for (a, b), scores in results.items() if a == player)
+            if expected:
+                strength[player] = max(won, 0.5) / expected
+    anchor = strength[players[0]]
+    return {player: 400 * math.log10(strength[player] / anchor) for player in players}
+
+
+def run_arena(players, openings=10, workers=None, opening_plies=OPENING_PLIES, max_plies=MAX_PLIES, seed=1,
+              record_path=None):
+    """
+    Plays every pair of players against each other.
+    :param players: List of (engine directory or None, level) tuples.
+    :param openings: Random openings per pair; each is played with both colours.
+    :param workers: Number of worker processes, by default one per CPU.
+    :param record_path: Optional game archive every game is added to as it finishes.
+    :return: Dict of (player, opponent) -> list of the player's scores, 1 for a win, 0.5 for a draw and 0 for a loss.
+    """
+    tasks = [(first, second, seed * 100003 + index, opening_plies, max_plies, record_path is not None)
+             for first, second in combinations(players, 2) for index in range(openings)]
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+    results = {}
+    writer = GameRecordWriter(record_path, append=True) if record_path is not None else None
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            for first, second, scores, records in pool.map(_play_pairing, tasks):
+                results.setdefault((first, second), []).extend(scores)
+                results.setdefault((second, first), []).extend(1 - score for score in scores)
+                for data in records:
+                    writer.write_encoded(data)
+    finally:
+        if writer is not None:
+            writer.close()
+    return results
+
+
+def report(players, results):
+    # The win/draw/loss table, the Elo difference of every pair and the overall ratings, as text
+    lines = ['%-30s %-30s %5s %5s %5s %16s' % ('player', 'opponent', 'win', 'draw', 'loss', 'elo')]
+    for first, second in combinations(players, 2):
+        scores = results[first, second]
+        difference, error = elo_estimate(scores)
+        lines.append('%-30s %-30s %5d %5d %5d %+7.0f +/- %4.0f' % (
+            player_name(first), player_name(second), scores.count(1), scores.count(0.5), scores.count(0),
+            difference, error))
+    lines.append('')
+    for player, rating in sorted(ratings(players, results).items(), key=lambda item: -item[1]):
+        lines.append('%-30s %+7.0f' % (player_name(player), rating))
+    return '\n'.join(lines)
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description='Play engine-against-engine matches and rate the players.')
+    parser.add_argument('--players', nargs='+', default=['1', '3', '5', '7'],
+                        help='difficulty levels, or <engine directory>:<level> for another version of the engine')
+    parser.add_argument('--openings', type=int, default=10, help='random openings per pair, each played with both colours')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes, by default one per CPU')
+    parser.add_argument('--opening-plies', type=int, default=OPENING_PLIES, help='random plies of every opening')
+    parser.add_argument('--max-plies', type=int, default=MAX_PLIES, help='plies after which a game is a draw')
+    parser.add_argument('--seed', type=int, default=1, help='seed of the random openings')
+    parser.add_argument('--output', help='also write the results to this JSON file')
+    parser.add_argument('--record', help='add every game to this game archive')
+    options = parser.parse_args(arguments)
+
+    players = [parse_player(text) for text in options.players]
+    results = run_arena(players, options.openings, options.workers, options.opening_plies, options.max_plies, options.seed,
+                        options.record)
+    print(report(players, results))
+    if options.output:
+        rating = ratings(players, results)
+        with open(options.output, 'w') as f:
+            json.dump({
+                'matches': [{'player': player_name(first), 'opponent': player_name(second), 'scores': scores,
+                             'elo': elo_estimate(scores)} for (first, second), scores in results.items()],
+                'ratings': {player_name(player): rating[player] for player in players},
+            }, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,397 @@
+# Batched positions: many checkers positions held as NumPy arrays of packed
+# bitboards, one uint32 per piece kind and position, with the rules of
+# BitBoard applied to the whole batch at once. This is for jobs that score or
+# expand large sets of positions, like generating self-play data or tuning the
+# evaluation; the search itself keeps to BitBoard, which is faster for one
+# position at a time.
+#
+#   python -m engine.batch              measures the throughput of every operation
+#   python -m engine.batch --check      checks the batch rules against BitBoard
+#
+# (from the main_game_file directory). Unlike the rest of the engine this
+# module needs NumPy, so engine/__init__.py does not import it.
+
+import argparse
+import random
+import sys
+import time
+import weakref
+import numpy as np
+from .bitboard import (BitBoard, FULL, EVEN_ROWS, ODD_ROWS, LEFT_EDGE, RIGHT_EDGE, RED_PROMOTION_ROW,
+                       WHITE_PROMOTION_ROW, RED_MEN_DIRECTIONS, WHITE_MEN_DIRECTIONS, NEIGHBOUR)
+from .evaluation import DEFAULT_EVALUATION
+
+_EVEN_ROWS = np.uint32(EVEN_ROWS)
+_ODD_ROWS = np.uint32(ODD_ROWS)
+_EVEN_NOT_RIGHT = np.uint32(EVEN_ROWS & ~RIGHT_EDGE & FULL)
+_ODD_NOT_LEFT = np.uint32(ODD_ROWS & ~LEFT_EDGE & FULL)
+_SHIFTS = {n: np.uint32(n) for n in (3, 4, 5)}
+# _NEIGHBOUR[d][sq] is bitboard.NEIGHBOUR[d][sq]; the capture masks make sure it is never -1 where it is used
+_NEIGHBOUR = np.array(NEIGHBOUR)
+# Most pieces one capture sequence can take
+_MAX_SEQUENCE = 12
+
+
+def _step_up_left(mask):
+    return ((mask & _EVEN_ROWS) >> _SHIFTS[4]) | ((mask & _ODD_NOT_LEFT) >> _SHIFTS[5])
+
+
+def _step_up_right(mask):
+    return ((mask & _EVEN_NOT_RIGHT) >> _SHIFTS[3]) | ((mask & _ODD_ROWS) >> _SHIFTS[4])
+
+
+def _step_down_left(mask):
+    # uint32 arithmetic drops the bits shifted off the top, like the & FULL of BitBoard
+    return ((mask & _EVEN_ROWS) << _SHIFTS[4]) | ((mask & _ODD_NOT_LEFT) << _SHIFTS[3])
+
+
+def _step_down_right(mask):
+    return ((mask & _EVEN_NOT_RIGHT) << _SHIFTS[5]) | ((mask & _ODD_ROWS) << _SHIFTS[4])
+
+
+# The bitboard.STEP shifts, for arrays of masks
+STEP = (_step_up_left, _step_up_right, _step_down_left, _step_down_right)
+
+if hasattr(np, 'bitwise_count'):  # NumPy 2.0+
+    def popcount(masks):
+        return np.bitwise_count(masks).astype(np.int32)
+else:
+    _BYTE_COUNTS = np.array([bin(byte).count('1') for byte in range(256)], dtype=np.int32)
+
+    def popcount(masks):
+        return _BYTE_COUNTS[masks.view(np.uint8)].reshape(masks.shape + (4,)).sum(axis=-1)
+
+
+def _bits(masks):
+    # An N x 32 bool array of the squares set in each mask
+    return np.unpackbits(masks.astype('<u4').view(np.uint8).reshape(-1, 4), axis=1, bitorder='little').view(bool)
+
+
+# The byte tables of every Evaluation used so far, dropped along with it
+_byte_tables_cache = weakref.WeakKeyDictionary()
+
+
+def _byte_tables(evaluation):
+    # tables[kind, byte, value]: the sum of the piece-square table of kind over the squares set in that byte of a mask
+    tables = _byte_tables_cache.get(evaluation)
+    if tables is None:
+        tables = np.zeros((4, 4, 256), dtype=np.int32)
+        for kind in range(4):
+            for byte in range(4):
+                for value in range(256):
+                    tables[kind, byte, value] = evaluation.squares(kind, value << 8 * byte)
+        _byte_tables_cache[evaluation] = tables
+    return tables
+
+
+class PositionBatch:
+    """
+    A batch of N positions as four uint32 arrays of bitboards (red men, red kings, white men and
+    white kings, laid out as in BitBoard) and an int8 array of the side to move.
+    The batch methods follow the BitBoard rules exactly, including whole capture sequences as
+    single moves and crowning a man that captures a king.
+    """
+
+    def __init__(self, red_men, red_kings, white_men, white_kings, players):
+        self.red_men = np.asarray(red_men, dtype=np.uint32)
+        self.red_kings = np.asarray(red_kings, dtype=np.uint32)
+        self.white_men = np.asarray(white_men, dtype=np.uint32)
+        self.white_kings = np.asarray(white_kings, dtype=np.uint32)
+        self.players = np.asarray(players, dtype=np.int8)
+
+    @classmethod
+    def from_positions(cls, positions):
+        # A batch of a sequence of BitBoards
+        positions = list(positions)
+        return cls([p.red_men for p in positions], [p.red_kings for p in positions],
+                   [p.white_men for p in positions], [p.white_kings for p in positions],
+                   [p.player for p in positions])
+
+    def position(self, index):
+        # The position at index, as a BitBoard
+        return BitBoard(int(self.red_men[index]), int(self.red_kings[index]), int(self.white_men[index]),
+                        int(self.white_kings[index]), int(self.players[index]))
+
+    def positions(self):
+        return [self.position(index) for index in range(len(self))]
+
+    def __len__(self):
+        return len(self.players)
+
+    def __getitem__(self, index):
+        # The positions selected by a slice, index array or boolean mask, as a new batch
+        return PositionBatch(self.red_men[index], self.red_kings[index], self.white_men[index],
+                             self.white_kings[index], self.players[index])
+
+    def _sides(self, red=None):
+        # (men, kings, opponent pieces) of red where red is True and of white elsewhere, and red itself;
+        # by default of the side to move
+        if red is None:
+            red = self.players == 1
+        men = np.where(red, self.red_men, self.white_men)
+        kings = np.where(red, self.red_kings, self.white_kings)
+        opponent = np.where(red, self.white_men | self.white_kings, self.red_men | self.red_kings)
+        return men, kings, opponent, red
+
+    def _movers(self, red=None):
+        # Per direction, the pieces of the side to move (or of red where red is True) that may move that way
+        men, kings, opponent, red = self._sides(red)
+        movers = []
+        for d in range(4):
+            men_may = np.where(red, d in RED_MEN_DIRECTIONS, d in WHITE_MEN_DIRECTIONS)
+            movers.append(np.where(men_may, men | kings, kings))
+        empty = ~(men | kings | opponent)
+        return movers, opponent, empty
+
+    def capturers(self):
+        # Per direction, the mask of the pieces of the side to move that can jump in that direction
+        movers, opponent, empty = self._movers()
+        return [movers[d] & STEP[3 - d](opponent & STEP[3 - d](empty)) for d in range(4)]
+
+    def steppers(self, red=None):
+        # Per direction, the mask of the pieces of the side to move that can step in that direction
+        movers, opponent, empty = self._movers(red)
+        return [movers[d] & STEP[3 - d](empty) for d in range(4)]
+
+    def has_captures(self):
+        # Bool array: the side to move has a jump
+        jumps = self.capturers()
+        return (jumps[0] | jumps[1] | jumps[2] | jumps[3]) != 0
+
+    def count_moves(self):
+        """
+        Number of legal moves of the side to move, as BitBoard.legal_moves would return them:
+        every capture sequence when there is a capture, otherwise every step.
+        :return: An int32 array.
+        """
+        steps = self.steppers()
+        counts = popcount(steps[0]) + popcount(steps[1]) + popcount(steps[2]) + popcount(steps[3])
+        jumping = np.flatnonzero(self.has_captures())
+        if len(jumping):
+            # Only positions with a capture need their sequences enumerated
+            parents = self[jumping]._jump_sequences()[0]
+            counts[jumping] = np.bincount(parents, minlength=len(jumping))
+        return counts
+
+    def count(self, player):
+        if player == 1:
+            return popcount(self.red_men | self.red_kings)
+        return popcount(self.white_men | self.white_kings)
+
+    def is_game_over(self):
+        # Bool array: the side to move has no pieces or no moves left, or the other side has no pieces
+        return (self.count_moves() == 0) | (self.count(1) == 0) | (self.count(-1) == 0)
+
+    def mobility(self, player):
+        # Number of step moves of the player, as BitBoard.mobility
+        steps = self.steppers(np.full(len(self), player == 1))
+        return popcount(steps[0]) + popcount(steps[1]) + popcount(steps[2]) + popcount(steps[3])
+
+    def evaluate(self, evaluation=DEFAULT_EVALUATION):
+        # Evaluation from red's (player 1) point of view, as BitBoard.evaluate
+        tables = _byte_tables(evaluation)
+        score = np.zeros(len(self), dtype=np.int32)
+        for kind, masks in enumerate((self.red_men, self.red_kings, self.white_men, self.white_kings)):
+            masks = masks.astype('<u4').view(np.uint8).reshape(-1, 4)
+            for byte in range(4):
+                score += tables[kind, byte][masks[:, byte]]
+        if evaluation.mobility:
+            score += evaluation.mobility * (self.mobility(1) - self.mobility(-1))
+        return score
+
+    def _jump_sequences(self):
+        """
+        Every capture sequence of the positions whose side to move can jump, in the order of
+        BitBoard.legal_moves within a position. The sequences are grown one jump at a time for
+        all of them together.
+        :return: (parent index, from square, to square, captured mask, order) arrays, one entry per move,
+            where order sorts the sequences of a piece the way BitBoard generates them.
+        """
+        men, kings, opponent, red = self._sides()
+        jumps = self.capturers()
+        parents, froms = np.nonzero(_bits(jumps[0] | jumps[1] | jumps[2] | jumps[3]))
+        current = np.left_shift(np.uint32(1), froms.astype(np.uint32))
+        king = (kings[parents] & current) != 0
+        opponent_kings = np.where(red, self.white_kings, self.red_kings)[parents]
+        red = red[parents]
+        # Jumped pieces leave the board straight away, so these shrink as the sequences grow
+        occupied = (men | kings | opponent)[parents] ^ current
+        remaining = opponent[parents]
+        crowning_row = np.where(red, np.uint32(RED_PROMOTION_ROW), np.uint32(WHITE_PROMOTION_ROW))
+        captured = np.zeros(len(parents), dtype=np.uint32)
+        # The directions of a sequence as digits 1-4 of a base 5 number, most significant first,
+        # which sorts the sequences in the depth-first order of BitBoard
+        order = np.zeros(len(parents), dtype=np.int64)
+        place = 5 ** _MAX_SEQUENCE
+
+        finished = []
+        while len(parents):
+            place //= 5
+            extended = np.zeros(len(parents), dtype=bool)
+            grown = []
+            for d in range(4):
+                men_may = np.where(red, d in RED_MEN_DIRECTIONS, d in WHITE_MEN_DIRECTIONS)
+                middle = STEP[d](current)
+                landing = STEP[d](middle)
+                can = (king | men_may) & ((middle & remaining) != 0) & (landing != 0) & ((landing & occupied) == 0)
+                extended |= can
+                index = np.flatnonzero(can)
+                # A man that is crowned, on the far row or by capturing a king, ends its move
+                crowned = ~king[index] & (((landing[index] & crowning_row[index]) != 0)
+                                          | ((middle[index] & opponent_kings[index]) != 0))
+                grown.append((index, landing[index], middle[index], order[index] + (d + 1) * place, crowned))
+            done = ~extended & (captured != 0)
+            finished.append((parents[done], froms[done], current[done], captured[done], order[done]))
+            fields = []
+            for index, landing, middle, order_d, crowned in grown:
+                finished.append((parents[index[crowned]], froms[index[crowned]], landing[crowned],
+                                 captured[index[crowned]] | middle[crowned], order_d[crowned]))
+                going = index[~crowned]
+                fields.append((going, landing[~crowned], middle[~crowned], order_d[~crowned]))
+            going = np.concatenate([f[0] for f in fields])
+            middle = np.concatenate([f[2] for f in fields])
+            parents, froms, king, red = parents[going], froms[going], king[going], red[going]
+            current = np.concatenate([f[1] for f in fields])
+            occupied, remaining = occupied[going] ^ middle, remaining[going] ^ middle
+            opponent_kings, crowning_row = opponent_kings[going], crowning_row[going]
+            captured = captured[going] | middle
+            order = np.concatenate([f[3] for f in fields])
+
+        parents, froms, tos, captured, order = (np.concatenate([f[i] for f in finished]) for i in range(5))
+        tos = popcount(tos - np.uint32(1))
+        sort = np.lexsort((order, froms, parents))
+        parents, froms, tos, captured, order = parents[sort], froms[sort], tos[sort], captured[sort], order[sort]
+        # A king can go round the same pieces in either direction; both ways are one move
+        keys = np.stack([parents * 1024 + froms * 32 + tos, captured.astype(np.int64)], axis=1)
+        first = np.sort(np.unique(keys, axis=0, return_index=True)[1])
+        return parents[first], froms[first], tos[first], captured[first], order[first]
+
+    def _moves(self):
+        """
+        Every legal move of every position, in the order of BitBoard.legal_moves within a position.
+        :return: (parent index, from square, to square, captured mask) arrays, one entry per move.
+        """
+        jumping = self.has_captures()
+        steps = [np.where(jumping, np.uint32(0), mask) for mask in self.steppers()]
+        # The pieces that step, by position and then by square, and then the directions each steps in
+        parents, froms = np.nonzero(_bits(steps[0] | steps[1] | steps[2] | steps[3]))
+        from_bits = np.left_shift(np.uint32(1), froms.astype(np.uint32))
+        pairs, directions = np.nonzero(np.stack([(mask[parents] & from_bits) != 0 for mask in steps], axis=1))
+        parents, froms = parents[pairs], froms[pairs]
+        tos = _NEIGHBOUR[directions, froms]
+        captured = np.zeros(len(parents), dtype=np.uint32)
+
+        jumping = np.flatnonzero(jumping)
+        if len(jumping):
+            jump_parents, jump_froms, jump_tos, jump_captured = self[jumping]._jump_sequences()[:4]
+            parents = np.concatenate([parents, jumping[jump_parents]])
+            froms = np.concatenate([froms, jump_froms])
+            tos = np.concatenate([tos, jump_tos])
+            captured = np.concatenate([captured, jump_captured])
+            # Both parts are already in order within a position
+            sort = np.argsort(parents, kind='stable')
+            parents, froms, tos, captured = parents[sort], froms[sort], tos[sort], captured[sort]
+        return parents, froms, tos, captured
+
+    def children(self):
+        """
+        Plays every legal move of every position.
+        :return: (children, parents) where children is a PositionBatch of every position after one move,
+            and parents the index of the position each child came from. The children of a position
+            are contiguous and in the order of BitBoard.legal_moves.
+        """
+        parents, froms, tos, captured = self._moves()
+        from_bits = np.left_shift(np.uint32(1), froms.astype(np.uint32))
+        to_bits = np.left_shift(np.uint32(1), tos.astype(np.uint32))
+        red = self.players[parents] == 1
+        red_men, red_kings = self.red_men[parents], self.red_kings[parents]
+        white_men, white_kings = self.white_men[parents], self.white_kings[parents]
+        men, kings = np.where(red, red_men, white_men), np.where(red, red_kings, white_kings)
+        opponent_men = np.where(red, white_men, red_men)
+        opponent_kings = np.where(red, white_kings, red_kings)
+
+        is_king = (kings & from_bits) != 0
+        promotion_row = np.where(red, np.uint32(RED_PROMOTION_ROW), np.uint32(WHITE_PROMOTION_ROW))
+        promoted = ~is_king & (((to_bits & promotion_row) != 0) | ((captured & opponent_kings) != 0))
+        kings = np.where(is_king, kings ^ from_bits ^ to_bits, kings | np.where(promoted, to_bits, np.uint32(0)))
+        men = np.where(is_king, men, (men ^ from_bits) | np.where(promoted, np.uint32(0), to_bits))
+        opponent_men &= ~captured
+        opponent_kings &= ~captured
+
+        children = PositionBatch(np.where(red, men, opponent_men), np.where(red, kings, opponent_kings),
+                                 np.where(red, opponent_men, men), np.where(red, opponent_kings, kings),
+                                 -self.players[parents])
+        return children, parents
+
+
+def random_positions(count, seed=1, max_plies=80):
+    # count positions reached by random play from the start, as a PositionBatch
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        position = BitBoard.initial()
+        for _ in range(rng.randrange(max_plies)):
+            moves = position.legal_moves()
+            if not moves:
+                break
+            position.make_move(rng.choice(moves))
+        positions.append(position)
+    return PositionBatch.from_positions(positions)
+
+
+def check(count=2000, seed=1):
+    """
+    Compares every batch operation with BitBoard on random positions.
+    :return: A list of problems found; empty when everything agrees.
+    """
+    batch = random_positions(count, seed)
+    positions = batch.positions()
+    problems = []
+    evaluations, moves, captures = batch.evaluate(), batch.count_moves(), batch.has_captures()
+    children, parents = batch.children()
+    children = children.positions()
+    start = 0
+    for index, position in enumerate(positions):
+        legal = position.legal_moves()
+        expected = [position.apply(move) for move in legal]
+        end = start + len(expected)
+        if evaluations[index] != position.evaluate():
+            problems.append('%r: evaluation %d, expected %d' % (position, evaluations[index], position.evaluate()))
+        if moves[index] != len(legal):
+            problems.append('%r: %d moves, expected %d' % (position, moves[index], len(legal)))
+        if captures[index] != position.has_captures():
+            problems.append('%r: capture detection differs' % position)
+        if children[start:end] != expected or any(parents[start:end] != index):
+            problems.append('%r: children differ' % position)
+        start = end
+    return problems
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description='Measure or check the batched checkers rules.')
+    parser.add_argument('--positions', type=int, default=1000000, help='batch size of the measurement')
+    parser.add_argument('--check', action='store_true', help='check the batch rules against BitBoard')
+    options = parser.parse_args(arguments)
+
+    if options.check:
+        problems = check()
+        for problem in problems[:20]:
+            print(problem)
+        print('batch check %s' % ('failed' if problems else 'passed'))
+        return 1 if problems else 0
+
+    # A few thousand distinct positions, repeated up to the batch size
+    sample = random_positions(5000)
+    batch = sample[np.arange(options.positions) % len(sample)]
+    operations = [('evaluate', batch.evaluate), ('count_moves', batch.count_moves),
+                  ('has_captures', batch.has_captures), ('children', batch.children)]
+    for name, operation in operations:
+        start = time.perf_counter()
+        operation()
+        elapsed = time.perf_counter() - start
+        print('%-13s %8.3f s %12.0f positions/s' % (name, elapsed, len(batch) / elapsed))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
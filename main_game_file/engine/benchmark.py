@@ -0,0 +1,241 @@
+# Search benchmark: runs the AI search of every difficulty level over a fixed
+# set of positions and writes wall time, nodes, nodes per second, peak memory,
+# the chosen move and the SearchStats of each search to a JSON file. Two result
+# files can be compared to catch slowdowns and changed moves between commits:
+#
+#   python -m engine.benchmark --output new.json
+#   python -m engine.benchmark --compare old.json new.json
+#
+# (from the main_game_file directory).
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from .bitboard import BitBoard
+from .algorithm import DIFFICULTY_BUDGETS, SearchControl, SearchStats, iterative_deepening, generate_best_move
+from .game_record import pdn_move
+from .transposition import TranspositionTable
+
+BENCHMARK_VERSION = 2
+
+# Fixed positions as (name, phase, red men, red kings, white men, white kings, player to move).
+# They are spelled out rather than produced by self-play so that they stay the same when the engine changes.
+POSITIONS = [
+    ('start', 'opening', 0x00000FFF, 0, 0xFFF00000, 0, 1),
+    ('opening-6', 'opening', 0x00001DDF, 0, 0xFF640200, 0, 1),
+    ('midgame-12', 'midgame', 0x0000199F, 0, 0xFB842000, 0, 1),
+    ('midgame-20', 'midgame', 0x000208FC, 0, 0xF8841000, 0, 1),
+    ('midgame-30', 'midgame', 0x00020BA8, 0, 0xE1045000, 0, 1),
+    ('endgame-men', 'endgame', 0x0000AA20, 0, 0x810C1000, 0, 1),
+    ('endgame-4v2', 'endgame', 0x01640000, 0, 0x08000000, 0x00000020, 1),
+    ('endgame-kings', 'endgame', 0x00000020, 0x00004200, 0, 0x08400000, 1),
+]
+# Depth of the fixed-depth generate_best_move searches
+FIXED_DEPTHS = (4, 6, 8)
+# A level counts as slower when its nodes per second drop by more than this fraction
+REGRESSION_TOLERANCE = 0.10
+# Levels that take less time than this in total are too noisy to count as slower
+MIN_COMPARE_TIME = 0.5
+
+
+def benchmark_positions():
+    # The benchmark positions as (name, phase, BitBoard)
+    return [(name, phase, BitBoard(*masks)) for name, phase, *masks in POSITIONS]
+
+
+def _measure(search, measure_memory):
+    """
+    Runs search(table) with a new, empty transposition table.
+    The table is allocated before the clock starts, and its fixed size is not part of the peak memory.
+    :return: (the result of search, wall time, peak memory in bytes or None)
+    """
+    table = TranspositionTable()
+    start = time.perf_counter()
+    result = search(table)
+    elapsed = time.perf_counter() - start
+    peak = None
+    if measure_memory:
+        # Tracing slows the search down, so memory is measured on a second, identical run
+        table = TranspositionTable()
+        tracemalloc.start()
+        search(table)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def _record(kind, setting, name, phase, position, move, depth, nodes, elapsed, peak, stats):
+    return {
+        'search': kind,
+        'setting': setting,
+        'position': name,
+        'phase': phase,
+        'move': pdn_move(move, position) if move is not None else None,
+        'depth': depth,
+        'nodes': nodes,
+        'time': round(elapsed, 6),
+        'nodes_per_second': round(nodes / elapsed) if elapsed > 0 else None,
+        'peak_memory': peak,
+        'first_move_cutoff_rate': round(stats.first_move_cutoff_rate(), 4),
+        'branching_factor': round(stats.branching_factor(), 4),
+        'max_ply': stats.max_ply,
+        'depth_times': [round(seconds, 6) for depth, seconds, nodes in stats.depths],
+    }
+
+
+def run_level(level, positions, measure_memory=True):
+    """
+    Runs the AI search of a difficulty level, with its node and time budget, on every position.
+    Each search starts from an empty transposition table so that runs do not depend on each other.
+    :return: A list of result records.
+    """
+    node_limit, time_limit = DIFFICULTY_BUDGETS[level]
+    records = []
+    for name, phase, position in positions:
+        runs = []
+
+        def search(table):
+            control, stats = SearchControl(time_limit, node_limit), SearchStats()
+            runs.append((control, stats))
+            return iterative_deepening(position, table=table, control=control, stats=stats)
+
+        (move, depth), elapsed, peak = _measure(search, measure_memory)
+        control, stats = runs[0]
+        records.append(_record('level', level, name, phase, position, move, depth, control.nodes, elapsed, peak, stats))
+    return records
+
+
+def run_fixed_depth(depth, positions, measure_memory=True):
+    """
+    Runs generate_best_move, which searches to a fixed depth with minimax_alpha_beta, on every position.
+    :return: A list of result records.
+    """
+    records = []
+    for name, phase, position in positions:
+        runs = []
+
+        def search(table):
+            # An unlimited SearchControl only counts the nodes
+            control, stats = SearchControl(), SearchStats()
+            runs.append((control, stats))
+            return generate_best_move(position, depth, table=table, control=control, stats=stats)
+
+        move, elapsed, peak = _measure(search, measure_memory)
+        control, stats = runs[0]
+        records.append(_record('depth', depth, name, phase, position, move, depth, control.nodes, elapsed, peak, stats))
+    return records
+
+
+def summarize(records):
+    # Totals per (search, setting): time, nodes, nodes per second, slowest search and largest peak memory
+    summary = {}
+    for record in records:
+        key = '%s-%s' % (record['search'], record['setting'])
+        entry = summary.setdefault(key, {'time': 0.0, 'nodes': 0, 'max_time': 0.0, 'peak_memory': None})
+        entry['time'] += record['time']
+        entry['nodes'] += record['nodes']
+        entry['max_time'] = max(entry['max_time'], record['time'])
+        if record['peak_memory'] is not None:
+            entry['peak_memory'] = max(entry['peak_memory'] or 0, record['peak_memory'])
+    for entry in summary.values():
+        entry['time'] = round(entry['time'], 6)
+        entry['nodes_per_second'] = round(entry['nodes'] / entry['time']) if entry['time'] > 0 else None
+    return summary
+
+
+def _commit():
+    # The git commit being benchmarked, or None outside a git checkout
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(levels=range(1, 10), depths=FIXED_DEPTHS, measure_memory=True, verbose=False):
+    """
+    Runs the whole benchmark.
+    :param levels: Difficulty levels to benchmark.
+    :param depths: Depths of the fixed-depth searches to benchmark.
+    :param measure_memory: Also measure the peak memory of every search, which runs each search twice.
+    :param verbose: Prints the summary of each level as it finishes.
+    :return: The results as a dict ready to be written as JSON.
+    """
+    positions = benchmark_positions()
+    records = []
+    runs = [(run_level, level) for level in levels] + [(run_fixed_depth, depth) for depth in depths]
+    for run, setting in runs:
+        results = run(setting, positions, measure_memory)
+        records.extend(results)
+        if verbose:
+            key, entry = next(iter(summarize(results).items()))
+            print('%-8s %8.3f s %9d nodes %8s nodes/s' % (key, entry['time'], entry['nodes'], entry['nodes_per_second']))
+    return {
+        'version': BENCHMARK_VERSION,
+        'commit': _commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'results': records,
+        'summary': summarize(records),
+    }
+
+
+def compare(old, new, tolerance=REGRESSION_TOLERANCE):
+    """
+    Compares two benchmark results.
+    :param old: Results of the earlier run, as returned by run_benchmark.
+    :param new: Results of the later run.
+    :param tolerance: Fraction by which nodes per second may drop before it counts as a regression.
+    :return: A list of (message, is regression) tuples.
+    """
+    report = []
+    for key, entry in new['summary'].items():
+        before = old['summary'].get(key)
+        if before is None or not before['nodes_per_second'] or not entry['nodes_per_second']:
+            continue
+        change = entry['nodes_per_second'] / before['nodes_per_second'] - 1
+        report.append(('%-8s nodes/s %9d -> %9d (%+.1f%%), time %.3f s -> %.3f s'
+                       % (key, before['nodes_per_second'], entry['nodes_per_second'], change * 100,
+                          before['time'], entry['time']),
+                       change < -tolerance and min(before['time'], entry['time']) >= MIN_COMPARE_TIME))
+    moves = {(r['search'], r['setting'], r['position']): r['move'] for r in old['results']}
+    for record in new['results']:
+        key = (record['search'], record['setting'], record['position'])
+        if key in moves and moves[key] != record['move']:
+            # A different move is not necessarily worse, but it is worth a look
+            report.append(('%s-%s %s: move %s -> %s' % (key[0], key[1], key[2], moves[key], record['move']), False))
+    return report
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description='Benchmark the checkers AI search.')
+    parser.add_argument('--output', default='benchmark.json', help='file to write the results to')
+    parser.add_argument('--levels', type=int, nargs='*', default=list(range(1, 10)), help='difficulty levels to run')
+    parser.add_argument('--depths', type=int, nargs='*', default=list(FIXED_DEPTHS), help='fixed search depths to run')
+    parser.add_argument('--no-memory', action='store_true', help='skip the peak memory measurement')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='compare two result files instead of running')
+    options = parser.parse_args(arguments)
+
+    if options.compare:
+        with open(options.compare[0]) as f:
+            old = json.load(f)
+        with open(options.compare[1]) as f:
+            new = json.load(f)
+        report = compare(old, new)
+        for message, regression in report:
+            print(('REGRESSION ' if regression else '') + message)
+        return 1 if any(regression for message, regression in report) else 0
+
+    results = run_benchmark(options.levels, options.depths, not options.no_memory, verbose=True)
+    with open(options.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print('wrote %s' % options.output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,530 @@
+# Compact bitboard representation of a checkers position used by the AI search.
+#
+# Only the 32 dark squares of the 8x8 board can ever hold a piece, so every
+# set of pieces fits in a 32-bit mask. Squares are numbered row by row, four
+# per row, from the top-left of the board:
+#
+#   sq = row * 4 + col // 2
+#
+# On even rows the dark squares are the odd columns (1, 3, 5, 7) and on odd
+# rows they are the even columns (0, 2, 4, 6). Moving one step diagonally is
+# then a shift of 3, 4 or 5 bits depending on the row parity, which is what
+# the _step_* helpers below do for a whole mask at once.
+
+import random
+from .evaluation import DEFAULT_EVALUATION
+
+FULL = 0xFFFFFFFF
+EVEN_ROWS = 0x0F0F0F0F
+ODD_ROWS = 0xF0F0F0F0
+LEFT_EDGE = 0x11111111   # First square of every row
+RIGHT_EDGE = 0x88888888  # Last square of every row
+RED_PROMOTION_ROW = 0xF0000000   # Row 7, where red (player 1) men are crowned
+WHITE_PROMOTION_ROW = 0x0000000F  # Row 0, where white (player -1) men are crowned
+
+# Direction indices, in the same order as state.DIRECTIONS
+UP_LEFT, UP_RIGHT, DOWN_LEFT, DOWN_RIGHT = 0, 1, 2, 3
+DIRECTION_VECTORS = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+# Men only move forward: red moves down the board, white moves up
+RED_MEN_DIRECTIONS = (DOWN_LEFT, DOWN_RIGHT)
+WHITE_MEN_DIRECTIONS = (UP_LEFT, UP_RIGHT)
+ALL_DIRECTIONS = (UP_LEFT, UP_RIGHT, DOWN_LEFT, DOWN_RIGHT)
+
+
+def square_to_rc(sq):
+    # Convert a square index (0-31) to a (row, col) position on the 8x8 board
+    row = sq >> 2
+    return row, 2 * (sq & 3) + (1 if row % 2 == 0 else 0)
+
+
+def rc_to_square(row, col):
+    # Convert a dark (row, col) position on the 8x8 board to a square index
+    return row * 4 + col // 2
+
+
+SQUARE_RC = [square_to_rc(sq) for sq in range(32)]
+
+
+def _step_up_left(mask):
+    return ((mask & EVEN_ROWS) >> 4) | ((mask & ODD_ROWS & ~LEFT_EDGE) >> 5)
+
+
+def _step_up_right(mask):
+    return ((mask & EVEN_ROWS & ~RIGHT_EDGE) >> 3) | ((mask & ODD_ROWS) >> 4)
+
+
+def _step_down_left(mask):
+    return (((mask & EVEN_ROWS) << 4) | ((mask & ODD_ROWS & ~LEFT_EDGE) << 3)) & FULL
+
+
+def _step_down_right(mask):
+    return (((mask & EVEN_ROWS & ~RIGHT_EDGE) << 5) | ((mask & ODD_ROWS) << 4)) & FULL
+
+
+# STEP[d] shifts every bit of a mask one square in direction d, dropping bits
+# that would leave the board. STEP[3 - d] is the opposite direction.
+STEP = (_step_up_left, _step_up_right, _step_down_left, _step_down_right)
+
+
+def _neighbour(sq, d):
+    row, col = SQUARE_RC[sq]
+    dr, dc = DIRECTION_VECTORS[d]
+    r, c = row + dr, col + dc
+    if 0 <= r < 8 and 0 <= c < 8:
+        return rc_to_square(r, c)
+    return -1
+
+
+# NEIGHBOUR[d][sq] is the square one step from sq in direction d, or -1
+NEIGHBOUR = [[_neighbour(sq, d) for sq in range(32)] for d in range(4)]
+
+
+# Zobrist keys: one random 64-bit number per (piece kind, square) and one for
+# white to move. A position's hash is the XOR of the keys of everything on it,
+# so a move updates it with a handful of XORs instead of a rescan.
+RED_MAN, RED_KING, WHITE_MAN, WHITE_KING = 0, 1, 2, 3
+_zobrist_random = random.Random(20230512)
+ZOBRIST_PIECES = [[_zobrist_random.getrandbits(64) for _ in range(32)] for _ in range(4)]
+ZOBRIST_WHITE_TO_MOVE = _zobrist_random.getrandbits(64)
+
+
+def _zobrist_squares(kind, mask):
+    # XOR of the keys of a piece kind on every square set in mask
+    keys = ZOBRIST_PIECES[kind]
+    h = 0
+    while mask:
+        bit = mask & -mask
+        mask ^= bit
+        h ^= keys[bit.bit_length() - 1]
+    return h
+
+
+def _jump_sequences(moves, frm, sq, captured, occupied, opponent, opponent_kings, directions, crowning_row):
+    """
+    Appends to moves every capture sequence of a piece that started on frm and has jumped to sq so far.
+    Jumped pieces leave the board straight away, so they can neither be jumped twice nor block a landing.
+    :param captured: Mask of the pieces captured so far.
+    :param occupied: Mask of the squares still occupied, not counting the moving piece.
+    :param opponent: Mask of the opponent pieces still on the board.
+    :param directions: Directions the piece may jump in.
+    :param crowning_row: Mask of the row that crowns a man, or None for a king. A man that is crowned,
+        on that row or by capturing a king, ends its move there.
+    """
+    extended = False
+    for d in directions:
+        middle = NEIGHBOUR[d][sq]
+        if middle < 0:
+            continue
+        middle_bit = 1 << middle
+        if not opponent & middle_bit:
+            continue
+        to = NEIGHBOUR[d][middle]
+        if to < 0 or occupied >> to & 1:
+            continue
+        extended = True
+        if crowning_row is not None and (crowning_row >> to & 1 or opponent_kings & middle_bit):
+            moves.append((frm, to, captured | middle_bit))
+        else:
+            _jump_sequences(moves, frm, to, captured | middle_bit, occupied ^ middle_bit, opponent ^ middle_bit,
+                            opponent_kings, directions, crowning_row)
+    if not extended and captured:
+        moves.append((frm, sq, captured))
+
+
+if hasattr(int, 'bit_count'):  # Python 3.10+
+    def popcount(mask):
+        return mask.bit_count()
+else:
+    def popcount(mask):
+        return bin(mask).count('1')
+
+
+class BitBoard:
+    """
+    A checkers position stored as four 32-bit masks (red men, red kings,
+    white men and white kings) plus the side to move. Red is player 1 and
+    starts at the top of the board, white is player -1. `hash` holds the
+    Zobrist hash of the position and is kept up to date by make_move.
+
+    Moves are tuples (from_sq, to_sq, captured_mask) where captured_mask has
+    the bits of every square jumped over set for a capture sequence and is 0
+    for a quiet move.
+
+    `score` holds the piece-square part of the evaluation (see evaluation.py)
+    and is kept up to date the same way.
+    """
+    __slots__ = ('red_men', 'red_kings', 'white_men', 'white_kings', 'player', 'hash', 'evaluation', 'score')
+
+    def __init__(self, red_men=0, red_kings=0, white_men=0, white_kings=0, player=1, evaluation=None):
+        self.red_men = red_men
+        self.red_kings = red_kings
+        self.white_men = white_men
+        self.white_kings = white_kings
+        self.player = player
+        self.hash = self.compute_hash()
+        self.evaluation = evaluation or DEFAULT_EVALUATION
+        self.score = self.evaluation.score(self)
+
+    @classmethod
+    def initial(cls):
+        # Starting position of Game.create_checkerboard_array, red to move
+        return cls(red_men=0x00000FFF, white_men=0xFFF00000, player=1)
+
+    @classmethod
+    def from_grid(cls, grid, player=1, evaluation=None):
+        """
+        Builds a bitboard from an 8x8 grid such as GameState.board.
+        :param grid: 8x8 list whose cells are None or objects with `player` and `king` attributes.
+        :param player: The side to move.
+        :param evaluation: The Evaluation of the position, by default DEFAULT_EVALUATION.
+        :return: A new BitBoard.
+        """
+        position = cls(player=player, evaluation=evaluation)
+        for row in range(8):
+            for col in range(8):
+                piece = grid[row][col]
+                if piece is None or (row + col) % 2 == 0:
+                    continue
+                bit = 1 << rc_to_square(row, col)
+                if piece.player == 1:
+                    if piece.king:
+                        position.red_kings |= bit
+                    else:
+                        position.red_men |= bit
+                else:
+                    if piece.king:
+                        position.white_kings |= bit
+                    else:
+                        position.white_men |= bit
+        position.hash = position.compute_hash()
+        position.score = position.evaluation.score(position)
+        return position
+
+    def compute_hash(self):
+        # Zobrist hash of the position computed from scratch
+        h = (_zobrist_squares(RED_MAN, self.red_men) ^ _zobrist_squares(RED_KING, self.red_kings)
+             ^ _zobrist_squares(WHITE_MAN, self.white_men) ^ _zobrist_squares(WHITE_KING, self.white_kings))
+        if self.player == -1:
+            h ^= ZOBRIST_WHITE_TO_MOVE
+        return h
+
+    def pieces(self):
+        # Yields (row, col, player, king) for every piece, in board-scan order
+        for sq in range(32):
+            bit = 1 << sq
+            row, col = SQUARE_RC[sq]
+            if self.red_men & bit:
+                yield row, col, 1, False
+            elif self.red_kings & bit:
+                yield row, col, 1, True
+            elif self.white_men & bit:
+                yield row, col, -1, False
+            elif self.white_kings & bit:
+                yield row, col, -1, True
+
+    def copy(self):
+        return BitBoard(self.red_men, self.red_kings, self.white_men, self.white_kings, self.player, self.evaluation)
+
+    def set_player(self, player):
+        # Changes the side to move, keeping the hash in step
+        if player != self.player:
+            self.player = player
+            self.hash ^= ZOBRIST_WHITE_TO_MOVE
+
+    def key(self):
+        return self.red_men, self.red_kings, self.white_men, self.white_kings, self.player
+
+    def __eq__(self, other):
+        return isinstance(other, BitBoard) and self.key() == other.key()
+
+    def __hash__(self):
+        return hash(self.key())
+
+    def __repr__(self):
+        rows = [['.'] * 8 for _ in range(8)]
+        for row, col, player, king in self.pieces():
+            rows[row][col] = ('R' if king else 'r') if player == 1 else ('W' if king else 'w')
+        return '\n'.join(''.join(cells) for cells in rows) + '\nto move: %d' % self.player
+
+    def _sides(self, player):
+        # Returns (men, kings, opponent pieces, directions men may move in) for player
+        if player == 1:
+            return self.red_men, self.red_kings, self.white_men | self.white_kings, RED_MEN_DIRECTIONS
+        return self.white_men, self.white_kings, self.red_men | self.red_kings, WHITE_MEN_DIRECTIONS
+
+    def _capturers(self, player):
+        # Per direction, the mask of the player's pieces that can jump in that direction
+        men, kings, opponent, men_directions = self._sides(player)
+        empty = ~(men | kings | opponent) & FULL
+        result = []
+        for d in range(4):
+            back = STEP[3 - d]
+            movers = men | kings if d in men_directions else kings
+            result.append(movers & back(opponent & back(empty)))
+        return result
+
+    def _steppers(self, player):
+        # Per direction, the mask of the player's pieces that can step in that direction
+        men, kings, opponent, men_directions = self._sides(player)
+        empty = ~(men | kings | opponent) & FULL
+        result = []
+        for d in range(4):
+            movers = men | kings if d in men_directions else kings
+            result.append(movers & STEP[3 - d](empty))
+        return result
+
+    def has_captures(self, player=None):
+        c = self._capturers(self.player if player is None else player)
+        return (c[0] | c[1] | c[2] | c[3]) != 0
+
+    def has_moves(self, player=None):
+        # True if the player has any step or jump available; stops at the first direction with one
+        if player is None:
+            player = self.player
+        men, kings, opponent, men_directions = self._sides(player)
+        pieces = men | kings
+        if not pieces:
+            return False
+        empty = ~(pieces | opponent) & FULL
+        for d in range(4):
+            movers = pieces if d in men_directions else kings
+            if movers:
+                back = STEP[3 - d]
+                # A piece can move in direction d onto an empty square, or over an opponent onto one
+                if movers & back(empty | (opponent & back(empty))):
+                    return True
+        return False
+
+    def legal_moves(self, player=None):
+        """
+        Generates the legal moves for the given player. Captures are compulsory,
+        so if any piece can jump only jumps are returned. A jump is a whole
+        capture sequence: the piece keeps jumping until it cannot jump any more
+        or is crowned, and every different sequence is a move of its own. Moves
+        come out in the same order as GameState.legal_moves: by square in a row
+        by row scan, then by the direction of each jump in turn.
+        :param player: The player to move, defaults to the side to move.
+        :return: A list of (from_sq, to_sq, captured_mask) tuples.
+        """
+        if player is None:
+            player = self.player
+        moves = []
+        jumps = self._capturers(player)
+        sources = jumps[0] | jumps[1] | jumps[2] | jumps[3]
+        if sources:
+            men, kings, opponent, men_directions = self._sides(player)
+            if player == 1:
+                opponent_kings, crowning_row = self.white_kings, RED_PROMOTION_ROW
+            else:
+                opponent_kings, crowning_row = self.red_kings, WHITE_PROMOTION_ROW
+            occupied = men | kings | opponent
+            while sources:
+                bit = sources & -sources
+                sources ^= bit
+                sq = bit.bit_length() - 1
+                king = kings & bit != 0
+                _jump_sequences(moves, sq, sq, 0, occupied ^ bit, opponent, opponent_kings,
+                                ALL_DIRECTIONS if king else men_directions, None if king else crowning_row)
+            if len(moves) > 1:
+                # A king can go round the same pieces in either direction; both ways are one move
+                moves = list(dict.fromkeys(moves))
+            return moves
+        steps = self._steppers(player)
+        sources = steps[0] | steps[1] | steps[2] | steps[3]
+        while sources:
+            bit = sources & -sources
+            sources ^= bit
+            sq = bit.bit_length() - 1
+            for d in range(4):
+                if steps[d] & bit:
+                    moves.append((sq, NEIGHBOUR[d][sq], 0))
+        return moves
+
+    def make_move(self, move):
+        """
+        Plays a move in place and hands the turn to the other side.
+        Men are crowned on reaching the far row or when they capture a king.
+        :param move: A (from_sq, to_sq, captured_mask) tuple from legal_moves.
+        :return: An undo record (from_sq, to_sq, captured men, captured kings, promoted, previous hash,
+            previous score) for unmake_move.
+        """
+        frm, to, captured = move
+        from_bit, to_bit = 1 << frm, 1 << to
+        previous_hash = h = self.hash
+        previous_score = score = self.score
+        tables = self.evaluation.tables
+        promoted = False
+        if self.player == 1:
+            if self.red_kings & from_bit:
+                # from_bit ^ to_bit is 0 when a king's capture sequence ends where it started
+                self.red_kings ^= from_bit ^ to_bit
+                h ^= ZOBRIST_PIECES[RED_KING][frm] ^ ZOBRIST_PIECES[RED_KING][to]
+                score += tables[RED_KING][to] - tables[RED_KING][frm]
+            else:
+                self.red_men ^= from_bit
+                h ^= ZOBRIST_PIECES[RED_MAN][frm]
+                score -= tables[RED_MAN][frm]
+                if to_bit & RED_PROMOTION_ROW or captured & self.white_kings:
+                    self.red_kings |= to_bit
+                    h ^= ZOBRIST_PIECES[RED_KING][to]
+                    score += tables[RED_KING][to]
+                    promoted = True
+                else:
+                    self.red_men |= to_bit
+                    h ^= ZOBRIST_PIECES[RED_MAN][to]
+                    score += tables[RED_MAN][to]
+            captured_men = self.white_men & captured
+            captured_kings = self.white_kings & captured
+            self.white_men ^= captured_men
+            self.white_kings ^= captured_kings
+            if captured:
+                h ^= _zobrist_squares(WHITE_MAN, captured_men) ^ _zobrist_squares(WHITE_KING, captured_kings)
+                score -= self.evaluation.squares(WHITE_MAN, captured_men) + self.evaluation.squares(WHITE_KING, captured_kings)
+        else:
+            if self.white_kings & from_bit:
+                self.white_kings ^= from_bit ^ to_bit
+                h ^= ZOBRIST_PIECES[WHITE_KING][frm] ^ ZOBRIST_PIECES[WHITE_KING][to]
+                score += tables[WHITE_KING][to] - tables[WHITE_KING][frm]
+            else:
+                self.white_men ^= from_bit
+                h ^= ZOBRIST_PIECES[WHITE_MAN][frm]
+                score -= tables[WHITE_MAN][frm]
+                if to_bit & WHITE_PROMOTION_ROW or captured & self.red_kings:
+                    self.white_kings |= to_bit
+                    h ^= ZOBRIST_PIECES[WHITE_KING][to]
+                    score += tables[WHITE_KING][to]
+                    promoted = True
+                else:
+                    self.white_men |= to_bit
+                    h ^= ZOBRIST_PIECES[WHITE_MAN][to]
+                    score += tables[WHITE_MAN][to]
+            captured_men = self.red_men & captured
+            captured_kings = self.red_kings & captured
+            self.red_men ^= captured_men
+            self.red_kings ^= captured_kings
+            if captured:
+                h ^= _zobrist_squares(RED_MAN, captured_men) ^ _zobrist_squares(RED_KING, captured_kings)
+                score -= self.evaluation.squares(RED_MAN, captured_men) + self.evaluation.squares(RED_KING, captured_kings)
+        self.player = -self.player
+        self.hash = h ^ ZOBRIST_WHITE_TO_MOVE
+        self.score = score
+        return frm, to, captured_men, captured_kings, promoted, previous_hash, previous_score
+
+    def unmake_move(self, undo):
+        # Takes back the move described by an undo record returned from make_move
+        frm, to, captured_men, captured_kings, promoted, previous_hash, previous_score = undo
+        from_bit, to_bit = 1 << frm, 1 << to
+        self.player = -self.player
+        self.hash = previous_hash
+        self.score = previous_score
+        if self.player == 1:
+            if promoted:
+                self.red_kings ^= to_bit
+                self.red_men |= from_bit
+            elif self.red_kings & to_bit:
+                self.red_kings ^= from_bit ^ to_bit
+            else:
+                self.red_men ^= from_bit | to_bit
+            self.white_men |= captured_men
+            self.white_kings |= captured_kings
+        else:
+            if promoted:
+                self.white_kings ^= to_bit
+                self.white_men |= from_bit
+            elif self.white_kings & to_bit:
+                self.white_kings ^= from_bit ^ to_bit
+            else:
+                self.white_men ^= from_bit | to_bit
+            self.red_men |= captured_men
+            self.red_kings |= captured_kings
+
+    def apply(self, move):
+        # Returns the position after a move, leaving this one untouched
+        child = self.copy()
+        child.make_move(move)
+        return child
+
+    def jump_path(self, move):
+        """
+        The squares a capture sequence of this position lands on, worked out from its start, its end and
+        the squares it jumps. Jumped pieces leave the board straight away, as in legal_moves.
+        :param move: A capture (from_sq, to_sq, captured_mask) of this position.
+        :return: List of the landing squares in order, ending with to_sq, or None if the move is not a
+            capture sequence of the piece on from_sq.
+        """
+        frm, to, captured = move
+        from_bit = 1 << frm
+        if (self.red_men | self.red_kings) & from_bit:
+            men, kings, opponent, men_directions = self._sides(1)
+        elif (self.white_men | self.white_kings) & from_bit:
+            men, kings, opponent, men_directions = self._sides(-1)
+        else:
+            return None
+        if not captured or captured & ~opponent:
+            return None
+        directions = ALL_DIRECTIONS if kings & from_bit else men_directions
+
+        def extend(sq, remaining, occupied):
+            if not remaining:
+                return [] if sq == to else None
+            for d in directions:
+                middle = NEIGHBOUR[d][sq]
+                if middle < 0 or not remaining >> middle & 1:
+                    continue
+                landing = NEIGHBOUR[d][middle]
+                if landing < 0 or occupied >> landing & 1:
+                    continue
+                path = extend(landing, remaining ^ 1 << middle, occupied ^ 1 << middle)
+                if path is not None:
+                    return [landing] + path
+            return None
+
+        return extend(frm, captured, (men | kings | opponent) ^ from_bit)
+
+    def move_to_rc(self, move):
+        """
+        Converts a bitboard move of this position to the move tuples of GameState.legal_moves.
+        :param move: A (from_sq, to_sq, captured_mask) tuple.
+        :return: (start_row, start_col, end_row, end_col) for a step; a capture sequence also has its
+            path, the (row, col) of every square it lands on, as a fifth item.
+        """
+        frm, to, captured = move
+        if not captured:
+            return SQUARE_RC[frm] + SQUARE_RC[to]
+        path = self.jump_path(move)
+        if path is None:
+            raise ValueError('%r is not a capture sequence of this position' % (move,))
+        return SQUARE_RC[frm] + SQUARE_RC[to] + (tuple(SQUARE_RC[sq] for sq in path),)
+
+    def move_from_rc(self, rc_move):
+        # Finds the legal move a move tuple of GameState.legal_moves or move_to_rc stands for, or None.
+        # A capture sequence is told apart from others joining the same squares by its path; without
+        # a path, the tuple stands for a single step or jump.
+        squares = [tuple(rc_move[:2])] + (list(rc_move[4]) if len(rc_move) > 4 else [tuple(rc_move[2:4])])
+        captured = 0
+        for (start_row, start_col), (end_row, end_col) in zip(squares, squares[1:]):
+            if abs(end_row - start_row) == 2:
+                captured |= 1 << rc_to_square((start_row + end_row) // 2, (start_col + end_col) // 2)
+        move = (rc_to_square(*squares[0]), rc_to_square(*squares[-1]), captured)
+        return move if move in self.legal_moves() else None
+
+    def count(self, player):
+        if player == 1:
+            return popcount(self.red_men | self.red_kings)
+        return popcount(self.white_men | self.white_kings)
+
+    def is_game_over(self):
+        # The game is over when either side has no pieces or no moves left
+        return not self.has_moves(1) or not self.has_moves(-1)
+
+    def mobility(self, player):
+        # Number of step moves the player has, ignoring whether a capture is compulsory
+        s = self._steppers(player)
+        return popcount(s[0]) + popcount(s[1]) + popcount(s[2]) + popcount(s[3])
+
+    def evaluate(self):
+        # Evaluation from red's (player 1) point of view: the running piece-square score plus mobility
+        weight = self.evaluation.mobility
+        if weight:
+            return self.score + weight * (self.mobility(1) - self.mobility(-1))
+        return self.score
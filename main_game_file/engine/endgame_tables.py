@@ -0,0 +1,388 @@
+# Endgame tables: the exact result of every position with few pieces left,
+# computed by retrograde analysis and probed by the search.
+#
+# Positions are grouped into slices by material: the number of red men, red
+# kings, white men and white kings. A position with white to move is the same
+# as the position turned round, with the colours swapped and red to move, so
+# slices only hold positions with red to move. A slice stores one byte per
+# position, indexed by the combinatorial rank of each kind's square set; men
+# are ranked among the 28 squares they can stand on, kings among all 32:
+#
+#   0          draw
+#   d + 1      the side to move wins (d odd) or loses (d even) in d plies
+#
+# A move of red leads to a position of the mirror slice, the one with the
+# colours of the material swapped, so a slice is solved together with its
+# mirror. Captures and promotions always lead to another pair of slices, so
+# the pairs are solved in an order where those are already known: fewer
+# pieces first, and with the same number of pieces, fewer men first. Within a
+# pair, every position without moves is lost, and the results are then
+# propagated back one ply at a time from their successors.
+#
+# The tables follow the search's rules, those of BitBoard.legal_moves, and
+# the draw of GameState.check_winner when each side is down to a single piece.
+
+import argparse
+import mmap
+import os
+import struct
+import time
+from array import array
+from itertools import combinations, product
+from .bitboard import BitBoard, popcount
+from .evaluation import DEFAULT_EVALUATION
+
+# The tables sit next to this module and are built with
+# `python -m engine.endgame_tables [--pieces N]` from the main_game_file directory
+TABLES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'endgame_tables.bin')
+# Default for the builder: every position with up to this many pieces, as in the shipped tables.
+# Four pieces take 7.5 MB (7452303 bytes) and build in about 5 minutes on one core; five would take about 190 MB
+TABLE_PIECES = 4
+
+# File layout: a header, a directory of slices, then the bytes of every slice
+TABLES_MAGIC = b'CKEG'
+TABLES_VERSION = 2
+HEADER = struct.Struct('<4sHBI')
+SLICE = struct.Struct('<BBBBQI')
+
+# Results for the side to move
+WIN, LOSS, DRAW = 1, -1, 0
+# Search score of a won position; the plies to the win are taken off so that faster wins score higher.
+# It is well above any evaluation, so a known win always beats a material advantage.
+WIN_SCORE = 10000
+# Longest distance a byte can hold
+MAX_DISTANCE = 254
+
+# Number of squares men can stand on: they are crowned on reaching the far row, so red men stand on
+# squares 0-27 and white men on squares 4-31
+MEN_SQUARES = 28
+
+# BINOMIAL[n][k] is n choose k
+BINOMIAL = [[0] * 33 for _ in range(33)]
+for n in range(33):
+    BINOMIAL[n][0] = 1
+    for k in range(1, n + 1):
+        BINOMIAL[n][k] = BINOMIAL[n - 1][k - 1] + BINOMIAL[n - 1][k]
+
+# REVERSED_BYTES[b] is the byte b with its bits in reverse order
+REVERSED_BYTES = bytes(int('{:08b}'.format(b)[::-1], 2) for b in range(256))
+
+
+def _rank(mask):
+    # Index of a set of squares among all sets of the same size
+    rank = 0
+    i = 1
+    while mask:
+        low = mask & -mask
+        rank += BINOMIAL[low.bit_length() - 1][i]
+        mask ^= low
+        i += 1
+    return rank
+
+
+def _turn(mask):
+    # A mask turned round the centre of the board: square sq becomes square 31 - sq
+    return (REVERSED_BYTES[mask & 0xFF] << 24 | REVERSED_BYTES[mask >> 8 & 0xFF] << 16
+            | REVERSED_BYTES[mask >> 16 & 0xFF] << 8 | REVERSED_BYTES[mask >> 24])
+
+
+def _red_to_move(position):
+    # The (red men, red kings, white men, white kings) of position with red to move: as it is, or turned
+    # round with the colours swapped when white is to move
+    if position.player == 1:
+        return position.red_men, position.red_kings, position.white_men, position.white_kings
+    return _turn(position.white_men), _turn(position.white_kings), _turn(position.red_men), _turn(position.red_kings)
+
+
+def _material(masks):
+    return tuple(popcount(mask) for mask in masks)
+
+
+def _mirror(material):
+    # The material with the colours swapped
+    red_men, red_kings, white_men, white_kings = material
+    return white_men, white_kings, red_men, red_kings
+
+
+def _slice_size(material):
+    red_men, red_kings, white_men, white_kings = material
+    return (BINOMIAL[MEN_SQUARES][red_men] * BINOMIAL[32][red_kings]
+            * BINOMIAL[MEN_SQUARES][white_men] * BINOMIAL[32][white_kings])
+
+
+def _index(red_men, red_kings, white_men, white_kings):
+    # Index of a position with red to move within its slice
+    index = _rank(red_men)
+    index = index * BINOMIAL[32][popcount(red_kings)] + _rank(red_kings)
+    index = index * BINOMIAL[MEN_SQUARES][popcount(white_men)] + _rank(white_men >> 4)
+    return index * BINOMIAL[32][popcount(white_kings)] + _rank(white_kings)
+
+
+def _decode(value):
+    # (result, distance) of a stored byte
+    if value == 0:
+        return DRAW, 0
+    distance = value - 1
+    return (WIN if distance & 1 else LOSS), distance
+
+
+def _terminal(material):
+    # The (result, distance) of material with red to move decided without any table, or None
+    red = material[0] + material[1]
+    white = material[2] + material[3]
+    if red == 0:
+        return LOSS, 0
+    if red == 1 and white == 1:
+        return DRAW, 0
+    return None
+
+
+class EndgameTables:
+    """
+    Read-only endgame tables, memory-mapped so that probes are cheap and every
+    process using them shares one copy. Use EndgameTables.default() to get the
+    tables at TABLES_PATH, or None if they were not built.
+    :param path: Path of a file written by build_tables().
+    """
+
+    def __init__(self, path=TABLES_PATH):
+        with open(path, 'rb') as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.max_pieces, count = HEADER.unpack_from(self.data, 0)
+        if magic != TABLES_MAGIC or version != TABLES_VERSION:
+            self.data.close()
+            raise ValueError('%s is not an endgame table file of version %d' % (path, TABLES_VERSION))
+        self.offsets = {}
+        for i in range(count):
+            red_men, red_kings, white_men, white_kings, offset, size = SLICE.unpack_from(self.data, HEADER.size + i * SLICE.size)
+            self.offsets[red_men, red_kings, white_men, white_kings] = offset
+
+    @classmethod
+    def load(cls, path=TABLES_PATH):
+        # The tables, or None when they are missing or unreadable: the search then works without them
+        try:
+            return cls(path)
+        except (OSError, ValueError):
+            return None
+
+    @classmethod
+    def default(cls):
+        # The tables at TABLES_PATH, opened once and shared by every caller in the process
+        global _default_tables
+        if _default_tables is None:
+            _default_tables = cls.load() or False
+        return _default_tables or None
+
+    def probe(self, position):
+        """
+        Looks up the exact result of a position.
+        :param position: A BitBoard.
+        :return: (result, distance) for the side to move, where result is WIN, LOSS or DRAW and
+            distance is the number of plies to the end of the game with best play, or None if the
+            position is not in the tables.
+        """
+        masks = _red_to_move(position)
+        material = _material(masks)
+        if sum(material) > self.max_pieces:
+            return None
+        terminal = _terminal(material)
+        if terminal is not None:
+            return terminal
+        offset = self.offsets.get(material)
+        if offset is None:
+            return None
+        return _decode(self.data[offset + _index(*masks)])
+
+    def score(self, position, ply=0):
+        """
+        Search score of a position from red's (player 1) point of view, like that of the evaluation.
+        :param position: A BitBoard.
+        :param ply: Plies from the root of the search to position, taken off a win along with the
+            distance so that the search prefers the fastest win and the slowest loss.
+        :return: The score, or None if the position is not in the tables.
+        """
+        if popcount(position.red_men | position.red_kings | position.white_men | position.white_kings) > self.max_pieces:
+            return None
+        entry = self.probe(position)
+        if entry is None:
+            return None
+        result, distance = entry
+        if result == DRAW:
+            return 0
+        return (WIN_SCORE - ply - distance) * result * position.player
+
+    def close(self):
+        self.data.close()
+
+
+# The tables at TABLES_PATH, opened by the first EndgameTables.default() call
+_default_tables = None
+
+
+def _sets(squares, count):
+    # Masks of every set of count squares among squares, in the order of their rank
+    return sorted(sum(1 << sq for sq in chosen) for chosen in combinations(squares, count))
+
+
+def _positions(material):
+    # (index, red men, red kings, white men, white kings) of every position of a slice, in index order
+    red_men, red_kings, white_men, white_kings = material
+    pieces = sum(material)
+    index = -1
+    for rm, rk, wm, wk in product(_sets(range(MEN_SQUARES), red_men), _sets(range(32), red_kings),
+                                  _sets(range(32 - MEN_SQUARES, 32), white_men), _sets(range(32), white_kings)):
+        index += 1
+        # Indexes of sets that overlap are never used
+        if popcount(rm | rk | wm | wk) == pieces:
+            yield index, rm, rk, wm, wk
+
+
+def _solve_pair(materials, solved):
+    """
+    Retrograde analysis of a slice and its mirror.
+    :param materials: The material of the slice and that of its mirror, or only the first if it is its own mirror.
+    :param solved: Dict of the slices solved so far, material -> bytearray.
+    :return: Dict of the bytearray of each slice of the pair.
+    """
+    offsets = {}
+    size = 0
+    for material in materials:
+        offsets[material] = size
+        size += _slice_size(material)
+    values = bytearray(size)
+    resolved = bytearray(size)
+    # Moves per position not yet known to lose for the side that plays them
+    remaining = array('H', bytes(2 * size))
+    # Moves between positions of the pair, as parallel arrays of the position and its successor
+    parents = array('I')
+    children = array('I')
+    # events[d] holds index * 2 + (1 if the successor is lost) for every position a successor decides
+    # in d plies at the earliest
+    events = [array('I') for _ in range(MAX_DISTANCE + 2)]
+
+    position = BitBoard.__new__(BitBoard)
+    position.player = 1
+    position.hash = 0
+    position.evaluation = DEFAULT_EVALUATION
+    position.score = 0
+    for material, offset in offsets.items():
+        for index, position.red_men, position.red_kings, position.white_men, position.white_kings in _positions(material):
+            index += offset
+            moves = position.legal_moves()
+            if not moves:
+                resolved[index] = 1
+                values[index] = 1
+                continue
+            remaining[index] = len(moves)
+            for move in moves:
+                undo = position.make_move(move)
+                masks = _red_to_move(position)
+                child_material = _material(masks)
+                child_offset = offsets.get(child_material)
+                if child_offset is not None:
+                    parents.append(index)
+                    children.append(child_offset + _index(*masks))
+                else:
+                    result = _terminal(child_material)
+                    if result is None:
+                        result = _decode(solved[child_material][_index(*masks)])
+                    if result[0] != DRAW:
+                        events[result[1] + 1].append(index * 2 + (result[0] == LOSS))
+                position.unmake_move(undo)
+
+    # The moves grouped by successor: the predecessors of position i are
+    # predecessors[starts[i]:starts[i + 1]]
+    starts = array('I', bytes(4 * (size + 1)))
+    for child in children:
+        starts[child + 1] += 1
+    for i in range(size):
+        starts[i + 1] += starts[i]
+    predecessors = array('I', bytes(4 * len(children)))
+    filled = array('I', starts)
+    for parent, child in zip(parents, children):
+        predecessors[filled[child]] = parent
+        filled[child] += 1
+    del parents, children, filled
+
+    for index in range(size):
+        if resolved[index]:
+            events[1].extend(parent * 2 + 1 for parent in predecessors[starts[index]:starts[index + 1]])
+
+    for distance in range(1, MAX_DISTANCE + 1):
+        for event in events[distance]:
+            index = event >> 1
+            if resolved[index]:
+                continue
+            successor_lost = event & 1
+            if not successor_lost:
+                remaining[index] -= 1
+                if remaining[index]:
+                    continue
+            # Either a successor is lost for the opponent, or every move loses and this is the slowest loss
+            resolved[index] = 1
+            values[index] = distance + 1
+            lost = 0 if successor_lost else 1
+            events[distance + 1].extend(parent * 2 + lost for parent in predecessors[starts[index]:starts[index + 1]])
+        events[distance] = None
+    if events[MAX_DISTANCE + 1]:
+        raise ValueError('distance to win of slices %s does not fit in a byte' % (tuple(offsets),))
+    return {material: values[offset:offset + _slice_size(material)] for material, offset in offsets.items()}
+
+
+def _slices(max_pieces):
+    # Every material with pieces on both sides and at most max_pieces pieces, in solving order
+    slices = []
+    for pieces in range(2, max_pieces + 1):
+        for red_men in range(pieces):
+            for red_kings in range(pieces - red_men):
+                for white_men in range(pieces - red_men - red_kings + 1):
+                    white_kings = pieces - red_men - red_kings - white_men
+                    if red_men + red_kings and white_men + white_kings:
+                        slices.append((red_men, red_kings, white_men, white_kings))
+    slices.sort(key=lambda material: (sum(material), material[0] + material[2]))
+    return slices
+
+
+def build_tables(path=TABLES_PATH, max_pieces=TABLE_PIECES, verbose=False):
+    """
+    Solves every position with up to max_pieces pieces and writes the tables to path.
+    :param path: The file to write.
+    :param max_pieces: Largest number of pieces on the board covered by the tables.
+    :param verbose: Prints progress when True.
+    :return: The number of bytes written.
+    """
+    solved = {}
+    start = time.perf_counter()
+    for material in _slices(max_pieces):
+        if material in solved or _terminal(material) is not None:
+            # Solved with its mirror, or nothing to store: one piece against one is a draw
+            continue
+        mirror = _mirror(material)
+        pair = _solve_pair((material,) if mirror == material else (material, mirror), solved)
+        solved.update(pair)
+        if verbose:
+            print('%s: %d positions, %.1f s' % (' '.join(map(str, pair)), sum(map(len, pair.values())),
+                                                time.perf_counter() - start))
+
+    offset = HEADER.size + SLICE.size * len(solved)
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(TABLES_MAGIC, TABLES_VERSION, max_pieces, len(solved)))
+        for material, values in solved.items():
+            f.write(SLICE.pack(*material, offset, len(values)))
+            offset += len(values)
+        for values in solved.values():
+            f.write(values)
+    return offset
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description='Build the endgame tables of the search.')
+    parser.add_argument('--pieces', type=int, default=TABLE_PIECES, help='largest number of pieces on the board')
+    parser.add_argument('--output', default=TABLES_PATH, help='the tables file to write')
+    options = parser.parse_args(arguments)
+    written = build_tables(options.output, options.pieces, verbose=True)
+    print('wrote %d bytes to %s' % (written, options.output))
+
+
+if __name__ == '__main__':
+    main()
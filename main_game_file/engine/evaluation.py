@@ -0,0 +1,70 @@
+# Static evaluation of a position: material with kings weighted apart from
+# men, piece-square tables for advancement, the centre and the back rank, and
+# mobility. Everything except mobility is a sum of per-piece, per-square
+# values, so BitBoard keeps that part as a running `score` updated by
+# make_move and unmake_move, and evaluating a leaf costs a few bit operations
+# instead of a scan of the board.
+#
+# Scores are integers from red's (player 1) point of view. A man is worth
+# MAN_VALUE, so the material part counts in hundredths of a man.
+
+MAN_VALUE = 100
+KING_VALUE = 150
+# Bonus of a man by rank, i.e. rows advanced from its own back row
+ADVANCEMENT = (0, 0, 2, 4, 7, 10, 14, 0)
+# Bonus of a man and of a king on one of the central squares
+CENTRE = 4
+KING_CENTRE = 10
+# Bonus of a man still on its own back row, where it keeps the opponent from crowning
+BACK_RANK = 6
+# Value of each step move the side has over the other
+MOBILITY = 2
+
+
+def _is_centre(row, col):
+    return 2 <= row <= 5 and 2 <= col <= 5
+
+
+class Evaluation:
+    """
+    Weights of the evaluation, turned into piece-square tables.
+    tables[kind][sq] is the value of a piece of that kind on square sq, signed from red's point
+    of view, with kinds in the order of bitboard.RED_MAN, RED_KING, WHITE_MAN and WHITE_KING.
+    Scores are integers, as the transposition table stores them, so the values are rounded to
+    whole numbers when the weights have fractions.
+    """
+
+    def __init__(self, man=MAN_VALUE, king=KING_VALUE, advancement=ADVANCEMENT, centre=CENTRE,
+                 king_centre=KING_CENTRE, back_rank=BACK_RANK, mobility=MOBILITY):
+        self.mobility = int(round(mobility))
+        red_men, red_kings = [], []
+        for sq in range(32):
+            # Red starts at the top, so a red piece's rank is its row
+            row = sq >> 2
+            col = 2 * (sq & 3) + (1 if row % 2 == 0 else 0)
+            centre_square = _is_centre(row, col)
+            red_men.append(int(round(man + advancement[row] + (centre if centre_square else 0)
+                                     + (back_rank if row == 0 else 0))))
+            red_kings.append(int(round(king + (king_centre if centre_square else 0))))
+        # White is red mirrored through the centre of the board: square sq maps to 31 - sq
+        self.tables = [red_men, red_kings, [-red_men[31 - sq] for sq in range(32)],
+                       [-red_kings[31 - sq] for sq in range(32)]]
+
+    def squares(self, kind, mask):
+        # Sum of the table of a piece kind over every square set in mask
+        table = self.tables[kind]
+        score = 0
+        while mask:
+            bit = mask & -mask
+            mask ^= bit
+            score += table[bit.bit_length() - 1]
+        return score
+
+    def score(self, position):
+        # The incremental part of the evaluation of a BitBoard, computed from scratch
+        return (self.squares(0, position.red_men) + self.squares(1, position.red_kings)
+                + self.squares(2, position.white_men) + self.squares(3, position.white_kings))
+
+
+# The evaluation BitBoard uses unless it is given another
+DEFAULT_EVALUATION = Evaluation()
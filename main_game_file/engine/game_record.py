@@ -0,0 +1,556 @@
+# Game records: a compact binary archive of games, and PDN (Portable Draughts
+# Notation) import and export.
+#
+# An archive is a header followed by one record per game, each prefixed with
+# its size. A record holds the start position, the result, the tags (players,
+# date, engine settings, as in PDN) and every move with the milliseconds it
+# took. A quiet move takes 6 bytes and a capture 10, so a typical game fits in
+# well under a kilobyte. Records are written and read one game at a time, so
+# archives of any size are scanned, filtered and replayed in constant memory:
+#
+#   python -m engine.game_record check games.ckgr
+#   python -m engine.game_record convert games.ckgr games.pdn --result red --tag Black="level 5"
+#   python -m engine.game_record convert games.pdn games.ckgr
+#
+# (from the main_game_file directory). PDN numbers the squares 1 to 32 from
+# the top left, so square n is BitBoard square n - 1. Red, the side that moves
+# first and starts on squares 1 to 12, is "Black" in PDN.
+
+import argparse
+import os
+import re
+import struct
+import sys
+from .bitboard import BitBoard, NEIGHBOUR
+
+# File layout: a header, then the records. A record is a GAME struct (the size of the rest of
+# the record, the start position, the result and the numbers of tags and moves), the tags as
+# length-prefixed UTF-8 keys and values, and the moves. A move is a MOVE code with the from
+# square in bits 0-4, the to square in bits 5-9 and CAPTURE_FLAG set when a CAPTURED mask of
+# the jumped squares follows, then the TIME it took in milliseconds.
+RECORD_MAGIC = b'CKGR'
+RECORD_VERSION = 1
+HEADER = struct.Struct('<4sH')
+GAME = struct.Struct('<IIIIIbbBH')
+TAG_KEY = struct.Struct('<B')
+TAG_VALUE = struct.Struct('<H')
+MOVE = struct.Struct('<H')
+CAPTURED = struct.Struct('<I')
+TIME = struct.Struct('<I')
+CAPTURE_FLAG = 0x8000
+# Stored result of a game that did not finish, and time of a move that was not timed
+NO_RESULT = 2
+NO_TIME = 0xFFFFFFFF
+
+# Longest tag key and value in bytes, as their length prefixes hold
+MAX_TAG_KEY = 0xFF
+MAX_TAG_VALUE = 0xFFFF
+
+# PDN results by the winner (1 for red, -1 for white, 0 for a draw, None when unfinished) and back
+PDN_RESULTS = {1: '1-0', -1: '0-1', 0: '1/2-1/2', None: '*'}
+RESULTS_FROM_PDN = {'1-0': 1, '2-0': 1, '0-1': -1, '0-2': -1, '1/2-1/2': 0, '1-1': 0, '*': None}
+# Names of the results on the command line
+RESULT_NAMES = {'red': 1, 'white': -1, 'draw': 0, 'unfinished': None}
+
+_TAG_LINE = re.compile(r'^\s*\[(\w+)\s+"(.*)"\]\s*$')
+_COMMENT = re.compile(r'\{([^}]*)\}')
+_ELAPSED_TIME = re.compile(r'\[%emt\s+([\d:.]+)\]')
+_MOVE = re.compile(r'^\d+([-x]\d+)+$')
+_MOVE_NUMBER = re.compile(r'^\d+\.+$')
+# Width PDN move text is wrapped at
+PDN_LINE_WIDTH = 79
+
+
+class GameRecord:
+    """
+    One game: where it started, the moves played and how it ended.
+    :param start: The start position as a BitBoard, by default the initial position.
+    :param moves: Bitboard moves, (from, to, captured) tuples, in the order they were played.
+    :param times: Milliseconds each move took, None where unknown; by default all unknown.
+    :param result: 1 if red won, -1 if white won, 0 for a draw and None if the game did not finish.
+    :param tags: Dict of PDN tags such as Event, Date, Black (red's player) and White, and the engine settings.
+    """
+
+    def __init__(self, start=None, moves=(), times=None, result=None, tags=None):
+        self.start = start if start is not None else BitBoard.initial()
+        self.moves = list(moves)
+        self.times = list(times) if times is not None else [None] * len(self.moves)
+        self.result = result
+        self.tags = dict(tags) if tags else {}
+
+    def add(self, move, time=None):
+        # Appends a move and the milliseconds it took
+        self.moves.append(move)
+        self.times.append(time)
+
+    def replay(self):
+        """
+        Plays the game through from the start position.
+        The position yielded is one BitBoard updated in place between moves; copy it to keep it.
+        :return: Generator of (position before the move, move, milliseconds) tuples.
+        :raise ValueError: If a move is not legal in its position.
+        """
+        position = self.start.copy()
+        for ply, (move, time) in enumerate(zip(self.moves, self.times)):
+            if move not in position.legal_moves():
+                try:
+                    text = pdn_move(move)
+                except ValueError:
+                    text = repr(move)
+                raise ValueError('move %d, %s, is not legal' % (ply + 1, text))
+            yield position, move, time
+            position.make_move(move)
+
+    def final_position(self):
+        # The position after the last move, e.g. to load into a GameState with load_bitboard
+        position = self.start.copy()
+        for move in self.moves:
+            position.make_move(move)
+        return position
+
+    def __len__(self):
+        return len(self.moves)
+
+    def __repr__(self):
+        return 'GameRecord(%d moves, result %s, %r)' % (len(self.moves), PDN_RESULTS[self.result], self.tags)
+
+
+def find_move(position, next_position):
+    # The legal move of position that leads to next_position, or None, e.g. to record a move played on the grid
+    for move in position.legal_moves():
+        child = position.copy()
+        child.make_move(move)
+        if child.key() == next_position.key():
+            return move
+    return None
+
+
+def jump_path(move, position=None):
+    """
+    The squares a capture sequence lands on, worked out from its start, its end and the squares it jumps.
+    :param move: A bitboard capture, (from, to, captured).
+    :param position: Optional BitBoard the capture is played in. With it, every jumped square must hold
+        an opponent's piece and every landing square must be empty, as in BitBoard.jump_path; without
+        it, only the pieces still to be jumped are known to block a landing square.
+    :return: List of the landing squares in order, ending with the to square.
+    :raise ValueError: If no sequence of jumps fits the move.
+    """
+    if position is not None:
+        path = position.jump_path(move)
+    else:
+        frm, to, captured = move
+
+        def extend(sq, remaining):
+            if not remaining:
+                return [] if sq == to else None
+            for direction in range(4):
+                middle = NEIGHBOUR[direction][sq]
+                if middle < 0 or not remaining >> middle & 1:
+                    continue
+                landing = NEIGHBOUR[direction][middle]
+                if landing >= 0 and not remaining >> landing & 1:
+                    path = extend(landing, remaining & ~(1 << middle))
+                    if path is not None:
+                        return [landing] + path
+            return None
+
+        path = extend(frm, captured)
+    if path is None:
+        raise ValueError('%r is not a capture sequence' % (move,))
+    return path
+
+
+def pdn_move(move, position=None):
+    """
+    A bitboard move in PDN: 11-15 for a step, 15x24x31 for a capture sequence with every landing square.
+    :param position: Optional BitBoard the move is played in, to check the squares of a capture (see jump_path).
+    :raise ValueError: If the move is a capture no sequence of jumps fits.
+    """
+    if not move[2]:
+        return '%d-%d' % (move[0] + 1, move[1] + 1)
+    return 'x'.join(str(sq + 1) for sq in [move[0]] + jump_path(move, position))
+
+
+def parse_pdn_move(text, position):
+    """
+    Finds the legal move a PDN move stands for.
+    :param text: The move, e.g. 11-15, 15x24x31, or 15x31 for a capture sequence given by its ends only.
+    :param position: The BitBoard the move is played in.
+    :raise ValueError: If the squares are not numbers from 1 to 32, or no legal move matches.
+    """
+    squares = [int(number) - 1 for number in re.split('[-x]', text)]
+    if len(squares) < 2 or not all(0 <= sq < 32 for sq in squares):
+        raise ValueError('%s is not a PDN move' % text)
+    capture = 'x' in text
+    candidates = [move for move in position.legal_moves()
+                  if move[0] == squares[0] and move[1] == squares[-1] and bool(move[2]) == capture]
+    # The squares jumped over when every landing square is given
+    captured = 0
+    for a, b in zip(squares, squares[1:]):
+        middle = next((NEIGHBOUR[d][a] for d in range(4) if NEIGHBOUR[d][a] >= 0 and NEIGHBOUR[d][NEIGHBOUR[d][a]] == b), -1)
+        captured = captured | 1 << middle if middle >= 0 and captured is not None else None
+    for move in candidates:
+        if move[2] == captured:
+            return move
+    if len(squares) == 2 and candidates:
+        # A step, or a capture sequence given by its ends only
+        return candidates[0]
+    raise ValueError('%s is not a legal move' % text)
+
+
+def fen(position):
+    # The PDN FEN tag of a position, e.g. B:W21,22,K30:B1,2,K9 with B (red) or W (white) to move
+    def squares(men, kings):
+        return ','.join(('K%d' if kings >> sq & 1 else '%d') % (sq + 1) for sq in range(32) if (men | kings) >> sq & 1)
+    return '%s:W%s:B%s' % ('B' if position.player == 1 else 'W', squares(position.white_men, position.white_kings),
+                           squares(position.red_men, position.red_kings))
+
+
+def position_from_fen(text):
+    """
+    Reads the position of a PDN FEN tag.
+    :param text: e.g. B:W21,22,K30:B1,2,K9, or W:W21-32:B1-12 with ranges of squares.
+    :return: A BitBoard.
+    :raise ValueError: If the text is not a FEN.
+    """
+    side, *colours = text.strip().rstrip('.').split(':')
+    if side not in ('B', 'W'):
+        raise ValueError('%s is not a FEN position' % text)
+    masks = {'B': [0, 0], 'W': [0, 0]}
+    for colour in colours:
+        if not colour or colour[0] not in masks:
+            raise ValueError('%s is not a FEN position' % text)
+        for item in colour[1:].split(','):
+            king = item.startswith('K')
+            item = item[1:] if king else item
+            if not item:
+                continue
+            first, _, last = item.partition('-')
+            for number in range(int(first), int(last or first) + 1):
+                masks[colour[0]][king] |= 1 << (number - 1)
+    return BitBoard(masks['B'][0], masks['B'][1], masks['W'][0], masks['W'][1], 1 if side == 'B' else -1)
+
+
+def _format_time(milliseconds):
+    return '%d.%03d' % divmod(milliseconds, 1000)
+
+
+def _parse_time(text):
+    # Seconds, or h:mm:ss with optional fractions, as milliseconds
+    seconds = 0.0
+    for part in text.split(':'):
+        seconds = seconds * 60 + float(part)
+    return int(round(seconds * 1000))
+
+
+def pdn(record):
+    # A game as PDN text: the tags, then the moves with the time of each in an %emt comment.
+    # Raises ValueError if a move is not legal
+    lines = ['[%s "%s"]' % (key, value.replace('"', "'")) for key, value in record.tags.items()
+             if key not in ('Result', 'FEN')]
+    lines.append('[Result "%s"]' % PDN_RESULTS[record.result])
+    if record.start.key() != BitBoard.initial().key():
+        lines.append('[FEN "%s"]' % fen(record.start))
+    words = []
+    number = 1
+    for ply, (position, move, time) in enumerate(record.replay()):
+        if position.player == 1:
+            words.append('%d.' % number)
+        elif ply == 0:
+            words.append('%d...' % number)
+        words.append(pdn_move(move, position))
+        if time is not None:
+            words.append('{[%%emt %s]}' % _format_time(time))
+        if position.player == -1:
+            number += 1
+    words.append(PDN_RESULTS[record.result])
+    line = ''
+    text = []
+    for word in words:
+        if line and len(line) + 1 + len(word) > PDN_LINE_WIDTH:
+            text.append(line)
+            line = word
+        else:
+            line = line + ' ' + word if line else word
+    text.append(line)
+    return '\n'.join(lines) + '\n\n' + '\n'.join(text) + '\n'
+
+
+def parse_pdn(text):
+    """
+    Reads one game of PDN text, checking its moves by playing them.
+    :return: A GameRecord.
+    :raise ValueError: If a move is not legal or the FEN tag cannot be read.
+    """
+    tags = {}
+    movetext = []
+    for line in text.splitlines():
+        match = _TAG_LINE.match(line)
+        if match and not movetext:
+            tags[match.group(1)] = match.group(2)
+        elif line.strip() or movetext:
+            movetext.append(line)
+    result = RESULTS_FROM_PDN.get(tags.pop('Result', '*'))
+    start = position_from_fen(tags.pop('FEN')) if 'FEN' in tags else BitBoard.initial()
+    record = GameRecord(start, result=result, tags=tags)
+    position = start.copy()
+    # Comments are replaced by a placeholder token so that an %emt comment stays after its move
+    comments = []
+
+    def keep_comment(match):
+        comments.append(match.group(1))
+        return ' {%d} ' % (len(comments) - 1)
+
+    for word in _COMMENT.sub(keep_comment, ' '.join(movetext)).split():
+        if word.startswith('{'):
+            elapsed = _ELAPSED_TIME.search(comments[int(word[1:-1])])
+            if elapsed and record.moves:
+                record.times[-1] = _parse_time(elapsed.group(1))
+        elif word in RESULTS_FROM_PDN:
+            record.result = RESULTS_FROM_PDN[word]
+        elif _MOVE.match(word):
+            move = parse_pdn_move(word, position)
+            record.add(move)
+            position.make_move(move)
+        elif not _MOVE_NUMBER.match(word):
+            raise ValueError('unexpected %r in the moves' % word)
+    return record
+
+
+def read_pdn(path):
+    """
+    Reads the games of a PDN file one at a time.
+    A game ends where the tags of the next one begin, so only one game is held in memory.
+    :return: Generator of GameRecords.
+    """
+    with open(path, encoding='utf-8') as f:
+        lines = []
+        in_moves = False
+        for line in f:
+            if _TAG_LINE.match(line) and in_moves:
+                yield parse_pdn(''.join(lines))
+                lines, in_moves = [], False
+            elif line.strip() and not _TAG_LINE.match(line):
+                in_moves = True
+            lines.append(line)
+        if any(line.strip() for line in lines):
+            yield parse_pdn(''.join(lines))
+
+
+class PdnWriter:
+    """
+    Writes games to a PDN file, one at a time.
+    :param path: The file to write.
+    :param append: Adds the games to the end of the file instead of replacing it.
+    """
+
+    def __init__(self, path, append=False):
+        self.file = open(path, 'a' if append else 'w', encoding='utf-8')
+        self.first = self.file.tell() == 0
+
+    def write(self, record):
+        if not self.first:
+            self.file.write('\n')
+        self.file.write(pdn(record))
+        self.first = False
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def encode_record(record):
+    # The bytes of a record in the archive format; raises ValueError if a tag is too long for it
+    parts = []
+    for key, value in record.tags.items():
+        key, value = str(key).encode('utf-8'), str(value).encode('utf-8')
+        if len(key) > MAX_TAG_KEY or len(value) > MAX_TAG_VALUE:
+            raise ValueError('tag %s is longer than %d bytes or its value longer than %d bytes'
+                             % (key[:40].decode('utf-8', 'replace'), MAX_TAG_KEY, MAX_TAG_VALUE))
+        parts += [TAG_KEY.pack(len(key)), key, TAG_VALUE.pack(len(value)), value]
+    for (frm, to, captured), time in zip(record.moves, record.times):
+        if captured:
+            parts += [MOVE.pack(frm | to << 5 | CAPTURE_FLAG), CAPTURED.pack(captured)]
+        else:
+            parts.append(MOVE.pack(frm | to << 5))
+        parts.append(TIME.pack(NO_TIME if time is None else min(time, NO_TIME - 1)))
+    body = b''.join(parts)
+    start = record.start
+    result = NO_RESULT if record.result is None else record.result
+    return GAME.pack(len(body), start.red_men, start.red_kings, start.white_men, start.white_kings, start.player,
+                     result, len(record.tags), len(record.moves)) + body
+
+
+def decode_record(header, body, moves=True):
+    """
+    Reads a record from its GAME struct and the bytes that follow it.
+    :param moves: Reads the moves too; without them the record has only its start, result and tags.
+    :return: A GameRecord.
+    """
+    size, red_men, red_kings, white_men, white_kings, player, result, tag_count, move_count = GAME.unpack(header)
+    tags = {}
+    offset = 0
+    for _ in range(tag_count):
+        length, = TAG_KEY.unpack_from(body, offset)
+        offset += TAG_KEY.size
+        key = body[offset:offset + length].decode('utf-8')
+        offset += length
+        length, = TAG_VALUE.unpack_from(body, offset)
+        offset += TAG_VALUE.size
+        tags[key] = body[offset:offset + length].decode('utf-8')
+        offset += length
+    record = GameRecord(BitBoard(red_men, red_kings, white_men, white_kings, player),
+                        result=None if result == NO_RESULT else result, tags=tags)
+    if moves:
+        for _ in range(move_count):
+            code, = MOVE.unpack_from(body, offset)
+            offset += MOVE.size
+            captured = 0
+            if code & CAPTURE_FLAG:
+                captured, = CAPTURED.unpack_from(body, offset)
+                offset += CAPTURED.size
+            time, = TIME.unpack_from(body, offset)
+            offset += TIME.size
+            record.add((code & 31, code >> 5 & 31, captured), None if time == NO_TIME else time)
+    return record
+
+
+class GameRecordWriter:
+    """
+    Writes games to an archive, one record at a time.
+    :param path: The file to write.
+    :param append: Adds the games to the end of an existing archive instead of replacing it.
+    :raise ValueError: If appending to a file that is not an archive of this version.
+    """
+
+    def __init__(self, path, append=False):
+        if append and os.path.exists(path) and os.path.getsize(path):
+            with open(path, 'rb') as f:
+                _check_header(f.read(HEADER.size), path)
+            self.file = open(path, 'ab')
+        else:
+            self.file = open(path, 'wb')
+            self.file.write(HEADER.pack(RECORD_MAGIC, RECORD_VERSION))
+
+    def write(self, record):
+        self.file.write(encode_record(record))
+
+    def write_encoded(self, data):
+        # Writes a record already encoded with encode_record, e.g. by a worker process
+        self.file.write(data)
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _check_header(data, path):
+    if len(data) < HEADER.size or HEADER.unpack(data) != (RECORD_MAGIC, RECORD_VERSION):
+        raise ValueError('%s is not a game archive of version %d' % (path, RECORD_VERSION))
+
+
+def read_records(path, moves=True):
+    """
+    Reads the games of an archive one at a time.
+    :param path: The archive.
+    :param moves: Reads the moves too. Without them, scans that only look at results and tags skip decoding the moves.
+    :return: Generator of GameRecords.
+    :raise ValueError: If the file is not an archive or ends in the middle of a record.
+    """
+    with open(path, 'rb') as f:
+        _check_header(f.read(HEADER.size), path)
+        while True:
+            header = f.read(GAME.size)
+            if not header:
+                return
+            size = GAME.unpack(header)[0] if len(header) == GAME.size else -1
+            body = f.read(size) if size >= 0 else b''
+            if size < 0 or len(body) != size:
+                raise ValueError('%s ends in the middle of a game' % path)
+            yield decode_record(header, body, moves)
+
+
+def _is_pdn(path):
+    return path.lower().endswith('.pdn')
+
+
+def read_games(path, moves=True):
+    # The games of a PDN file or an archive, by the extension of path
+    return read_pdn(path) if _is_pdn(path) else read_records(path, moves)
+
+
+def open_writer(path, append=False):
+    # A PdnWriter or a GameRecordWriter, by the extension of path
+    return PdnWriter(path, append) if _is_pdn(path) else GameRecordWriter(path, append)
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description='Check, filter and convert game archives and PDN files.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    check = commands.add_parser('check', help='replay every game and count the games, moves and results')
+    check.add_argument('input', help='a game archive, or a .pdn file')
+    convert = commands.add_parser('convert', help='copy the games that pass the filters to another file')
+    convert.add_argument('input', help='a game archive, or a .pdn file')
+    convert.add_argument('output', help='the file to write, a .pdn file or a game archive')
+    convert.add_argument('--append', action='store_true', help='add the games to the end of the output file')
+    convert.add_argument('--result', choices=RESULT_NAMES, help='only games with this result')
+    convert.add_argument('--tag', action='append', default=[], metavar='KEY=VALUE',
+                         help='only games with this tag, e.g. Black="level 5"; may be given more than once')
+    convert.add_argument('--min-plies', type=int, default=0, help='only games with at least this many moves')
+    options = parser.parse_args(arguments)
+
+    if options.command == 'check':
+        games = plies = errors = 0
+        results = dict.fromkeys(RESULT_NAMES, 0)
+        try:
+            for record in read_games(options.input):
+                games += 1
+                plies += len(record)
+                results[next(name for name, value in RESULT_NAMES.items() if value == record.result)] += 1
+                try:
+                    for _ in record.replay():
+                        pass
+                except ValueError as error:
+                    errors += 1
+                    print('game %d: %s' % (games, error))
+        except ValueError as error:
+            # The file cannot be read past this point
+            print('game %d: %s' % (games + 1, error))
+            return 1
+        print('%d games, %d moves, %s, %d with illegal moves' % (
+            games, plies, ', '.join('%d %s' % (count, name) for name, count in results.items()), errors))
+        return 1 if errors else 0
+
+    tags = [tag.split('=', 1) for tag in options.tag]
+    written = 0
+    with open_writer(options.output, options.append) as writer:
+        try:
+            for record in read_games(options.input):
+                if options.result is not None and record.result != RESULT_NAMES[options.result]:
+                    continue
+                if len(record) < options.min_plies or any(record.tags.get(key) != value for key, value in tags):
+                    continue
+                writer.write(record)
+                written += 1
+        except ValueError as error:
+            print('%s, after %d games: %s' % (options.input, written, error))
+            return 1
+    print('wrote %d games to %s' % (written, options.output))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,84 @@
+# Move ordering for the alpha-beta search. Alpha-beta cuts off the most
+# when the best move is searched first, so before a node's moves are searched
+# they are sorted by how likely they are to be best:
+#
+#   1. the best move stored for the position in the transposition table
+#   2. captures, kings before men
+#   3. killer moves: quiet moves that caused a cutoff at the same ply elsewhere
+#   4. everything else, by its history score
+#
+# The history score of a move goes up every time it causes a cutoff, by more
+# the deeper the node was.
+
+TT_MOVE_SCORE = 1 << 30
+CAPTURE_SCORE = 1 << 28
+KILLER_SCORE = 1 << 26
+CAPTURED_KING_VALUE = 2
+CAPTURED_MAN_VALUE = 1
+# Killer moves remembered per ply
+KILLER_SLOTS = 2
+# History scores are halved when one grows past this, so old cutoffs fade out
+HISTORY_LIMIT = 1 << 24
+
+
+class MoveOrdering:
+    """
+    Killer and history tables of one search, used to sort moves before they are searched.
+    """
+
+    def __init__(self):
+        self.killers = []
+        # One table per player (index 0 for player 1, 1 for player -1), indexed by from_sq * 32 + to_sq
+        self.history = [[0] * 1024, [0] * 1024]
+
+    def order(self, position, moves, ply, tt_move=None):
+        """
+        Sorts moves in place, most promising first.
+        :param position: The BitBoard the moves are for.
+        :param moves: The legal moves of the position.
+        :param ply: Distance of the position from the root of the search.
+        :param tt_move: Best move stored for the position in the transposition table, if any.
+        :return: The sorted list.
+        """
+        if len(moves) < 2:
+            return moves
+        killers = self.killers[ply] if ply < len(self.killers) else ()
+        history = self.history[0 if position.player == 1 else 1]
+        kings = position.red_kings | position.white_kings
+
+        def score(move):
+            if move == tt_move:
+                return TT_MOVE_SCORE
+            captured = move[2]
+            if captured:
+                return CAPTURE_SCORE + (CAPTURED_KING_VALUE if captured & kings else CAPTURED_MAN_VALUE)
+            if move in killers:
+                return KILLER_SCORE - killers.index(move)
+            return history[move[0] << 5 | move[1]]
+
+        moves.sort(key=score, reverse=True)
+        return moves
+
+    def record_cutoff(self, position, move, ply, depth):
+        """
+        Remembers a move that caused a beta cutoff.
+        :param position: The BitBoard the move was played from.
+        :param move: The move.
+        :param ply: Distance of the position from the root of the search.
+        :param depth: Remaining depth of the node.
+        """
+        if move[2]:
+            # Captures are already searched first
+            return
+        while len(self.killers) <= ply:
+            self.killers.append([])
+        killers = self.killers[ply]
+        if move not in killers:
+            killers.insert(0, move)
+            del killers[KILLER_SLOTS:]
+        history = self.history[0 if position.player == 1 else 1]
+        index = move[0] << 5 | move[1]
+        history[index] += depth * depth
+        if history[index] > HISTORY_LIMIT:
+            for i in range(1024):
+                history[i] >>= 1
@@ -0,0 +1,161 @@
+import argparse
+import mmap
+import os
+import struct
+import time
+from .bitboard import BitBoard
+from .algorithm import search_root, _search_position
+from .move_ordering import MoveOrdering
+from .transposition import TranspositionTable, encode_move
+
+# The book sits next to this module and is built with
+# `python -m engine.opening_book [--plies N] [--depth N]` from the main_game_file directory
+BOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'opening_book.bin')
+
+# File layout: a header, then one entry per position sorted by key so lookups can binary search
+# the mapped file in place. An entry is the position's BitBoard.hash, the from and to squares
+# of its best move as encode_move packs them, the captured mask of the move and the depth the
+# move was searched to.
+BOOK_MAGIC = b'CKBK'
+BOOK_VERSION = 2
+HEADER = struct.Struct('<4sHI')
+ENTRY = struct.Struct('<QHIB')
+
+# Defaults of the builder: book moves for the AI's first five turns, each searched 12 plies deep
+BOOK_PLIES = 10
+BOOK_DEPTH = 12
+# Lowest difficulty level that plays from the book. The book plays like a 12 ply search; from level 7
+# on the AI's own search reaches 9 plies or more in the opening, lower levels would play far above
+# their strength
+BOOK_MIN_LEVEL = 7
+
+# The book at BOOK_PATH, opened by the first OpeningBook.default() call
+_default_book = None
+
+
+class OpeningBook:
+    """
+    Read-only opening book, memory-mapped so that opening lookups cost a few
+    microseconds and every process using the book shares one copy of it.
+    Use OpeningBook.default() to get the book at BOOK_PATH, or None if it was not built.
+    :param path: Path of a book file written by build_book().
+    """
+
+    def __init__(self, path=BOOK_PATH):
+        with open(path, 'rb') as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.size = HEADER.unpack_from(self.data, 0)
+        if magic != BOOK_MAGIC or version != BOOK_VERSION:
+            self.data.close()
+            raise ValueError('%s is not an opening book of version %d' % (path, BOOK_VERSION))
+
+    @classmethod
+    def load(cls, path=BOOK_PATH):
+        # The book, or None when it is missing or unreadable: the AI then just searches
+        try:
+            return cls(path)
+        except (OSError, ValueError):
+            return None
+
+    @classmethod
+    def default(cls):
+        # The book at BOOK_PATH, opened once and shared by every caller in the process
+        global _default_book
+        if _default_book is None:
+            _default_book = cls.load() or False
+        return _default_book or None
+
+    def _find(self, key):
+        # Binary search for the entry of key; returns (move code, captured mask, depth) or None
+        low, high = 0, self.size
+        while low < high:
+            middle = (low + high) // 2
+            entry_key, code, captured, depth = ENTRY.unpack_from(self.data, HEADER.size + middle * ENTRY.size)
+            if entry_key == key:
+                return code, captured, depth
+            if entry_key < key:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+    def lookup(self, board, player=None):
+        """
+        Looks up the book move of a position.
+        :param board: Current state of the game, as a GameState or a BitBoard.
+        :param player: The player to move, by default the side to move of board.
+        :return: The book move as a bitboard (from_sq, to_sq, captured_mask) tuple, or None if the
+            position is not in the book.
+        """
+        position = _search_position(board, player)
+        entry = self._find(position.hash)
+        if entry is None:
+            return None
+        code, captured, depth = entry
+        # A book move that is not legal here can only come from a hash collision
+        for move in position.legal_moves():
+            if encode_move(move) == code and move[2] == captured:
+                return move
+        return None
+
+    def __len__(self):
+        return self.size
+
+    def close(self):
+        self.data.close()
+
+
+def build_book(path=BOOK_PATH, plies=BOOK_PLIES, depth=BOOK_DEPTH, player=1, verbose=False):
+    """
+    Builds an opening book for player and writes it to path. Every position of the first plies
+    plies where player is to move is searched to depth and gets its best move in the book; the
+    opponent's moves are all followed, the book's own moves only.
+    :param path: The file to write.
+    :param plies: How many plies from the start position the book covers.
+    :param depth: Search depth of every book position.
+    :param player: The player the book plays for; 1 is the AI.
+    :param verbose: Prints progress when True.
+    :return: The number of positions in the book.
+    """
+    table = TranspositionTable(64)
+    entries = {}
+    frontier = [BitBoard.initial()]
+    start = time.perf_counter()
+    for ply in range(plies):
+        next_frontier = {}
+        for position in frontier:
+            moves = position.legal_moves()
+            if position.player == player and moves:
+                if len(moves) > 1:
+                    table.new_search()
+                    score, move = search_root(position.copy(), depth, table, ordering=MoveOrdering())
+                    entries[position.hash] = (encode_move(move), move[2], depth)
+                else:
+                    move = moves[0]
+                moves = [move]
+            for move in moves:
+                child = position.apply(move)
+                next_frontier[child.hash] = child
+        frontier = list(next_frontier.values())
+        if verbose:
+            print('ply %d: %d book positions, %.1f s' % (ply + 1, len(entries), time.perf_counter() - start))
+
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(BOOK_MAGIC, BOOK_VERSION, len(entries)))
+        for key in sorted(entries):
+            f.write(ENTRY.pack(key, *entries[key]))
+    return len(entries)
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description='Build the opening book of the AI.')
+    parser.add_argument('--plies', type=int, default=BOOK_PLIES, help='plies from the start position the book covers')
+    parser.add_argument('--depth', type=int, default=BOOK_DEPTH, help='search depth of every book position')
+    parser.add_argument('--output', default=BOOK_PATH, help='the book file to write')
+    options = parser.parse_args(arguments)
+    count = build_book(options.output, options.plies, options.depth, verbose=True)
+    print('wrote %d positions to %s' % (count, options.output))
+
+
+if __name__ == '__main__':
+    main()
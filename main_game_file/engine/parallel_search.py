@@ -0,0 +1,285 @@
+# Parallel root search: the root moves of a search spread over a pool of worker
+# processes. It is the `workers` option of generate_best_move and
+# iterative_deepening in algorithm.py.
+#
+# Its speedup over the serial search is measured with
+#
+#   python -m engine.parallel_search [--depth N] [--table]
+#
+# (from the main_game_file directory), which times generate_best_move on a few
+# positions with 1, 2, 4 and 8 worker processes and checks that every worker
+# count picks the same moves. So far it has only been measured on machines where
+# it is slower than the serial search at every worker count:
+#
+#   review machine:          0.91x, 0.57x, 0.51x, 0.45x with 1, 2, 4, 8 workers
+#   one core, --depth 8:     0.94x, 0.75x, 0.60x, 0.67x
+#
+# The difficulty levels therefore search serially. Numbers from a multi-core
+# machine showing a speedup are needed before a level may use workers.
+
+import argparse
+import itertools
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from .algorithm import SearchAborted, SearchControl, SearchStats, generate_best_move, minimax_alpha_beta
+from .bitboard import BitBoard
+from .move_ordering import MoveOrdering
+from .transposition import TranspositionTable, EXACT
+
+# How often, in seconds, a parallel root search checks its budget while its workers search
+PARALLEL_POLL_INTERVAL = 0.005
+
+# Pools of worker processes for parallel root searches, by number of workers. A pool is started by the
+# first search that asks for it and kept for the life of the process, as (executor, shared array, lock).
+# The shared array holds the best root score so far, the index of its root move, a stop flag and the
+# number of nodes the workers searched.
+_root_pools = {}
+_root_pools_lock = threading.Lock()
+# Ids of parallel searches, so that workers know when their table and move ordering start a new search
+_root_search_ids = itertools.count(1)
+
+
+def new_search_id():
+    # Id of a new parallel search, kept by iterative_deepening for all of its iterations
+    return next(_root_search_ids)
+
+
+# Set in each worker process: the shared array of its pool, and the table and move ordering it keeps
+# from one root move to the next of the same search
+_worker_shared = None
+_worker_search = (None, None, None)
+
+
+def _init_root_worker(shared):
+    global _worker_shared
+    _worker_shared = shared
+
+
+class _WorkerControl(SearchControl):
+    """
+    Control of a root move searched in a worker process. It has no budget of its own: it adds its
+    nodes to the count of the pool, which the process that runs the search checks against the
+    budget, and aborts when that process sets the stop flag.
+    """
+
+    def tick(self):
+        self.nodes += 1
+        if self.nodes % self.CLOCK_INTERVAL == 0:
+            with _worker_shared.get_lock():
+                _worker_shared[3] += self.CLOCK_INTERVAL
+                stopped = _worker_shared[2]
+            if stopped:
+                raise SearchAborted()
+
+
+def _score_root_move(search_id, table_size, key, evaluation, index, move, depth, with_stats):
+    """
+    Scores one root move in a worker process, using the best score any worker has
+    found so far as its bound. The serial search keeps the first of several equally
+    good moves, so if the best so far comes from a later root move the bound is
+    loosened by one to get the exact score of a move that only ties with it. Scores
+    are whole numbers, so a score past the bound still proves the move is not chosen.
+    :param search_id: Id of the search; the worker's table and move ordering carry over between
+        the root moves and iterations of one search.
+    :param table_size: size_mb of the worker's TranspositionTable, or None to search without one.
+    :param key: BitBoard.key() of the root position.
+    :param evaluation: The Evaluation of the root position.
+    :param index: Position of the move in the root move list.
+    :param move: The root move to score.
+    :param depth: The depth of the whole search, root included.
+    :param with_stats: Whether to return the SearchStats of the move.
+    :return: A (score, SearchStats or None) tuple, or None if the search was stopped. The score is
+        a bound if the move is not the one chosen.
+    """
+    global _worker_search
+    if _worker_search[0] != search_id:
+        table = _worker_search[1]
+        if table_size is None:
+            table = None
+        elif table is None or table.size_mb != table_size:
+            table = TranspositionTable(table_size)
+        if table is not None:
+            table.new_search()
+        _worker_search = (search_id, table, MoveOrdering())
+    search_id, table, ordering = _worker_search
+    if _worker_shared[2]:
+        # The search was stopped before this move started
+        return None
+
+    position = BitBoard(*key, evaluation=evaluation)
+    player = position.player
+    position.make_move(move)
+    control = _WorkerControl()
+    stats = SearchStats() if with_stats else None
+    with _worker_shared.get_lock():
+        bound, best_index = _worker_shared[0], _worker_shared[1]
+    if best_index > index:
+        bound = bound - 1 if player == 1 else bound + 1
+    try:
+        if player == 1:
+            score = minimax_alpha_beta(position, depth - 1, bound, float('inf'), False, table, control, ordering, 1, stats)
+        else:
+            score = minimax_alpha_beta(position, depth - 1, float('-inf'), bound, True, table, control, ordering, 1, stats)
+    except SearchAborted:
+        return None
+    finally:
+        with _worker_shared.get_lock():
+            _worker_shared[3] += control.nodes % control.CLOCK_INTERVAL
+    with _worker_shared.get_lock():
+        better = score > _worker_shared[0] if player == 1 else score < _worker_shared[0]
+        if better or (score == _worker_shared[0] and index < _worker_shared[1]):
+            _worker_shared[0], _worker_shared[1] = score, index
+    return score, stats
+
+
+def _root_pool(workers):
+    # The pool of that many worker processes, started on first use
+    with _root_pools_lock:
+        if workers not in _root_pools:
+            # Forked workers inherit the already imported engine; spawned workers re-import the engine package only
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+            shared = context.Array('d', 4)
+            executor = ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                           initializer=_init_root_worker, initargs=(shared,))
+            _root_pools[workers] = (executor, shared, threading.Lock())
+        return _root_pools[workers]
+
+
+def parallel_search_root(workers, position, depth, table=None, control=None, first_move=None, stats=None,
+                         search_id=None):
+    """
+    search_root with the root moves spread over a pool of worker processes.
+
+    The first root move is searched on its own to get a bound (the "young
+    brothers wait" idea), then the other root moves are searched in parallel.
+    Every worker reads the best score found so far before it starts a move and
+    publishes any improvement, so later moves are searched with a tight bound.
+    Each worker searches with MoveOrdering and, when table is given, a
+    TranspositionTable of its own of the same size; both carry over between the
+    root moves and iterations of one search. Without a table the chosen move is
+    the same as search_root's at the same depth. One search runs on a pool at a time.
+    :param workers: Number of worker processes.
+    :param position: The BitBoard to search.
+    :param depth: The depth of the search tree.
+    :param table: Optional TranspositionTable; it gets the result of the root.
+    :param control: Optional SearchControl, checked every PARALLEL_POLL_INTERVAL seconds; its node
+        count includes the nodes of the workers.
+    :param first_move: Optional move to search first.
+    :param stats: Optional SearchStats; the counts of the workers are added to it.
+    :param search_id: Id of the search the iteration belongs to, from iterative_deepening; None for a new search.
+    :return: A (best score, best bitboard move) tuple; the move is None if there are no legal moves.
+    :raise SearchAborted: When control stops the search or its budget runs out.
+    """
+    if stats is not None:
+        stats.nodes += 1
+    player = position.player
+    moves = position.legal_moves(player)
+    if not moves:
+        return (float('-inf') if player == 1 else float('inf')), None
+    if first_move in moves:
+        moves.remove(first_move)
+        moves.insert(0, first_move)
+    if search_id is None:
+        search_id = next(_root_search_ids)
+    table_size = table.size_mb if table is not None else None
+    key = position.key()
+    base_nodes = control.nodes if control is not None else 0
+
+    executor, shared, lock = _root_pool(workers)
+    with lock:
+        with shared.get_lock():
+            shared[0], shared[1], shared[2], shared[3] = (float('-inf') if player == 1 else float('inf')), len(moves), 0, 0
+        scores = [None] * len(moves)
+
+        def submit(index):
+            return executor.submit(_score_root_move, search_id, table_size, key, position.evaluation, index,
+                                   moves[index], depth, stats is not None)
+
+        pending = {submit(0): 0}
+        aborted = False
+        while pending:
+            done, _ = wait(pending, timeout=PARALLEL_POLL_INTERVAL, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = pending.pop(future)
+                result = future.result()
+                if result is None:
+                    aborted = True
+                    continue
+                scores[index] = result[0]
+                if stats is not None:
+                    stats.add(result[1])
+                if index == 0 and not aborted:
+                    pending.update((submit(index), index) for index in range(1, len(moves)))
+            if control is not None and not aborted:
+                control.nodes = base_nodes + int(shared[3])
+                if control.stopped or (control.enabled and (
+                        (control.node_limit is not None and control.nodes > control.node_limit)
+                        or (control.deadline is not None and time.perf_counter() >= control.deadline))):
+                    # The running moves abort at their next check; the queued ones as soon as they start
+                    aborted = True
+                    with shared.get_lock():
+                        shared[2] = 1
+        if control is not None:
+            control.nodes = base_nodes + int(shared[3])
+    if aborted:
+        raise SearchAborted()
+
+    # Same choice as the serial search: the first move with the best score
+    best_index = 0
+    for index, score in enumerate(scores):
+        if (score > scores[best_index]) if player == 1 else (score < scores[best_index]):
+            best_index = index
+    if table is not None:
+        table.store(position.hash, depth, scores[best_index], EXACT, moves[best_index])
+    return scores[best_index], moves[best_index]
+
+
+def _benchmark_positions():
+    # The start position and the positions after a few plies of a quick self-play game
+    position = BitBoard.initial()
+    positions = [position.copy()]
+    for ply in range(12):
+        move = generate_best_move(position, 2)
+        if move is None:
+            break
+        position.make_move(move)
+        if ply % 4 == 3:
+            positions.append(position.copy())
+    return positions
+
+
+def report_speedup(depth=10, worker_counts=(1, 2, 4, 8), use_table=False):
+    # Times the serial search and the parallel search with each worker count and checks they agree.
+    # With use_table every search gets a new TranspositionTable; tables can change which of two
+    # equally good moves is found, so the moves may then differ from the serial search
+    positions = _benchmark_positions()
+
+    def search(workers):
+        start = time.perf_counter()
+        moves = [generate_best_move(position, depth, table=TranspositionTable() if use_table else None,
+                                    workers=workers) for position in positions]
+        return moves, time.perf_counter() - start
+
+    serial_moves, serial_time = search(None)
+    print('serial: %.2f s' % serial_time)
+    for workers in worker_counts:
+        # The first search starts the worker processes
+        generate_best_move(positions[0], 1, workers=workers)
+        moves, elapsed = search(workers)
+        print('%d workers: %.2f s, speedup %.2fx, same moves as serial: %s'
+              % (workers, elapsed, serial_time / elapsed, moves == serial_moves))
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description='Measure the speedup of the parallel root search.')
+    parser.add_argument('--depth', type=int, default=10, help='depth of every search')
+    parser.add_argument('--table', action='store_true', help='search with a transposition table')
+    options = parser.parse_args(arguments)
+    report_speedup(options.depth, use_table=options.table)
+
+
+if __name__ == '__main__':
+    main()
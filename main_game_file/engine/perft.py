@@ -0,0 +1,156 @@
+# Perft: counts the leaf nodes of the full move tree to a fixed depth. The
+# counts check a move generator exactly, and the time taken measures its
+# speed. Both move generators of the engine can be counted: the bitboard one
+# used by the search, and the grid rules of GameState used by the game, so a
+# change to either can be checked against the other and against the
+# reference counts below.
+#
+#   python -m engine.perft 8              counts from the start position
+#   python -m engine.perft 6 --divide     with the count below every root move
+#   python -m engine.perft 6 --grid       with GameState instead of BitBoard
+#   python -m engine.perft --check        checks the reference counts and that both generators agree
+#
+# (from the main_game_file directory). Like the search, perft plays a whole
+# capture sequence as a single move.
+
+import argparse
+import sys
+import time
+from .bitboard import BitBoard
+from .state import GameState, create_checkerboard_array
+
+# Leaf counts of the start position for depth 1, 2, 3, ... They are the published
+# counts of English draughts: crowning a man that captures a king, the one rule
+# of this game that differs, cannot happen this early.
+REFERENCE_COUNTS = [7, 49, 302, 1469, 7361, 36768, 179740, 845931, 3963680, 18391564]
+# Deepest reference count checked by --check, and the depth at which it compares the two generators
+CHECK_REFERENCE_DEPTH = 8
+CHECK_DEPTH = 5
+
+
+class PerftCounter:
+    """
+    Counts leaf nodes, and the moves generated on the way, for one move generator.
+    :param position: A BitBoard or a GameState. It is searched in place and restored afterwards.
+    """
+
+    def __init__(self, position):
+        self.position = position
+        self.moves_generated = 0
+
+    def _moves(self):
+        return self.position.legal_moves()
+
+    def count(self, depth):
+        # Number of leaf nodes depth plies below the position
+        moves = self._moves()
+        self.moves_generated += len(moves)
+        if depth == 1:
+            return len(moves)
+        nodes = 0
+        for move in moves:
+            undo = self.position.make_move(move)
+            nodes += self.count(depth - 1)
+            self.position.unmake_move(undo)
+        return nodes
+
+    def divide(self, depth):
+        """
+        Counts the leaf nodes below every root move.
+        :param depth: The depth of the count, root move included.
+        :return: A list of ((start_row, start_col, end_row, end_col), nodes) pairs in generation order.
+        """
+        result = []
+        for move in self._moves():
+            undo = self.position.make_move(move)
+            nodes = self.count(depth - 1) if depth > 1 else 1
+            self.position.unmake_move(undo)
+            result.append((self._rc(move), nodes))
+        return result
+
+    def _rc(self, move):
+        if isinstance(self.position, BitBoard):
+            return self.position.move_to_rc(move)[:4]
+        return tuple(move[:4])
+
+
+def start_position(grid=False):
+    # The start position of the game, as a GameState when grid is True, otherwise as a BitBoard
+    if grid:
+        return GameState(create_checkerboard_array())
+    return BitBoard.initial()
+
+
+def perft(position, depth):
+    """
+    Counts the leaf nodes of position to depth.
+    :return: A (nodes, moves generated, seconds) tuple.
+    """
+    counter = PerftCounter(position)
+    start = time.perf_counter()
+    nodes = counter.count(depth) if depth > 0 else 1
+    return nodes, counter.moves_generated, time.perf_counter() - start
+
+
+def check(depth=CHECK_DEPTH, reference_depth=CHECK_REFERENCE_DEPTH):
+    """
+    Checks the bitboard generator against REFERENCE_COUNTS up to reference_depth, and the GameState
+    generator against the bitboard one move by move at depth.
+    :return: A list of problems found; empty when everything agrees.
+    """
+    problems = []
+    for ply, expected in enumerate(REFERENCE_COUNTS[:reference_depth], 1):
+        nodes = perft(start_position(), ply)[0]
+        if nodes != expected:
+            problems.append('depth %d: %d nodes, expected %d' % (ply, nodes, expected))
+    bitboard = PerftCounter(start_position()).divide(depth)
+    grid = PerftCounter(start_position(grid=True)).divide(depth)
+    if bitboard != grid:
+        problems.append('the generators disagree at depth %d: bitboard %s, grid %s' % (depth, bitboard, grid))
+    return problems
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description='Count the move tree of a checkers position.')
+    parser.add_argument('depth', type=int, nargs='?', default=6, help='depth of the count')
+    parser.add_argument('--grid', action='store_true', help='count with the GameState rules instead of the bitboards')
+    parser.add_argument('--divide', action='store_true', help='show the count below every root move')
+    parser.add_argument('--position', type=lambda value: int(value, 0), nargs=5,
+                        metavar=('RED_MEN', 'RED_KINGS', 'WHITE_MEN', 'WHITE_KINGS', 'PLAYER'),
+                        help='bitboard masks and player to move of the position to count, instead of the start')
+    parser.add_argument('--check', action='store_true', help='check the reference counts and compare both generators')
+    options = parser.parse_args(arguments)
+
+    if options.check:
+        problems = check()
+        for problem in problems:
+            print(problem)
+        print('perft check %s' % ('failed' if problems else 'passed'))
+        return 1 if problems else 0
+
+    position = start_position(options.grid)
+    if options.position:
+        position = BitBoard(*options.position)
+        if options.grid:
+            grid = GameState(create_checkerboard_array())
+            grid.load_bitboard(position)
+            position = grid
+
+    if options.divide:
+        start = time.perf_counter()
+        total = 0
+        for move, nodes in PerftCounter(position).divide(options.depth):
+            print('%s: %d' % (move, nodes))
+            total += nodes
+        print('total: %d nodes in %.3f s' % (total, time.perf_counter() - start))
+        return 0
+
+    for depth in range(1, options.depth + 1):
+        nodes, generated, elapsed = perft(position, depth)
+        rate = generated / elapsed if elapsed > 0 else 0
+        print('depth %2d: %10d nodes %8.3f s %10.0f moves generated/s' % (depth, nodes, elapsed, rate))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,20 @@
+class Piece:
+    def __init__(self, player, row, col):
+        self.player = player   # The player to which the piece belongs (-1 or 1)
+        self.row = row   # The row of the piece on the board
+        self.col = col   # The column of the piece on the board
+        self.king = False   # Whether the piece is a king or not
+
+    @property
+    def is_king(self):
+        return self.king   # Check whether the piece is a king or not
+
+    def promote_to_king(self):
+        self.king = True   # Promote the piece to a king
+
+    def move(self, row, col):
+        self.row = row   # Update the row of the piece on the board
+        self.col = col   # Update the column of the piece on the board
+
+    def __repr__(self):
+        return str(self.player)   # Return the player number of the piece as a string
@@ -0,0 +1,231 @@
+# A line-based text protocol, modelled on UCI, that serves the engine from a
+# separate process. The engine reads commands on stdin and answers on stdout,
+# so it runs in its own process, on another host behind ssh or a socket
+# forwarder, or as several builds at once:
+#
+#   python -m engine.protocol
+#
+# (from the main_game_file directory). Moves are in PDN notation (see
+# game_record.py): 11-15 for a step, 15x24x31 for a capture sequence with every
+# landing square. Commands:
+#
+#   uci                       answered with `id name ...` and `uciok`
+#   isready                   answered with `readyok`
+#   ucinewgame                forget the searches of the previous game
+#   setoption name OwnBook value true|false
+#                             play book moves in the opening (the default) or always search
+#   position startpos [moves <move> ...]
+#   position fen <fen> [moves <move> ...]
+#                             set the position, as a PDN FEN tag, and the moves played from it
+#   go [depth <plies>] [nodes <count>] [movetime <ms>] [infinite] [ponder]
+#                             search the position; ends with `bestmove <move>` or `bestmove none`
+#   stop                      end the search now; its best move so far is sent
+#   ponderhit                 the move pondered on was played: the `go ponder` search
+#                             goes on as a normal search; its node limit counts the
+#                             nodes from the start of the search, its time limit runs
+#                             from ponderhit
+#   quit
+#
+# A search sends `info depth <plies> score cp <score> nodes <count> time <ms> pv <move>`
+# after every iteration, with the score for the side to move in hundredths of a man.
+# After `go infinite` or `go ponder` the best move is only sent once `stop` or
+# `ponderhit` arrives, even if the search ends before. Errors are reported as
+# `info string <message>`.
+
+import sys
+import threading
+import time
+from .algorithm import MAX_SEARCH_DEPTH, SearchControl, iterative_deepening
+from .bitboard import BitBoard
+from .game_record import parse_pdn_move, pdn_move, position_from_fen
+from .opening_book import OpeningBook
+from .transposition import TranspositionTable
+
+ENGINE_NAME = 'Checkers engine'
+
+
+class EngineServer:
+    """
+    Serves the engine over the protocol above. Commands are read on the calling thread and every
+    search runs on a thread of its own, so `stop` and `ponderhit` are handled while it searches.
+    :param output: The text stream the answers are written to.
+    """
+
+    def __init__(self, output=sys.stdout):
+        self.output = output
+        self.output_lock = threading.Lock()
+        self.position = BitBoard.initial()
+        self.table = TranspositionTable()
+        self.book = OpeningBook.default()
+        # Whether searches play the book move of a position in the book
+        self.own_book = True
+        self.thread = None
+        self.control = None
+        # Set when the best move of an infinite or ponder search may be sent
+        self.released = None
+        # (time limit, node limit) a ponder search gets on ponderhit
+        self.ponder_limits = None
+
+    def send(self, line):
+        with self.output_lock:
+            self.output.write(line + '\n')
+            self.output.flush()
+
+    def run(self, lines=sys.stdin):
+        # Handles the commands of lines, e.g. stdin, until `quit` or the end of the input
+        try:
+            for line in lines:
+                if not self.handle(line):
+                    break
+        finally:
+            self.stop()
+
+    def handle(self, line):
+        # Handles one command; returns False after `quit`
+        words = line.split()
+        if not words:
+            return True
+        command, arguments = words[0], words[1:]
+        if command == 'uci':
+            self.send('id name %s' % ENGINE_NAME)
+            self.send('option name OwnBook type check default true')
+            self.send('uciok')
+        elif command == 'isready':
+            self.send('readyok')
+        elif command == 'ucinewgame':
+            self.stop()
+            self.table = TranspositionTable()
+        elif command == 'setoption':
+            self.set_option(arguments)
+        elif command == 'position':
+            self.stop()
+            self.set_position(arguments)
+        elif command == 'go':
+            self.stop()
+            self.go(arguments)
+        elif command == 'stop':
+            self.stop()
+        elif command == 'ponderhit':
+            self.ponderhit()
+        elif command == 'quit':
+            return False
+        else:
+            self.send('info string unknown command %s' % command)
+        return True
+
+    def set_option(self, arguments):
+        # setoption name <name> value <value>
+        if arguments[:1] != ['name'] or 'value' not in arguments:
+            self.send('info string setoption takes name and value')
+            return
+        split = arguments.index('value')
+        name, value = ' '.join(arguments[1:split]), ' '.join(arguments[split + 1:])
+        if name == 'OwnBook' and value in ('true', 'false'):
+            self.own_book = value == 'true'
+        else:
+            self.send('info string unknown option %s' % name)
+
+    def set_position(self, arguments):
+        # position startpos|fen <fen> [moves ...]; on an error the position is left as it was
+        try:
+            if arguments[:1] == ['startpos']:
+                position, rest = BitBoard.initial(), arguments[1:]
+            elif arguments[:1] == ['fen'] and len(arguments) > 1:
+                position, rest = position_from_fen(arguments[1]), arguments[2:]
+            else:
+                raise ValueError('position needs startpos or fen')
+            if rest and rest[0] != 'moves':
+                raise ValueError('unexpected %s' % rest[0])
+            for text in rest[1:]:
+                position.make_move(parse_pdn_move(text, position))
+        except ValueError as error:
+            self.send('info string %s' % error)
+            return
+        self.position = position
+
+    def go(self, arguments):
+        # go [depth N] [nodes N] [movetime MS] [infinite] [ponder]
+        limits = {'depth': None, 'nodes': None, 'movetime': None}
+        infinite = ponder = False
+        words = iter(arguments)
+        try:
+            for word in words:
+                if word in limits:
+                    limits[word] = int(next(words))
+                elif word == 'infinite':
+                    infinite = True
+                elif word == 'ponder':
+                    ponder = True
+                else:
+                    raise ValueError('unexpected %s' % word)
+        except (ValueError, StopIteration):
+            self.send('info string go takes depth, nodes and movetime with a number, infinite and ponder')
+            return
+        time_limit = limits['movetime'] / 1000 if limits['movetime'] is not None else None
+        max_depth = limits['depth'] or MAX_SEARCH_DEPTH
+        if ponder:
+            # The node limit sets the strength of the search, so it holds while pondering too;
+            # the time limit only applies from ponderhit on
+            self.ponder_limits = (time_limit, limits['nodes'])
+            self.control = SearchControl(None, limits['nodes'])
+        else:
+            self.ponder_limits = None
+            self.control = SearchControl(time_limit, limits['nodes'])
+        self.released = threading.Event()
+        if not (infinite or ponder):
+            self.released.set()
+        self.thread = threading.Thread(target=self._search, daemon=True,
+                                       args=(self.position.copy(), self.control, self.released, max_depth, not infinite))
+        self.thread.start()
+
+    def _search(self, position, control, released, max_depth, use_book):
+        start = time.perf_counter()
+
+        def report(depth, score, move, nodes):
+            self.send('info depth %d score cp %d nodes %d time %d pv %s' % (
+                depth, score * position.player, nodes, (time.perf_counter() - start) * 1000,
+                pdn_move(move, position)))
+
+        move = self.book.lookup(position) if use_book and self.own_book and self.book is not None else None
+        if move is not None:
+            self.send('info string book move')
+        else:
+            move, depth = iterative_deepening(position, table=self.table, max_depth=max_depth, control=control,
+                                              callback=report)
+            moves = position.legal_moves()
+            if move is None and moves:
+                # Stopped before the first iteration finished; any legal move beats none
+                move = moves[0]
+        released.wait()
+        self.send('bestmove %s' % (pdn_move(move, position) if move is not None else 'none'))
+
+    def ponderhit(self):
+        # The ponder search goes on with its limits, and sends its move when it ends
+        if self.thread is not None and self.ponder_limits is not None:
+            # The first iteration runs without limits, as in any search, and the nodes searched
+            # while pondering stay counted
+            enabled, nodes = self.control.enabled, self.control.nodes
+            self.control.reset(*self.ponder_limits)
+            self.control.enabled, self.control.nodes = enabled, nodes
+            self.ponder_limits = None
+            self.released.set()
+
+    def stop(self):
+        # Ends the running search, if any, once it has sent its best move
+        if self.thread is not None:
+            self.control.stop()
+            self.released.set()
+            self.thread.join()
+            self.thread = None
+            self.ponder_limits = None
+
+
+def main():
+    # Line buffered, so that every answer reaches the client straight away
+    sys.stdout.reconfigure(line_buffering=True)
+    EngineServer(sys.stdout).run(sys.stdin)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
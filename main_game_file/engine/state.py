@@ -0,0 +1,565 @@
+from copy import deepcopy
+from .piece import Piece
+from .bitboard import BitBoard, popcount
+from .transposition import TranspositionTable
+from .opening_book import OpeningBook, BOOK_MIN_LEVEL
+
+# Size of the board and the directions a piece can move in
+BOARD_SIZE = 8
+DIRECTIONS = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+
+
+def create_checkerboard_array():
+    """
+    Creates a 2D array representing the checkerboard with alternating black and white squares.
+    Also places initial pieces on the board in their starting positions.
+    """
+    return [
+        [(row + col) % 2 if row < 3 else (-1 if (row + col) % 2 == 1 else 0) if row >= 5 else 0
+         for col in range(8)]
+        for row in range(8)
+    ]
+
+
+class GameState():
+    """
+    The rules of the game on an 8x8 grid of Piece objects: move generation, move
+    application, promotion and the winner check. It has no display; Board draws
+    it with pygame and handles the mouse.
+
+    The number of men and kings of each side is kept in `men` and `kings`, dicts
+    of player -> count. move_piece, make_move and load_bitboard keep them up to
+    date, so the winner check and the piece counts do not scan the grid.
+    Assigning a whole new grid to `board` counts its pieces from scratch.
+    """
+    # Class of the pieces created on the grid; Board uses pieces that can draw themselves
+    piece_class = Piece
+
+    def __init__(self, board, current_player = 1):
+        # Initializes the GameState with the given board array, where 1 and -1 are the players' pieces and 0 is empty
+        self.board = []
+        self.current_player = current_player
+        self.messages = ""
+        self._transposition_table = None
+        self.create_pieces(board)
+
+    @property
+    def transposition_table(self):
+        # Search results are kept for the whole game so later AI moves and hints can reuse them.
+        # The table is allocated by the first search, so positions that are never searched stay small
+        if self._transposition_table is None:
+            self._transposition_table = TranspositionTable()
+        return self._transposition_table
+
+    @property
+    def board(self):
+        return self._board
+
+    @board.setter
+    def board(self, board):
+        self._board = board
+        self.recount_pieces()
+
+    # Replace the grid together with its counts of men and kings, which the caller has worked out
+    def _set_board(self, board, men, kings):
+        self._board = board
+        self.men, self.kings = men, kings
+
+    # Count the men and kings of both sides from scratch
+    def recount_pieces(self):
+        self.men = {1: 0, -1: 0}
+        self.kings = {1: 0, -1: 0}
+        for row in self._board:
+            for piece in row:
+                if isinstance(piece, Piece):
+                    if piece.king:
+                        self.kings[piece.player] += 1
+                    else:
+                        self.men[piece.player] += 1
+
+    # Report a message about the last move; Board shows it in the window caption
+    def update_caption(self, message):
+        self.messages = message
+
+    def get_piece(self, row, col):
+        # Returns the piece object at the given (row, col) position on the board.
+        return self.board[row][col]
+
+    # Create the pieces on the board from the input board
+    def create_pieces(self, board):
+        grid = []
+        for row in range(BOARD_SIZE):
+            grid.append([])
+            for col in range(BOARD_SIZE):
+                piece = board[row][col]
+                if piece != 0:
+                    piece_obj = self.piece_class(piece, row, col)
+                    grid[row].append(piece_obj)
+                else:
+                    grid[row].append(None)
+        self.board = grid
+
+    # Convert the board to the BitBoard used by the AI search
+    def to_bitboard(self):
+        return BitBoard.from_grid(self.board, self.current_player)
+
+    # Replace the pieces and the player to move with the contents of a BitBoard
+    def load_bitboard(self, position):
+        grid = [[None] * BOARD_SIZE for _ in range(BOARD_SIZE)]
+        for row, col, player, king in position.pieces():
+            piece = self.piece_class(player, row, col)
+            if king:
+                piece.promote_to_king()
+            grid[row][col] = piece
+        self._set_board(grid, {1: popcount(position.red_men), -1: popcount(position.white_men)},
+                        {1: popcount(position.red_kings), -1: popcount(position.white_kings)})
+        self.current_player = position.player
+
+    def generate_moves(self, board, player, row=None, col=None, target=None, king=False):
+        moves = []  # List to store all possible moves for the player
+
+        if row is not None and col is not None:  # If row and column arguments are provided
+            piece_moves = self._generate_moves_for_piece(board, player, row, col, target, king)  # Generate moves for the specified piece
+            moves.extend(piece_moves)  # Add the moves to the list of moves
+            captures = self.generate_captures(board, player, row, col, king)  # Generate captures for the specified piece
+            moves.extend(captures)  # Add the captures to the list of moves
+        else:  # If row and column arguments are not provided
+            for r in range(8):  # Loop through all rows
+                for c in range(8):  # Loop through all columns
+                    cell = board[r][c]  # Get the piece at the current position
+                    piece = cell if isinstance(cell, Piece) else None  # If the current position has a piece object, set the piece variable, otherwise set it to None
+                    if piece is not None and piece.player == player:  # If the piece belongs to the current player
+                        piece_moves = self._generate_moves_for_piece(board, player, r, c, target, piece.king)  # Generate moves for the piece
+                        moves.extend(piece_moves)  # Add the moves to the list of moves
+                        captures = self.generate_captures(board, player, r, c, piece.king)  # Generate captures for the piece
+                        moves.extend(captures)  # Add the captures to the list of moves
+        return moves  # Return the list of all possible moves for the player
+
+    def _generate_moves_for_piece(self, board, player, row, col, target=None, king=False):
+        moves = []  # List to store all possible moves for the piece
+        directions = DIRECTIONS  # Set the directions to move based on the player's direction
+        if king:  # If the piece is a king
+            directions = DIRECTIONS + DIRECTIONS  # Allow the king to move in all directions
+
+        for dr, dc in directions:  # Loop through all the directions
+            r, c = row + dr, col + dc  # Get the position after moving in the current direction
+            row_diff = r - row  # Calculate the difference in rows between the current position and the new position
+            if 0 <= r < 8 and 0 <= c < 8 and board[r][c] is None and ((player == 1 and row_diff > 0) or (player == -1 and row_diff < 0) or king):  # If the new position is within the board, is empty
+                if target is None or (r, c) == target:
+                    moves.append((row, col, r, c))
+        return moves
+
+    def generate_captures(self, board, player, row, col, king=False):
+        result = []
+        directions = DIRECTIONS
+        if king:
+            # if the piece is a king, it can move in all directions
+            directions = DIRECTIONS + DIRECTIONS
+
+        for dr, dc in directions:
+            # find the coordinates of the square in the capture direction
+            r, c = row + dr, col + dc
+            row_diff = r - row
+            if 0 <= r < 8 and 0 <= c < 8:
+                # get the piece on the square, if any
+                cell = board[r][c]
+                piece = cell if isinstance(cell, Piece) else None
+                if piece is not None and piece.player == -player:
+                    # Check if the capture direction is valid (forward for regular pieces, any for kings)
+                    if (player == 1 and row_diff > 0) or (player == -1 and row_diff < 0) or king:
+                        # Possible capture, check if the next square in the same direction is empty
+                        r, c = r + dr, c + dc
+                        if 0 <= r < 8 and 0 <= c < 8 and board[r][c] is None:
+                            result.append((row, col, r, c))
+        return result
+
+    def generate_capture_chains(self, board, player, row, col, king=False):
+        # All the complete capture sequences of the piece at (row, col), each as a single move
+        # (start_row, start_col, end_row, end_col, path) where path lists the (row, col) of every landing square
+        chains = []
+        self._extend_chain(board, player, row, col, king, row, col, [], [], chains)
+        return chains
+
+    def _extend_chain(self, board, player, start_row, start_col, king, row, col, path, captured, chains):
+        # Continue a capture sequence that has reached (row, col) after jumping the pieces in captured.
+        # Jumped pieces leave the board straight away, and a man that is crowned ends its move.
+        extended = False
+        for dr, dc in DIRECTIONS:
+            if not king and (dr > 0) != (player == 1):
+                continue
+            middle_row, middle_col = row + dr, col + dc
+            end_row, end_col = middle_row + dr, middle_col + dc
+            if not (0 <= end_row < 8 and 0 <= end_col < 8) or (middle_row, middle_col) in captured:
+                continue
+            middle = board[middle_row][middle_col]
+            if not isinstance(middle, Piece) or middle.player != -player:
+                continue
+            # The square the piece started from is empty now
+            target = board[end_row][end_col]
+            if target is not None and (end_row, end_col) not in captured and (end_row, end_col) != (start_row, start_col):
+                continue
+            extended = True
+            jump_path = path + [(end_row, end_col)]
+            jump_captured = captured + [(middle_row, middle_col)]
+            if not king and (end_row == (BOARD_SIZE - 1 if player == 1 else 0) or middle.king):
+                chains.append((start_row, start_col, end_row, end_col, tuple(jump_path)))
+            else:
+                self._extend_chain(board, player, start_row, start_col, king, end_row, end_col, jump_path, jump_captured, chains)
+        if not extended and path:
+            chains.append((start_row, start_col, row, col, tuple(path)))
+
+    def is_valid_move(self, player, start_row, start_col, end_row, end_col, verbose=True):
+        # Get the piece at the start and the target cell at the end
+        piece = self.board[start_row][start_col]
+        target = self.board[end_row][end_col]
+        # Calculate the row and column differences between start and end positions
+        row_diff = end_row - start_row
+        col_diff = end_col - start_col
+
+        # Check if the piece at the start is a valid piece for the current player
+        if not isinstance(piece, Piece) or piece.player != player:
+            if verbose:
+                self.update_caption("Invalid move: It's not your turn.")
+            return False
+
+        # Check if the target cell is occupied by a piece of the same color
+        if isinstance(target, Piece) and target.player == piece.player:
+            if verbose:
+                self.update_caption("Invalid move: you can't move here.")
+            return False
+
+        # Check if the target cell is already occupied by a piece
+        if target is not None:
+            if verbose:
+                self.update_caption("Invalid move: the target position is already occupied.")
+            return False
+
+        # Check if the move is diagonal (as required by the game rules)
+        if abs(row_diff) != abs(col_diff):
+            if verbose:
+                self.update_caption("Invalid move: you can only move diagonally.")
+            return False
+
+        # Check if the piece is not a king and is moving in the wrong direction
+        if not piece.king and (player == 1 and row_diff <= 0 or player == -1 and row_diff >= 0):
+            if verbose:
+                self.update_caption("Invalid move: you can't move in this direction.")
+            return False
+
+        # Check if the move is a capture move (which requires jumping over another piece)
+        if abs(row_diff) == 2 and abs(col_diff) == 2:
+            # Calculate the middle cell (between start and end cells)
+            middle_row = (start_row + end_row) // 2
+            middle_col = (start_col + end_col) // 2
+            # Get the piece in the middle cell (if any)
+            middle_piece = self.board[middle_row][middle_col]
+            # Check if there is a piece in the middle cell and it belongs to the opponent
+            if middle_piece is not None and middle_piece.player == -player:
+                return True
+            else:
+                if verbose:
+                    print("Invalid move: no piece to capture.")
+                return False
+        # Check if the move is a regular move (one cell diagonal)
+        elif abs(row_diff) == 1 and abs(col_diff) == 1:
+            return True
+
+        return False
+
+    def captures_available(self, board, player):
+        # Iterate over all cells on the board
+        for r in range(BOARD_SIZE):
+            for c in range(BOARD_SIZE):
+                # Check if there is a piece in the current cell and it belongs to the current player
+                if isinstance(board[r][c], Piece) and board[r][c].player == player:
+                    # Generate all possible captures for the piece in the current cell
+                    captures = self.generate_captures(board, player, r, c, board[r][c].is_king)
+                    # Check if there is at least one possible capture
+                    if captures:
+                        return True
+        return False
+
+    # All the moves of player: the complete capture sequences when a capture is available, otherwise the steps
+    def legal_moves(self, player=None):
+        if player is None:
+            player = self.current_player
+        moves = []
+        if self.captures_available(self.board, player):
+            seen = set()
+            for r in range(BOARD_SIZE):
+                for c in range(BOARD_SIZE):
+                    piece = self.board[r][c]
+                    if isinstance(piece, Piece) and piece.player == player:
+                        for chain in self.generate_capture_chains(self.board, player, r, c, piece.king):
+                            # A king can go round the same pieces in either direction; both ways are one move
+                            key = chain[:4] + (frozenset(self.chain_captures(chain)),)
+                            if key not in seen:
+                                seen.add(key)
+                                moves.append(chain)
+            return moves
+        for move in self.generate_moves(self.board, player):
+            # Kings generate their steps twice, so duplicates are dropped
+            if abs(move[2] - move[0]) == 1 and move not in moves and self.is_valid_move(player, *move, verbose=False):
+                moves.append(move)
+        return moves
+
+    # The (row, col) of every piece a move jumps over
+    def chain_captures(self, move):
+        squares = [move[:2]] + list(move[4]) if len(move) > 4 else [move[:2], move[2:4]]
+        if abs(squares[1][0] - squares[0][0]) != 2:
+            return []
+        return [((r1 + r2) // 2, (c1 + c2) // 2) for (r1, c1), (r2, c2) in zip(squares, squares[1:])]
+
+    # Play a step or a single jump of player's piece. A valid move replaces the board and the counts of
+    # men and kings with updated ones; the updated board is also returned
+    def move_piece(self, start_row, start_col, end_row, end_col, player):
+        # Check if move is valid
+        valid_move = self.is_valid_move(player, start_row, start_col, end_row, end_col)
+
+        if valid_move:
+            # Check if captures are available
+            if self.captures_available(self.board, player):
+                # Generate available captures for the piece
+                captures = self.generate_captures(self.board, player, start_row, start_col, self.board[start_row][start_col].is_king)
+                # Check if move is a capture move
+                if (start_row, start_col, end_row, end_col) not in captures:
+                    self.update_caption("Invalid move. A capture is available.")
+                    return False, self.board, [], player, False
+            else:
+                # Check if move is a capture move when no captures are available
+                row_diff = end_row - start_row
+                col_diff = end_col - start_col
+                if abs(row_diff) == 2 and abs(col_diff) == 2:
+                    print("Invalid move. You can only capture.")
+                    self.update_caption("Invalid move. You can only capture.")
+                    return False, self.board, [], player, False
+
+            # Make a deep copy of the board, and of the piece counts that go with it.
+            # The counts follow the promotions and captures below
+            updated_board = deepcopy(self.board)
+            men, kings = dict(self.men), dict(self.kings)
+            # Get the piece to be moved
+            piece = updated_board[start_row][start_col]
+            # Update the piece's current location on the board
+            updated_board[start_row][start_col] = None
+            # Move the piece to the new location on the board
+            updated_board[end_row][end_col] = piece
+            # Update the piece's location attribute
+            piece.move(end_row, end_col)
+
+            # Check if piece should be promoted to king
+            was_king = piece.is_king
+            if player == 1 and end_row == BOARD_SIZE - 1 and piece.player == 1:
+                piece.promote_to_king()
+                self.update_caption("Piece promoted to king!")
+            if player == -1 and end_row == 0 and piece.player == -1:
+                piece.promote_to_king()
+                self.update_caption("Piece promoted to king!")
+            if piece.is_king and not was_king:
+                men[player] -= 1
+                kings[player] += 1
+
+            # Create an empty list to store captured pieces
+            captured_pieces = []
+
+            # Calculate row and column differences
+            row_diff = end_row - start_row
+            col_diff = end_col - start_col
+
+            # Set next player
+            next_player = -player  # Set next_player here
+
+            # Check if move was a capture move
+            if abs(row_diff) == 2 and abs(col_diff) == 2:
+                # Get location of captured piece
+                middle_row = (start_row + end_row) // 2
+                middle_col = (start_col + end_col) // 2
+                # Remove captured piece from board
+                captured_piece = updated_board[middle_row][middle_col]
+                updated_board[middle_row][middle_col] = None
+
+                # Check if piece is valid
+                if isinstance(captured_piece, Piece):
+                    # Add captured piece to captured_pieces list
+                    captured_pieces.append((middle_row, middle_col))
+                    if captured_piece.is_king:
+                        kings[-player] -= 1
+                    else:
+                        men[-player] -= 1
+
+                    # Check if capturing piece is promoted to king
+                    if captured_piece.is_king and not piece.is_king:
+                        piece.promote_to_king()
+                        men[player] -= 1
+                        kings[player] += 1
+                        self.update_caption("Piece promoted to king after capturing a king!")
+
+                # Check for additional captures; a piece that has just been crowned ends its move
+                if piece.is_king and not was_king:
+                    next_capture = []
+                else:
+                    next_capture = self.generate_captures(updated_board, player, end_row, end_col, piece.is_king)
+
+                if next_capture:
+                    # Set next player as the current player if there are additional captures
+                    self.update_caption("You must continue capturing with the current piece.")
+                    next_player = player  # If there are additional captures, keep the same player
+
+                # The move is played: the updated board and its counts replace the current ones
+                self._set_board(updated_board, men, kings)
+                return True, updated_board, captured_pieces, next_player, next_capture
+            else:
+                self._set_board(updated_board, men, kings)
+                return True, updated_board, [], -player, False
+
+        else:
+            self.update_caption("Invalid move. Please try again.")
+            return False, self.board, [], player, False
+
+    # Apply a move, a step or a whole capture sequence from legal_moves, to the board in place,
+    # without any validation or copying, and pass the turn.
+    # Returns an undo record (start, end, captured pieces, promotion flag) for unmake_move.
+    def make_move(self, move):
+        start_row, start_col, end_row, end_col = move[:4]
+        piece = self.board[start_row][start_col]
+        self.board[start_row][start_col] = None
+        self.board[end_row][end_col] = piece
+        piece.move(end_row, end_col)
+
+        captured_pieces = []
+        for row, col in self.chain_captures(move):
+            captured = self.board[row][col]
+            captured_pieces.append(captured)
+            self.board[row][col] = None
+            if captured.king:
+                self.kings[captured.player] -= 1
+            else:
+                self.men[captured.player] -= 1
+
+        # Men are crowned on the far row or when they capture a king
+        promoted = False
+        if not piece.king:
+            last_row = BOARD_SIZE - 1 if piece.player == 1 else 0
+            if end_row == last_row or any(captured.king for captured in captured_pieces):
+                piece.promote_to_king()
+                promoted = True
+                self.men[piece.player] -= 1
+                self.kings[piece.player] += 1
+
+        self.current_player = -piece.player
+        return start_row, start_col, end_row, end_col, captured_pieces, promoted
+
+    # Take back a move applied with make_move
+    def unmake_move(self, undo):
+        start_row, start_col, end_row, end_col, captured_pieces, promoted = undo
+        piece = self.board[end_row][end_col]
+        self.board[end_row][end_col] = None
+        self.board[start_row][start_col] = piece
+        piece.move(start_row, start_col)
+        if promoted:
+            piece.king = False
+            self.men[piece.player] += 1
+            self.kings[piece.player] -= 1
+        for captured in captured_pieces:
+            self.board[captured.row][captured.col] = captured
+            if captured.king:
+                self.kings[captured.player] += 1
+            else:
+                self.men[captured.player] += 1
+        self.current_player = piece.player
+
+    # Define a function that looks up the current position in the opening book
+    def book_move(self, player, level):
+        # Returns the book move for player as a move tuple like those of legal_moves, or None.
+        # Only the difficulty levels from BOOK_MIN_LEVEL on play from the book
+        book = OpeningBook.default()
+        if book is None or level < BOOK_MIN_LEVEL:
+            return None
+        position = self.to_bitboard()
+        position.set_player(player)
+        move = book.lookup(position)
+        return position.move_to_rc(move) if move is not None else None
+
+    # Define a function that plays a move found by the AI search, a move tuple like those of legal_moves.
+    # A capture sequence is played jump by jump with move_piece along its path, so it is the one the search chose
+    def play_ai_move(self, best_move, player):
+        if best_move is None:
+            # If there is no valid move, return False with None values for the other parameters
+            return False, None, None, player, False
+        path = [tuple(best_move[:2])] + (list(best_move[4]) if len(best_move) > 4 else [tuple(best_move[2:4])])
+        captured_pieces = []
+        for (start_row, start_col), (end_row, end_col) in zip(path, path[1:]):
+            valid_move, updated_board, captured, next_player, has_more_captures = self.move_piece(start_row, start_col, end_row, end_col, player)
+            if not valid_move:
+                return valid_move, updated_board, captured_pieces, next_player, has_more_captures
+            captured_pieces.extend(captured)
+        return valid_move, updated_board, captured_pieces, next_player, has_more_captures
+
+    # Define a function that checks for a winner
+    def check_winner(self):
+        # The number of pieces of each player, kept up to date by move application
+        player1_pieces = self.count(1)
+        player2_pieces = self.count(-1)
+
+        # If one player has no pieces left, they lose and the other player wins
+        if player1_pieces == 0:
+            print('WHITE WINS')
+            return -1  # Player 2 wins
+        elif player2_pieces == 0:
+            print('RED WINS')
+            return 1   # Player 1 wins
+        # If both players have only one piece left, it's a draw
+        elif player1_pieces == 1 and player2_pieces == 1: 
+            print('DRAW')
+            return 'DRAW'
+        else:
+            # If no one has won yet, return 0
+            return 0   # No winner yet
+
+    # Check if the game is over
+    def is_game_over(self):
+        # Check if any player has no pieces left or has no valid moves; a player without pieces has no moves either
+        for player in [1, -1]:
+            if not self.has_pieces(player) or not self.has_valid_moves(player):
+                return True
+        return False
+
+    # Check if a player has any pieces left on the board
+    def has_pieces(self, player):
+        return self.count(player) > 0
+
+    # The number of pieces, men and kings, a player has left on the board
+    def count(self, player):
+        return self.men[player] + self.kings[player]
+
+    # The number of pieces left on the board for each player, as a dict of player -> count
+    def count_pieces(self):
+        return {1: self.count(1), -1: self.count(-1)}
+
+    # Check if a player has any valid moves, stopping at the first piece that can move
+    def has_valid_moves(self, player):
+        for r in range(BOARD_SIZE):
+            for c in range(BOARD_SIZE):
+                piece = self.board[r][c]
+                if isinstance(piece, Piece) and piece.player == player:
+                    if (self._generate_moves_for_piece(self.board, player, r, c, king=piece.king)
+                            or self.generate_captures(self.board, player, r, c, piece.king)):
+                        return True
+        return False
+
+    # Evaluate the current state of the board and return a score, the same as the search does
+    def evaluate(self):
+        return self.to_bitboard().evaluate()
+
+    # Deep copy the current instance of the Checkers class
+    def __deepcopy__(self, memo):
+        cls = self.__class__
+        result = cls.__new__(cls)
+        memo[id(self)] = result
+
+        for k, v in self.__dict__.items():
+            if k == 'screen' or k == 'pieces_img' or k == 'transposition_table':  # Skip deepcopy for Pygame Surface objects and the shared search table
+                setattr(result, k, v)
+            else:
+                setattr(result, k, deepcopy(v, memo))
+        return result
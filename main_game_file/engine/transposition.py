@@ -0,0 +1,114 @@
+from array import array
+
+# Bound types stored with each score
+EXACT, LOWER_BOUND, UPPER_BOUND = 0, 1, 2
+
+NO_MOVE = -1
+# Bytes per entry: 8 key + 4 score + 2 move + 1 depth + 1 bound + 1 age
+ENTRY_BYTES = 17
+
+
+def encode_move(move):
+    # Packs the from and to squares of a bitboard move into one small integer
+    return move[0] << 5 | move[1]
+
+
+def decode_move(code, moves):
+    # Finds the move matching an encoded move among the legal moves, or None
+    if code == NO_MOVE:
+        return None
+    for move in moves:
+        if move[0] << 5 | move[1] == code:
+            return move
+    return None
+
+
+class TranspositionTable:
+    """
+    Fixed-size hash table of search results keyed by BitBoard.hash.
+
+    The table is split into buckets of two entries. The first entry of a
+    bucket keeps the deepest result seen (results from earlier searches may
+    always be replaced), the second is overwritten by every store that does
+    not go in the first. Entries live in flat typed arrays, so the memory use
+    is fixed by size_mb no matter how many positions are searched.
+    """
+
+    def __init__(self, size_mb=16):
+        self.size_mb = size_mb
+        buckets = 1
+        while buckets * 2 * 2 * ENTRY_BYTES <= size_mb * 1024 * 1024:
+            buckets *= 2
+        self.mask = buckets - 1
+        self.size = buckets * 2
+        self.keys = array('Q', bytes(8 * self.size))
+        self.scores = array('i', bytes(4 * self.size))
+        self.moves = array('h', [NO_MOVE]) * self.size
+        self.depths = array('b', [-1]) * self.size
+        self.bounds = array('B', bytes(self.size))
+        self.ages = array('B', bytes(self.size))
+        self.age = 0
+        self.probes = self.hits = self.stores = 0
+
+    def new_search(self):
+        # Marks every stored entry as coming from an earlier search so it is replaced first
+        self.age = (self.age + 1) & 0xFF
+
+    def clear(self):
+        self.__init__(self.size_mb)
+
+    def _find(self, key):
+        index = (key & self.mask) << 1
+        if self.keys[index] == key and self.depths[index] >= 0:
+            return index
+        if self.keys[index + 1] == key and self.depths[index + 1] >= 0:
+            return index + 1
+        return -1
+
+    def probe(self, key):
+        """
+        Looks up a position.
+        :param key: The Zobrist hash of the position.
+        :return: A (depth, score, bound, move) tuple, or None if the position is not stored.
+        """
+        self.probes += 1
+        index = self._find(key)
+        if index < 0:
+            return None
+        self.hits += 1
+        return self.depths[index], self.scores[index], self.bounds[index], self.moves[index]
+
+    def store(self, key, depth, score, bound, move=None):
+        """
+        Stores a search result.
+        :param key: The Zobrist hash of the position.
+        :param depth: The remaining depth the position was searched to.
+        :param score: The score found for the position.
+        :param bound: EXACT, LOWER_BOUND or UPPER_BOUND.
+        :param move: The best move found, or None.
+        """
+        self.stores += 1
+        index = (key & self.mask) << 1
+        if self.keys[index + 1] == key:
+            # Keep a single copy of the position in the bucket
+            index += 1
+        elif not (self.keys[index] == key or depth >= self.depths[index] or self.ages[index] != self.age):
+            index += 1
+        code = encode_move(move) if move is not None else NO_MOVE
+        if code == NO_MOVE and self.keys[index] == key:
+            # Keep the best move of an earlier search of the same position
+            code = self.moves[index]
+        self.keys[index] = key
+        self.depths[index] = depth
+        self.scores[index] = score
+        self.bounds[index] = bound
+        self.moves[index] = code
+        self.ages[index] = self.age
+
+    def hit_rate(self):
+        return self.hits / self.probes if self.probes else 0.0
+
+    def usage(self):
+        # Fraction of entries filled in the current search
+        filled = sum(1 for i in range(self.size) if self.depths[i] >= 0 and self.ages[i] == self.age)
+        return filled / self.size
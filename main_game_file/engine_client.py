@@ -0,0 +1,301 @@
+import os
+import shlex
+import subprocess
+import sys
+import threading
+import pygame
+from engine.algorithm import SearchControl, SearchStats, iterative_deepening, MAX_SEARCH_DEPTH
+from engine.game_record import fen, parse_pdn_move
+from search_executor import HINT_READY_EVENT, HINT_DEPTH, SearchExecutor, search_switch_interval
+
+# Command that starts the engine (see engine/protocol.py), e.g. "ssh host python -m engine.protocol";
+# by default it runs as a child process of the game
+ENGINE_COMMAND_VARIABLE = 'CHECKERS_ENGINE'
+ENGINE_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+# Reported when the engine cannot be started, with the error, before the AI falls back to SearchExecutor
+ENGINE_FAILED_MESSAGE = 'Could not start the engine (%s); the AI runs in the game'
+
+
+class EngineClient:
+    """
+    Runs the AI searches in a separate engine process, over the text protocol of engine/protocol.py.
+    It is a drop-in for SearchExecutor: the same methods, posting the same events with the
+    attributes `move`, `depth`, `search_id` and `stats`, so the game loop does not change.
+
+    Each search is a job on a background thread that sends `position` and `go` to the engine and
+    reads its answers up to `bestmove`; cancel() sends `stop` and waits for the job to end.
+    Pondering finds the hint with `go depth`, then sends the position after the hinted move with
+    `go ponder` and the limits of the AI's reply. If the human plays that move, pondered_reply()
+    sends `ponderhit` and the next submit() for the position takes over the running search instead
+    of starting another one; any other move stops it. The engine keeps its own transposition table,
+    so the `table` arguments are ignored. If the engine process dies it is started again; if that
+    fails too, the failure is reported once, the search runs in the game's process, and the client
+    hands every later search to a SearchExecutor instead of trying the engine again.
+    :param command: The command that starts the engine, as a list or a shell-like string. Defaults
+    to the CHECKERS_ENGINE environment variable, or else the engine of this game.
+    :raise OSError: If the engine cannot be started.
+    """
+
+    def __init__(self, command=None):
+        command = command or os.environ.get(ENGINE_COMMAND_VARIABLE) or [sys.executable, '-m', 'engine.protocol']
+        self.command = shlex.split(command) if isinstance(command, str) else command
+        self._process = None
+        # Held while writing to the engine, so that a job and cancel() never interleave their commands
+        self._lock = threading.Lock()
+        self._thread = None
+        self._control = None
+        self._search_id = 0
+        self._ponder_hint = None
+        # Key of the position of the running `go ponder`, whether it got `ponderhit`, the
+        # (event type, search id) of the submit() that took it over and its (move, depth, stats)
+        # once it ended. Changed with the lock held
+        self._ponder_key = None
+        self._ponder_hit = False
+        self._reply_event = None
+        self._ponder_reply = None
+        # SearchExecutor that runs the searches once the engine failed for good, or None
+        self._fallback = None
+        self._start_engine()
+
+    def _start_engine(self):
+        self._process = subprocess.Popen(self.command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                         cwd=ENGINE_DIRECTORY, text=True, bufsize=1)
+        self._send('uci')
+        while self._read()[:1] != ['uciok']:
+            pass
+        self._send('ucinewgame')
+        # The game looks up the book itself, at the difficulty levels that play from it
+        self._send('setoption name OwnBook value false')
+
+    def _send(self, line):
+        self._process.stdin.write(line + '\n')
+        self._process.stdin.flush()
+
+    def _read(self):
+        # The words of the next line from the engine
+        line = self._process.stdout.readline()
+        if not line:
+            raise EOFError('the engine quit')
+        return line.split()
+
+    def submit(self, event_type, board, player, table=None, time_limit=None, node_limit=None, max_depth=MAX_SEARCH_DEPTH):
+        """
+        Starts searching a position in the engine, cancelling any search still running.
+        :param event_type: The pygame event type to post the result with.
+        :param board: The Board to search. It is copied before this returns, so it can change afterwards.
+        :param player: The player to find a move for.
+        :param table: Ignored; the engine has its own.
+        :param time_limit: Seconds the search may take, or None.
+        :param node_limit: Number of nodes the search may visit, or None.
+        :param max_depth: Deepest iteration to run.
+        :return: The id of the search, also set as `search_id` on the result event. When the position
+        is the one the engine ponders on since `ponderhit`, its search goes on with the limits given
+        to ponder() and its move is posted with this id.
+        """
+        if self._fallback is not None:
+            self.cancel()
+            return self._fallback.submit(event_type, board, player, table, time_limit, node_limit, max_depth)
+        position = board.to_bitboard()
+        position.set_player(player)
+        with self._lock:
+            if self._ponder_hit and self._ponder_key == position.key():
+                self._search_id += 1
+                self._reply_event = (event_type, self._search_id)
+                self._post_reply()
+                return self._search_id
+        return self._start(self._run, event_type, position, time_limit, node_limit, max_depth)
+
+    def ponder(self, board, table=None, reply_node_limit=None, reply_time_limit=None):
+        """
+        Starts pondering the position of the side to move on board, cancelling any search still running.
+        The hint is posted as a HINT_READY_EVENT once it is HINT_DEPTH deep, and is available from
+        ponder_hint() from then on. The engine then ponders the AI's reply to it until the human moves.
+        :param board: The Board to ponder. It is copied before this returns.
+        :param table: Ignored; the engine has its own.
+        :param reply_node_limit: Node budget of the AI's reply search, normally that of the difficulty level.
+        :param reply_time_limit: Seconds the AI's reply may take after `ponderhit`, normally those of the level.
+        :return: The id of the search.
+        """
+        if self._fallback is not None:
+            self.cancel()
+            return self._fallback.ponder(board, table, reply_node_limit, reply_time_limit)
+        position = board.to_bitboard()
+        return self._start(self._ponder, HINT_READY_EVENT, position, reply_node_limit, reply_time_limit)
+
+    def ponder_hint(self):
+        # The hint found by the ponder, or None
+        if self._fallback is not None and self._thread is None:
+            return self._fallback.ponder_hint()
+        return self._ponder_hint
+
+    def pondered_reply(self, board):
+        """
+        Ends pondering once the human has moved. If they played the move the ponder expected, the
+        engine gets `ponderhit` and its search becomes that of the next submit() for this position;
+        otherwise it is stopped. The engine only sends its move when that search ends, so unlike
+        SearchExecutor.pondered_reply() there is never a reply to return here.
+        :param board: The Board after the human's move, with the AI to move.
+        :return: None, or the reply of the SearchExecutor once the engine failed.
+        """
+        if self._fallback is not None and self._thread is None:
+            return self._fallback.pondered_reply(board)
+        key = board.to_bitboard().key()
+        with self._lock:
+            hit = self._ponder_key is not None and self._ponder_key == key
+            if hit:
+                self._ponder_hit = True
+                try:
+                    self._send('ponderhit')
+                except OSError:
+                    # The job starts the engine again, or searches in the game's process
+                    pass
+        if not hit:
+            self.cancel()
+        return None
+
+    def _post_reply(self):
+        # Posts the move of the ponder search once it has ended and a submit() took it over; the lock is held
+        if self._reply_event is not None and self._ponder_reply is not None:
+            event_type, search_id = self._reply_event
+            move, depth, stats = self._ponder_reply
+            pygame.event.post(pygame.event.Event(event_type, move=move, depth=depth, search_id=search_id, stats=stats))
+            self._reply_event = self._ponder_reply = None
+
+    def _start(self, target, event_type, position, *args):
+        self.cancel()
+        self._ponder_hint = None
+        self._ponder_key = None
+        self._ponder_hit = False
+        self._reply_event = None
+        self._ponder_reply = None
+        self._search_id += 1
+        # Stopped by cancel(); it only limits a search when it runs in the game's process
+        self._control = SearchControl()
+        self._thread = threading.Thread(
+            target=target,
+            args=(event_type, self._search_id, position, self._control) + args,
+            daemon=True,
+        )
+        self._thread.start()
+        return self._search_id
+
+    def _go(self, position, control, stats, depth=None, nodes=None, movetime=None, ponder=False):
+        """
+        Has the engine search position, retrying once with a new engine if it died. If that fails too,
+        or the engine failed before, the search runs in the game's process.
+        :param control: The SearchControl of the job, stopped when it is cancelled.
+        :param stats: SearchStats to fill in from the info lines.
+        :param depth, nodes, movetime, ponder: The limits of the go command; movetime is in seconds.
+        :return: (move as a BitBoard move of position or None, depth); when cancelled before the
+        engine answered, (None, 0).
+        """
+        if self._fallback is None:
+            try:
+                return self._engine_search(position, control, self._go_command(depth, nodes, movetime, ponder), stats)
+            except (OSError, EOFError):
+                if control.stopped:
+                    return None, 0
+            try:
+                with self._lock:
+                    self._process.kill()
+                    self._start_engine()
+                    # A `ponderhit` sent to the engine that died is not repeated
+                    ponder = ponder and not self._ponder_hit
+                return self._engine_search(position, control, self._go_command(depth, nodes, movetime, ponder), stats)
+            except (OSError, EOFError) as error:
+                print(ENGINE_FAILED_MESSAGE % error)
+                self._fallback = SearchExecutor()
+        # The stop of the job stays in force through the reset
+        control.reset(movetime, nodes)
+        with search_switch_interval():
+            return iterative_deepening(position, max_depth=depth or MAX_SEARCH_DEPTH, control=control, stats=stats)
+
+    @staticmethod
+    def _go_command(depth, nodes, movetime, ponder):
+        go = 'go'
+        for name, value in (('depth', depth), ('nodes', nodes), ('movetime', movetime)):
+            if value is not None:
+                go += ' %s %d' % (name, value * 1000 if name == 'movetime' else value)
+        return go + ' ponder' if ponder else go
+
+    def _engine_search(self, position, control, go, stats):
+        with self._lock:
+            if control.stopped:
+                return None, 0
+            self._send('position fen %s' % fen(position))
+            self._send(go)
+            if go.endswith(' ponder'):
+                self._ponder_key = position.key()
+        depth = 0
+        while True:
+            words = self._read()
+            if words[:1] == ['info'] and 'pv' in words:
+                fields = {words[i]: words[i + 1] for i in range(1, len(words) - 1)}
+                depth = int(fields['depth'])
+                stats.nodes = int(fields['nodes'])
+                stats.finish_depth(depth)
+            elif words[:1] == ['bestmove']:
+                if words[1] == 'none':
+                    return None, depth
+                return parse_pdn_move(words[1], position), depth
+
+    def _run(self, event_type, search_id, position, control, time_limit, node_limit, max_depth):
+        stats = SearchStats()
+        move, depth = self._go(position, control, stats, depth=max_depth, nodes=node_limit, movetime=time_limit)
+        if move is not None:
+            move = position.move_to_rc(move)
+        if not control.stopped:
+            pygame.event.post(pygame.event.Event(event_type, move=move, depth=depth, search_id=search_id, stats=stats))
+
+    def _ponder(self, event_type, search_id, position, control, reply_node_limit, reply_time_limit):
+        # First the hint for the side to move, at the depth of a normal hint search
+        stats = SearchStats()
+        hint, depth = self._go(position, control, stats, depth=HINT_DEPTH)
+        if control.stopped or hint is None:
+            return
+        self._ponder_hint = position.move_to_rc(hint)
+        pygame.event.post(pygame.event.Event(event_type, move=self._ponder_hint, depth=depth, search_id=search_id,
+                                             stats=stats))
+
+        # Then the AI's reply if the hint is what gets played, as a `go ponder` with the AI's limits
+        expected = position.apply(hint)
+        stats = SearchStats()
+        reply, depth = self._go(expected, control, stats, nodes=reply_node_limit, movetime=reply_time_limit,
+                                ponder=True)
+        with self._lock:
+            if control.stopped:
+                return
+            self._ponder_reply = (expected.move_to_rc(reply) if reply is not None else None, depth, stats)
+            self._post_reply()
+
+    def busy(self):
+        if self._fallback is not None and self._fallback.busy():
+            return True
+        return self._thread is not None and self._thread.is_alive()
+
+    def cancel(self):
+        # Stops the running search, if any, and waits for its job to finish
+        if self._fallback is not None:
+            self._fallback.cancel()
+        if self._thread is not None:
+            with self._lock:
+                self._control.stop()
+                try:
+                    self._send('stop')
+                except OSError:
+                    pass
+            self._thread.join()
+            self._thread = None
+            self._control = None
+
+    def close(self):
+        # Cancels any search and ends the engine process
+        self.cancel()
+        if self._fallback is not None:
+            self._fallback.close()
+        try:
+            self._send('quit')
+            self._process.stdin.close()
+            self._process.wait(timeout=1)
+        except (OSError, subprocess.TimeoutExpired):
+            self._process.kill()
@@ -1,14 +1,26 @@
+import os
+import time
 import pygame
 from packages import SQUARE_SIZE, screen
 from game import Game
-from board import Board
+from board import Board, AI_MOVE_DELAY
 from menu import Menu
-from algorithm import *
+from engine.algorithm import *
+from engine.game_record import GameRecord, GameRecordWriter, find_move
+from search_executor import SearchExecutor, AI_MOVE_EVENT, HINT_READY_EVENT
+from engine_client import EngineClient, ENGINE_FAILED_MESSAGE
 
 FPS = 60
 HINT_DISPLAY_EVENT = pygame.USEREVENT + 1
+# Environment variable naming the archive every game played is added to when it ends
+# (see engine/game_record.py); games are not saved when it is not set
+GAME_RECORD_VARIABLE = 'CHECKERS_GAME_RECORD'
 global difficulty_level 
 difficulty_level = 3
+# AI searches run in the engine process (see engine/protocol.py), or on a background thread if it
+# cannot be started, so the window keeps responding while the AI thinks. Started by the first game
+# and kept for the others
+executor = None
 
 # Function to get the row and column of the square that was clicked on by the mouse
 def get_row_col_from_mouse(pos):
@@ -17,6 +29,37 @@ def get_row_col_from_mouse(pos):
     col = x // SQUARE_SIZE
     return row, col
 
+# Function to add the move that ended a turn to the game record, with the milliseconds the turn took
+def record_turn(record, turn_position, board, turn_start):
+    position = board.to_bitboard()
+    move = find_move(turn_position, position)
+    if move is not None:
+        record.add(move, int((time.perf_counter() - turn_start) * 1000))
+    return position
+
+# Function to add a finished or abandoned game to the archive, if one is set; winner is as returned by check_winner, or None
+def save_game(record, winner):
+    path = os.environ.get(GAME_RECORD_VARIABLE)
+    if not path or not record.moves:
+        return
+    record.result = 0 if winner == 'DRAW' else winner
+    try:
+        with GameRecordWriter(path, append=True) as writer:
+            writer.write(record)
+    except (OSError, ValueError) as error:
+        print("Could not save the game: %s" % error)
+
+# Function to get the executor of the AI searches, starting it the first time
+def get_executor():
+    global executor
+    if executor is None:
+        try:
+            executor = EngineClient()
+        except (OSError, EOFError) as error:
+            print(ENGINE_FAILED_MESSAGE % error)
+            executor = SearchExecutor()
+    return executor
+
 # Function to display the main menu and wait for user input
 def welcome(): 
     run = True
@@ -26,19 +69,20 @@ def welcome():
     pygame.display.set_caption('Main Menu')
     while run: 
         clock.tick(FPS)
-        m.draw_menu() # Draw the menu
+        if m.draw_menu(): # Draw the menu, only when the selected option changed
+            pygame.display.update()
         value = m.check_events() # Check for user input
         if value == 'START GAME': # If user clicked "start game", start the game
             main()
+            m.invalidate()
         elif value == 'DIFFICULTY': # If user clicked "difficulty", go to the difficulty screen
             welcome_difficulty()
-            pass
+            m.invalidate() # The menu has to be drawn again over the difficulty screen
         elif value == 'RULES': # If user clicked "rules", show the rules screen
             game_rules()
+            m.invalidate()
         elif value == 'QUIT': # If user clicked "quit", quit the game
             run = False
-        
-        pygame.display.update()
 
 # Function to display the difficulty screen and wait for user input
 def welcome_difficulty(): # Screen in the main menu to set difficulty level of the AI
@@ -51,12 +95,12 @@ def welcome_difficulty(): # Screen in the main menu to set difficulty level of t
     currentdif = initdif
     while run:
         clock.tick(FPS)
-        m.draw_difficulty(currentdif) # Draw the difficulty screen
+        if m.draw_difficulty(currentdif): # Draw the difficulty screen, only when the level changed
+            pygame.display.update()
         currentdif = m.check_events_difficulty(initdif, currentdif) # Check for user input and update the selected difficulty level
         if currentdif > 100: # This is used to detect wether backspace or return keys were pressed
             currentdif -= 100 # This reverts the value to its correct one
             run = False
-        pygame.display.update()
     difficulty_level = currentdif # Set global variable with the selected difficulty
 
 # Function to display the rules screen and wait for user input
@@ -66,16 +110,19 @@ def game_rules(): # Draw credits screen and wait for backspace to be pressed to
     m = Menu(screen)
     pygame.display.set_caption('Game Rules')
     while run:
-        m.draw_game_rules() # Draw the rules screen
+        clock.tick(FPS)
+        if m.draw_game_rules(): # Draw the rules screen, only the first time
+            pygame.display.update()
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 run = False
+
+            if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED): # Draw the screen again when the window is uncovered
+                m.invalidate()
             
             if event.type == pygame.KEYDOWN and event.key == pygame.K_BACKSPACE: # If user presses backspace, go back to the main menu
                 run = False
                 welcome()
-
-        pygame.display.update()
  
 # define main function
 def main():
@@ -89,6 +136,22 @@ def main():
     last_capturing_piece = None
     hints_remaining = 3
     depth = 1
+    executor = get_executor()
+    ai_thinking = False
+    ai_search_id = None  # id of the running AI search
+    ai_search_start = 0
+    ai_best_move = None
+    ai_move_ready = False
+    # while the human thinks, the executor ponders their position; None when pondering has to (re)start
+    ponder_search_id = None
+    hint_pending = False
+    # the game is recorded turn by turn: the position and the time at the start of the current turn
+    node_limit, time_limit = DIFFICULTY_BUDGETS[difficulty_level]
+    record = GameRecord(tags={'Event': 'Checkers', 'Date': time.strftime('%Y.%m.%d'),
+                              'Black': 'CPU level %d' % difficulty_level, 'White': 'Human',
+                              'BlackNodeLimit': str(node_limit), 'BlackTimeLimit': str(time_limit)})
+    turn_position = board.to_bitboard()
+    turn_start = time.perf_counter()
 
     # game loop
     while run:
@@ -97,34 +160,87 @@ def main():
 
         # check if it's AI's turn to move
         if board.current_player == 1:
-            # get AI's move
-            valid_move, updated_board, captured_pieces, next_player, has_more_captures = board.ai_move(board.current_player, difficulty_level)
-            if valid_move:
-                # update board with AI's move
-                board.current_player = next_player
-                board.board = updated_board
-                # check for winner
-                winner = board.check_winner()
-                if winner != 0:
-                    # draw winner
-                    draw_winner(winner)
-                    run = False
+            if not ai_thinking:
+                ai_thinking = True
+                ai_search_start = time.perf_counter()
+                ponder_search_id = None
+                hint_pending = False
+                # if the human played the move the ponder expected, its reply may be ready without searching
+                # again; the engine process instead goes on with its ponder search as the next submit()
+                ai_best_move = executor.pondered_reply(board)
+                if ai_best_move is None:
+                    # in the opening the move comes from the book, at the levels that use it
+                    ai_best_move = board.book_move(board.current_player, difficulty_level)
+                    if ai_best_move is not None:
+                        # after a ponderhit the engine still searches the reply the book has supplied
+                        executor.cancel()
+                ai_move_ready = ai_best_move is not None
+                if not ai_move_ready:
+                    # start the AI search with the budget of the difficulty level
+                    node_limit, time_limit = DIFFICULTY_BUDGETS[difficulty_level]
+                    ai_search_id = executor.submit(AI_MOVE_EVENT, board, board.current_player, board.transposition_table, time_limit, node_limit)
+            elif ai_move_ready and (time.perf_counter() - ai_search_start) * 1000 >= AI_MOVE_DELAY:
+                # play the AI's move once it has taken at least AI_MOVE_DELAY ms, so it looks human-like
+                ai_thinking = False
+                ai_move_ready = False
+                valid_move, updated_board, captured_pieces, next_player, has_more_captures = board.play_ai_move(ai_best_move, board.current_player)
+                if valid_move:
+                    # the AI's move is on the board; pass the turn
+                    board.current_player = next_player
+                    turn_position = record_turn(record, turn_position, board, turn_start)
+                    turn_start = time.perf_counter()
+                    # check for winner
+                    winner = board.check_winner()
+                    if winner != 0:
+                        # draw winner
+                        executor.cancel()
+                        save_game(record, winner)
+                        draw_winner(winner)
+                        run = False
+        elif ponder_search_id is None and last_capturing_piece is None:
+            # ponder the human's position: prepares the hint and the AI's reply to the expected move.
+            # In the middle of a capture sequence the ponder from before it still holds, since the
+            # search plays the whole sequence as one move
+            ponder_search_id = executor.ponder(board, board.transposition_table, *DIFFICULTY_BUDGETS[difficulty_level])
 
         # handle events
         for event in pygame.event.get():
             # quit game on close button click
             if event.type == pygame.QUIT:
+                executor.cancel()
+                save_game(record, None)
                 run = False
+
+            # the window was uncovered: send the whole board again on the next frame
+            if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                board.renderer.invalidate()
+
+            # keep the result of the current AI search until the move is played
+            if event.type == AI_MOVE_EVENT and event.search_id == ai_search_id:
+                ai_best_move = event.move
+                ai_move_ready = True
+                if board.log_search_stats:
+                    print('AI search: ' + event.stats.summary())
             
             # handle hint event
             if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_h and hints_remaining > 0:
-                    # Give a hint to player -1
-                    hint = generate_best_move(board, 4, -1)  
-                    hints_remaining -= 1            
-                    board.hint = hint
-                    # set hint display timer
-                    pygame.time.set_timer(HINT_DISPLAY_EVENT, 3000)
+                if event.key == pygame.K_h and hints_remaining > 0 and board.current_player == -1 and not hint_pending \
+                        and last_capturing_piece is None:
+                    # Show the pondered hint for player -1, or wait for the ponder to find one
+                    hints_remaining -= 1
+                    board.hint = executor.ponder_hint()
+                    if board.hint is not None:
+                        # set hint display timer
+                        pygame.time.set_timer(HINT_DISPLAY_EVENT, 3000)
+                    else:
+                        hint_pending = True
+
+            # show the hint once the ponder has found it
+            if event.type == HINT_READY_EVENT and event.search_id == ponder_search_id and hint_pending:
+                hint_pending = False
+                board.hint = event.move
+                # set hint display timer
+                pygame.time.set_timer(HINT_DISPLAY_EVENT, 3000)
         
             # reset hint attribute when timer is up
             if event.type == HINT_DISPLAY_EVENT:
@@ -147,13 +263,22 @@ def main():
                         # move selected piece
                         valid_move, updated_board, captured_pieces, next_player, has_more_captures = board.move_piece(start_row, start_col, row, col, board.current_player)
                         if valid_move:
-                            # update board with moved piece
+                            # the piece has moved on the board; pass the turn unless the capture goes on
+                            player = board.current_player
                             board.current_player = next_player
-                            board.board = updated_board
+                            if next_player != player:
+                                # the human's turn is over, capture sequences included
+                                turn_position = record_turn(record, turn_position, board, turn_start)
+                                turn_start = time.perf_counter()
+                            # the ponder is out of date; the AI turn takes over its reply, or it restarts
+                            ponder_search_id = None
+                            hint_pending = False
                             # check for winner
                             winner = board.check_winner()
                             if winner != 0:
                                 # draw winner
+                                executor.cancel()
+                                save_game(record, winner)
                                 draw_winner(winner)
                                 run = False
                             if has_more_captures and captured_pieces:
@@ -167,10 +292,12 @@ def main():
                         board.update_caption("Please select a piece to move.")
                 else:
                     board.update_caption("You must continue capturing with the current piece.")
-        winner = board.check_winner()
-        board.draw_new_board(board.hint)
-        pygame.display.update()
+        # redraw only the squares that changed; an idle frame sends nothing to the display
+        dirty_rects = board.draw_new_board(board.hint)
+        if dirty_rects:
+            pygame.display.update(dirty_rects)
 
+    executor.cancel()
     pygame.quit()
 
 def draw_winner(winner): 
@@ -180,19 +307,21 @@ def draw_winner(winner):
     pygame.display.set_caption('GAME OVER')  # Set the caption of the window to 'GAME OVER'
     
     while run:
-        m.draw_winner(winner, difficulty_level)  # Draw the winner message on the screen
+        clock.tick(FPS)
+        if m.draw_winner(winner, difficulty_level):  # Draw the winner message on the screen, only the first time
+            pygame.display.update()  # Update the screen
         for event in pygame.event.get():  # Loop through all pygame events
             if event.type == pygame.QUIT:  # If user closes the window
                 run = False  # Exit the loop and end the program
         
         if winner is not None:  # If there is a winner
-            pygame.display.update()  # Update the screen
             pygame.time.delay(5000)  # Wait for 5000 milliseconds or (5 seconds)
             run = False  # Exit the loop and end the program
-        pygame.display.update()  # Update the screen
 
     pygame.quit()
 
 
 
-welcome()
\ No newline at end of file
+welcome()
+if executor is not None:
+    executor.close()
\ No newline at end of file
@@ -11,6 +11,18 @@ font3 = pygame.font.Font('main_game_file/8-BIT_WONDER.TTF', 20)
 font4 = pygame.font.Font('main_game_file/8-BIT_WONDER.TTF', 10)
 ARROWS = pygame.transform.scale(pygame.image.load(os.path.join('main_game_file/arrows.png')), (100,200))
 
+# Rendered text by (font, text, colour). The menu screens show the same few strings over and over,
+# so each one is rendered once
+text_surfaces = {}
+
+def render_text(font, text, color=BLACK):
+    # The surface of text rendered with font, from the cache when it was rendered before
+    key = (font, text, color)
+    surface = text_surfaces.get(key)
+    if surface is None:
+        surface = text_surfaces[key] = font.render(text, True, color)
+    return surface
+
 # A doubly linked list is used in other to move through different tabs on the menu list
 
 class Node: 
@@ -54,18 +66,35 @@ class Menu:
         self.dlist.append('QUIT')
         # Set the current node to the start node
         self.node = self.dlist.start_node
-    
+        # The state of the screen that was drawn last, e.g. ('menu', selected option); None draws the next screen anyway
+        self.drawn = None
+
+    def invalidate(self):
+        # Draw the next screen even if its state did not change, e.g. after another screen drew over the window
+        self.drawn = None
+
+    def needs_drawing(self, state):
+        # Whether the screen for state has to be drawn, i.e. it differs from the screen drawn last
+        if state == self.drawn:
+            return False
+        self.drawn = state
+        return True
+
     def draw_menu(self): 
+        # Draws the menu if the selected option changed; returns whether anything was drawn
+        if not self.needs_drawing(('menu', self.node.value)):
+            return False
         # Fill the window with a light blue color
         self.window.fill(LIGHT_BLUE)
         # Draw the current menu option on the window
         self.draw_text(self.node.value, 40, SQUARE_SIZE * 4 , SQUARE_SIZE * 4 - 20)
+        return True
 
     
     def draw_text(self, text, size, x, y ): # This function draws the text of the menu
-            self.window.blit(font.render("MAIN MENU", True, BLACK), (150,150))
-            self.window.blit(font3.render("UP / DOWN / ENTER / BACKSPACE", True, BLACK), (150,600))
-            line2 = font3.render(text, True, BLACK) # render the text sent to the function
+            self.window.blit(render_text(font, "MAIN MENU"), (150,150))
+            self.window.blit(render_text(font3, "UP / DOWN / ENTER / BACKSPACE"), (150,600))
+            line2 = render_text(font3, text) # render the text sent to the function
             text_rect = line2.get_rect()
             text_rect.center = (x,y) # Set center of the rect around the text so that it centers the text no matter its length
             self.window.blit(ARROWS, (x-50, y-100))
@@ -75,6 +104,8 @@ class Menu:
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 sys.exit()
+            if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                self.invalidate()
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_RETURN:
                     return self.node.value    
@@ -88,19 +119,24 @@ class Menu:
                         self.node = self.node.prev
 
 
-    def draw_difficulty(self, current): # This function draws the difficulty menu
+    def draw_difficulty(self, current): # This function draws the difficulty menu if the level changed, and returns whether it did
+        if not self.needs_drawing(('difficulty', current)):
+            return False
         self.window.fill(LIGHT_BLUE)
-        self.window.blit(font1.render("GAME DIFFICULTY", True, BLACK), (150,150))
+        self.window.blit(render_text(font1, "GAME DIFFICULTY"), (150,150))
         self.window.blit(ARROWS, (SQUARE_SIZE * 4-50, SQUARE_SIZE * 4 -120))
-        self.window.blit(font2.render(str(current), True, BLACK), (SQUARE_SIZE* 4 -15, SQUARE_SIZE * 4 - 40))
+        self.window.blit(render_text(font2, str(current)), (SQUARE_SIZE* 4 -15, SQUARE_SIZE * 4 - 40))
         if current >= 5:
-            self.window.blit(font3.render("Careful The higher the level", True, BLACK), (150, 600))
-            self.window.blit(font3.render("the slower the cpu will play", True, BLACK), (150, 640))
+            self.window.blit(render_text(font3, "Careful The higher the level"), (150, 600))
+            self.window.blit(render_text(font3, "the slower the cpu will play"), (150, 640))
+        return True
 
     def check_events_difficulty(self, initial_level, current_level):  # This function checks for n events that happen within the FPS rate
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 sys.exit()
+            if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                self.invalidate()
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_RETURN:
                     current_level += 100    
@@ -115,29 +151,34 @@ class Menu:
         return current_level
 
 
-    def draw_winner(self, winner, difficulty_level = None): # This function draws the winner screen
+    def draw_winner(self, winner, difficulty_level = None): # This function draws the winner screen, once, and returns whether it drew it
+        if not self.needs_drawing(('winner', winner, difficulty_level)):
+            return False
         self.window.fill(LIGHT_BLUE)
-        self.window.blit(font.render("GAME OVER", True, BLACK), (150,150))
+        self.window.blit(render_text(font, "GAME OVER"), (150,150))
         if winner == RED or winner == 1:
-            line2 = font3.render("You were beaten", True, BLACK)
-            line3 = font3.render("By CPU level " + str(difficulty_level), True, BLACK)
+            line2 = render_text(font3, "You were beaten")
+            line3 = render_text(font3, "By CPU level " + str(difficulty_level))
         elif winner == WHITE or winner == -1:
-            line2 = font3.render("You defeated", True, BLACK)
-            line3 = font3.render("CPU level " + str(difficulty_level), True, BLACK) 
+            line2 = render_text(font3, "You defeated")
+            line3 = render_text(font3, "CPU level " + str(difficulty_level)) 
         elif winner == 0 or winner == 'DRAW':        
-            line2 = font3.render("It Was A Draw", True, BLACK)
-            line3 = font3.render("CPU level " + str(difficulty_level), True, BLACK)
+            line2 = render_text(font3, "It Was A Draw")
+            line3 = render_text(font3, "CPU level " + str(difficulty_level))
         text_rect = line2.get_rect()
         text_rect.center = (SQUARE_SIZE * 4, SQUARE_SIZE * 4 - 20)
         self.window.blit(line2,text_rect)
         text_rect3 = line3.get_rect()
         text_rect3.center = (SQUARE_SIZE * 4, SQUARE_SIZE * 4 + 60)
         self.window.blit(line3,text_rect3)
+        return True
 
-    def draw_game_rules(self): 
+    def draw_game_rules(self): # This function draws the rules screen, once, and returns whether it drew it
+        if not self.needs_drawing(('rules',)):
+            return False
         self.window.fill(LIGHT_BLUE)
-        self.window.blit(font1.render("Rules", True, BLACK), (270, SQUARE_SIZE * 2 - 160))
-        self.window.blit(font2.render("Game Rules", True, BLACK), (230, SQUARE_SIZE * 2 - 70))
+        self.window.blit(render_text(font1, "Rules"), (270, SQUARE_SIZE * 2 - 160))
+        self.window.blit(render_text(font2, "Game Rules"), (230, SQUARE_SIZE * 2 - 70))
         rules = [
             "1. Each player starts with 12 pieces on the board.",
             "2. Players alternate turns moving their pieces.",
@@ -153,7 +194,6 @@ class Menu:
         ]
 
         for index, rule in enumerate(rules):
-            rule_text = font4.render(rule, True, BLACK)
+            rule_text = render_text(font4, rule)
             self.window.blit(rule_text, (30, SQUARE_SIZE * 2 - 20 + index * 40))
-
-        pygame.display.update()
\ No newline at end of file
+        return True
\ No newline at end of file
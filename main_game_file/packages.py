@@ -1,9 +1,9 @@
 import pygame
 import os 
 import sys
+from engine.state import BOARD_SIZE, DIRECTIONS
 
-#Define the size of the board and the size of each square in pixels
-BOARD_SIZE= 8
+#Define the size of each square in pixels; the size of the board comes from the engine
 SQUARE_SIZE = 100
 
 #Define some colors using RGB values
@@ -14,9 +14,6 @@ BLACK = (0, 0, 0)
 BLUE = (0, 0, 255)
 LIGHT_BLUE = (173, 216, 230)
 
-#Define the possible directions a piece can move
-DIRECTIONS = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
-
 #Create the game window with the appropriate dimensions
 screen = pygame.display.set_mode((BOARD_SIZE * SQUARE_SIZE, BOARD_SIZE * SQUARE_SIZE))
 
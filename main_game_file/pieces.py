@@ -1,18 +1,36 @@
 from packages import RED, WHITE, BLACK, SQUARE_SIZE, CROWN, BROWN 
 import pygame
+from engine.piece import Piece as EnginePiece
 
-class Piece:
+# Sprites of the pieces by (player, king), rendered the first time they are drawn
+_sprites = {}
+
+
+def piece_sprite(player, king):
+    # A square, transparent surface with the piece drawn in its centre
+    key = (player, king)
+    if key not in _sprites:
+        sprite = pygame.Surface((SQUARE_SIZE, SQUARE_SIZE), pygame.SRCALPHA)
+        center = (SQUARE_SIZE // 2, SQUARE_SIZE // 2)
+        radius = SQUARE_SIZE // 2 - Piece.PADDING   # Calculate the radius of the piece's circle
+        pygame.draw.circle(sprite, BLACK, center, radius + Piece.OUTLINE)   # Draw the outline of the piece's circle
+        pygame.draw.circle(sprite, RED if player == 1 else BROWN, center, radius)   # Draw the piece's circle with its color
+        if king:
+            sprite.blit(CROWN, (center[0] - CROWN.get_width() // 2, center[1] - CROWN.get_height() // 2))   # Draw a crown icon on top of a king
+        _sprites[key] = sprite.convert_alpha()
+    return _sprites[key]
+
+
+class Piece(EnginePiece):
+    # A piece of the engine that also knows how to draw itself
     PADDING = 15   # Padding size for piece circle
     OUTLINE = 2    # Outline size for piece circle
 
     def __init__(self, player, row, col):
-        self.player = player   # The player to which the piece belongs (-1 or 1)
+        super().__init__(player, row, col)
         self.color = RED if player == 1 else BROWN   # The color of the piece based on the player
         self.x = 0   # The x-coordinate of the piece's position on the screen
         self.y = 0   # The y-coordinate of the piece's position on the screen
-        self.row = row   # The row of the piece on the board
-        self.col = col   # The column of the piece on the board
-        self.king = False   # Whether the piece is a king or not
         self.get_position()   # Get the position of the piece on the screen based on the board position
 
     def get_position(self):
@@ -20,26 +38,10 @@ class Piece:
         self.y = SQUARE_SIZE * self.row + SQUARE_SIZE // 2   # Calculate the y-coordinate of the piece on the screen
 
     def draw(self, win):
-        radius = SQUARE_SIZE//2 - self.PADDING   # Calculate the radius of the piece's circle
-        pygame.draw.circle(win, BLACK, (self.x, self.y), radius + self.OUTLINE)   # Draw the outline of the piece's circle
-        pygame.draw.circle(win, self.color, (self.x, self.y), radius)   # Draw the piece's circle with its color
-        if self.king:
-            win.blit(CROWN, (self.x - CROWN.get_width() // 2, self.y - CROWN.get_height() // 2))   # If the piece is a king, draw a crown icon on top of it
-
-    @property
-    def is_king(self):
-        return self.king   # Check whether the piece is a king or not
-
-    def promote_to_king(self):
-        self.king = True   # Promote the piece to a king
+        win.blit(piece_sprite(self.player, self.king), (self.x - SQUARE_SIZE // 2, self.y - SQUARE_SIZE // 2))   # Draw the pre-rendered sprite of the piece
 
     def move(self, row, col):
-        self.row = row   # Update the row of the piece on the board
-        self.col = col   # Update the column of the piece on the board
+        super().move(row, col)   # Update the row and column of the piece on the board
         self.get_position()   # Update the position of the piece on the screen
 
-    def __repr__(self):
-        # return f"Piece(color={self.color}, player={self.player}, row={self.row}, col={self.col})"
-        return str(self.player)   # Return the player number of the piece as a string
-
 
@@ -0,0 +1,97 @@
+import pygame
+from packages import BLACK, BLUE, BOARD_SIZE, SQUARE_SIZE, WHITE
+from pieces import Piece, piece_sprite
+
+# Colours of the highlights drawn over the squares
+VALID_MOVE_COLOR = (0, 255, 0)
+HINT_SOURCE_COLOR = (255, 215, 0)
+HINT_DESTINATION_COLOR = (255, 253, 208)
+
+# Highlights a square can carry, as bit flags
+SELECTED = 1
+VALID_MOVE = 2
+HINT_SOURCE = 4
+HINT_DESTINATION = 8
+
+
+class BoardRenderer:
+    """
+    Draws a Board while redrawing as little as possible.
+    The empty checkerboard and the piece sprites are rendered once. Every frame, the renderer
+    works out what each square shows, i.e. its piece and its highlights (selection, valid moves
+    and hint), and redraws only the squares that differ from the last frame. draw() returns the
+    rectangles it redrew, so that only those are sent to the display; when nothing changed, a
+    frame costs a scan of the board and no drawing at all.
+    """
+
+    def __init__(self, screen):
+        self.screen = screen
+        self.background = pygame.Surface((BOARD_SIZE * SQUARE_SIZE, BOARD_SIZE * SQUARE_SIZE)).convert()
+        for row in range(BOARD_SIZE):
+            for col in range(BOARD_SIZE):
+                pygame.draw.rect(self.background, WHITE if (row + col) % 2 == 0 else BLACK, self.square_rect(row, col))
+        # What every square showed after the last frame, indexed by row * BOARD_SIZE + col; None redraws everything
+        self.drawn = None
+
+    @staticmethod
+    def square_rect(row, col):
+        return pygame.Rect(col * SQUARE_SIZE, row * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE)
+
+    def invalidate(self):
+        # Redraw the whole board on the next frame, e.g. after something else drew over the window
+        self.drawn = None
+
+    def contents(self, board, hint=None):
+        # What every square should show, as a list of (piece sprite key or None, highlight flags) tuples
+        flags = [0] * (BOARD_SIZE * BOARD_SIZE)
+        if board.selected_piece is not None:
+            flags[board.selected_row * BOARD_SIZE + board.selected_col] |= SELECTED
+        for row, col in board.valid_move_squares:
+            flags[row * BOARD_SIZE + col] |= VALID_MOVE
+        if hint is not None:
+            src_row, src_col, dest_row, dest_col = hint[:4]
+            flags[src_row * BOARD_SIZE + src_col] |= HINT_SOURCE
+            flags[dest_row * BOARD_SIZE + dest_col] |= HINT_DESTINATION
+        contents = []
+        index = 0
+        for board_row in board.board:
+            for piece in board_row:
+                contents.append(((piece.player, piece.king) if isinstance(piece, Piece) else None, flags[index]))
+                index += 1
+        return contents
+
+    def draw_square(self, row, col, content):
+        # Draws one square in the same order as a full redraw: board, piece, valid move, selection, hint
+        piece, flags = content
+        rect = self.square_rect(row, col)
+        center = rect.center
+        self.screen.blit(self.background, rect, rect)
+        if piece is not None:
+            self.screen.blit(piece_sprite(*piece), rect)
+        if flags & VALID_MOVE:
+            pygame.draw.circle(self.screen, VALID_MOVE_COLOR, center, SQUARE_SIZE // 5)
+        if flags & SELECTED:
+            pygame.draw.rect(self.screen, BLUE, rect, 3)
+        if flags & HINT_SOURCE:
+            pygame.draw.rect(self.screen, HINT_SOURCE_COLOR, rect, 3)
+        if flags & HINT_DESTINATION:
+            pygame.draw.circle(self.screen, HINT_DESTINATION_COLOR, center, SQUARE_SIZE // 5)
+        return rect
+
+    def draw(self, board, hint=None):
+        """
+        Brings the screen up to date with the board.
+        :param board: The Board to draw, with its selection and valid move squares.
+        :param hint: Optional hint move, a (start_row, start_col, end_row, end_col[, path]) tuple.
+        :return: List of the rectangles that were redrawn, for pygame.display.update().
+        """
+        contents = self.contents(board, hint)
+        drawn = self.drawn
+        dirty = []
+        for index, content in enumerate(contents):
+            if drawn is None or content != drawn[index]:
+                dirty.append(self.draw_square(index // BOARD_SIZE, index % BOARD_SIZE, content))
+        self.drawn = contents
+        if drawn is None:
+            return [self.screen.get_rect()]
+        return dirty
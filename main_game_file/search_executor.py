@@ -0,0 +1,179 @@
+import sys
+import threading
+from contextlib import contextmanager
+import pygame
+from engine.algorithm import SearchControl, SearchStats, iterative_deepening, MAX_SEARCH_DEPTH
+
+# Events posted when a background search finishes
+AI_MOVE_EVENT = pygame.USEREVENT + 2
+HINT_READY_EVENT = pygame.USEREVENT + 3
+# Depth of the hint search, and of the first part of pondering
+HINT_DEPTH = 4
+# Seconds a thread may hold the interpreter lock before another thread gets a turn.
+# Python's default of 5 ms lets a busy search thread delay every frame by several
+# milliseconds; 1 ms keeps the game loop close to its 60 FPS target. It is only set
+# while a search runs, since it makes every other thread switch more often too.
+SWITCH_INTERVAL = 0.001
+
+# Searches running with SWITCH_INTERVAL, and the interval from before the first of them
+_switch_lock = threading.Lock()
+_switch_searches = 0
+_switch_previous = None
+
+
+@contextmanager
+def search_switch_interval():
+    # Sets SWITCH_INTERVAL for the duration of a search and puts the previous interval back after the last one
+    global _switch_searches, _switch_previous
+    with _switch_lock:
+        if _switch_searches == 0:
+            _switch_previous = sys.getswitchinterval()
+            sys.setswitchinterval(SWITCH_INTERVAL)
+        _switch_searches += 1
+    try:
+        yield
+    finally:
+        with _switch_lock:
+            _switch_searches -= 1
+            if _switch_searches == 0:
+                sys.setswitchinterval(_switch_previous)
+
+
+def _search_thread(target, *args):
+    # Body of a search thread: runs the search job with the short switch interval
+    with search_switch_interval():
+        target(*args)
+
+
+class SearchExecutor:
+    """
+    Runs one AI search at a time on a background thread, so the game loop keeps
+    drawing and handling events while the AI thinks.
+
+    When a search finishes, its result is posted as a pygame event of the type
+    given to submit(), with the attributes `move` (a move tuple like those of
+    GameState.legal_moves, with the path of a capture sequence, or None),
+    `depth`, `search_id` and `stats` (the SearchStats of the search). A search
+    that is cancelled posts nothing.
+
+    While the human thinks, ponder() uses the idle thread to search ahead: it
+    finds the hint for the human, then the AI's reply to the move the hint
+    expects the human to play, and then keeps improving the hint.
+    """
+
+    def __init__(self):
+        self._thread = None
+        self._control = None
+        self._search_id = 0
+        self._ponder_hint = None
+        self._pondered_reply = None
+
+    def submit(self, event_type, board, player, table=None, time_limit=None, node_limit=None, max_depth=MAX_SEARCH_DEPTH):
+        """
+        Starts searching a position in the background, cancelling any search still running.
+        :param event_type: The pygame event type to post the result with.
+        :param board: The Board to search. It is copied before this returns, so it can change afterwards.
+        :param player: The player to find a move for.
+        :param table: Optional TranspositionTable. Only one search runs at a time, so it is never shared between threads.
+        :param time_limit: Seconds the search may take, or None.
+        :param node_limit: Number of nodes the search may visit, or None.
+        :param max_depth: Deepest iteration to run.
+        :return: The id of the search, also set as `search_id` on the result event.
+        """
+        position = board.to_bitboard()
+        position.set_player(player)
+        control = SearchControl(time_limit, node_limit)
+        return self._start(self._run, event_type, position, table, control, max_depth)
+
+    def ponder(self, board, table=None, reply_node_limit=None, reply_time_limit=None):
+        """
+        Starts pondering the position of the side to move on board, cancelling any search still running.
+        The hint is posted as a HINT_READY_EVENT once it is HINT_DEPTH deep, and is available from
+        ponder_hint() from then on. Pondering runs until it is cancelled.
+        :param board: The Board to ponder. It is copied before this returns.
+        :param table: Optional TranspositionTable; the AI search later finds the pondered results in it.
+        :param reply_node_limit: Node budget of the AI's reply search, normally that of the difficulty level.
+        :param reply_time_limit: Seconds the AI's reply search may take, normally those of the difficulty level.
+        :return: The id of the search.
+        """
+        position = board.to_bitboard()
+        return self._start(self._ponder, HINT_READY_EVENT, position, table, SearchControl(), reply_node_limit,
+                           reply_time_limit)
+
+    def ponder_hint(self):
+        # The best move found so far for the pondered side, or None
+        return self._ponder_hint
+
+    def pondered_reply(self, board):
+        """
+        Stops pondering and returns the AI's reply if the human played the move the ponder expected.
+        :param board: The Board after the human's move, with the AI to move.
+        :return: The reply as a move tuple like those of GameState.legal_moves, or None.
+        """
+        self.cancel()
+        pondered = self._pondered_reply
+        self._pondered_reply = None
+        if pondered is not None and pondered[0] == board.to_bitboard().key():
+            return pondered[1]
+        return None
+
+    def _start(self, target, event_type, position, table, control, *args):
+        self.cancel()
+        self._ponder_hint = None
+        self._pondered_reply = None
+        self._search_id += 1
+        self._control = control
+        self._thread = threading.Thread(
+            target=_search_thread,
+            args=(target, event_type, self._search_id, position, table, control) + args,
+            daemon=True,
+        )
+        self._thread.start()
+        return self._search_id
+
+    def _run(self, event_type, search_id, position, table, control, max_depth):
+        stats = SearchStats()
+        move, depth = iterative_deepening(position, table=table, max_depth=max_depth, control=control, stats=stats)
+        if move is not None:
+            move = position.move_to_rc(move)
+        if not control.stopped:
+            pygame.event.post(pygame.event.Event(event_type, move=move, depth=depth, search_id=search_id, stats=stats))
+
+    def _ponder(self, event_type, search_id, position, table, control, reply_node_limit, reply_time_limit):
+        # First the hint for the side to move, at the depth of a normal hint search
+        stats = SearchStats()
+        hint, depth = iterative_deepening(position, table=table, max_depth=HINT_DEPTH, control=control, stats=stats)
+        if control.stopped or hint is None:
+            return
+        self._ponder_hint = position.move_to_rc(hint)
+        pygame.event.post(pygame.event.Event(event_type, move=self._ponder_hint, depth=depth, search_id=search_id,
+                                             stats=stats))
+
+        # Then the AI's reply if the hint is what gets played, with the AI's usual budget
+        expected = position.apply(hint)
+        control.reset(reply_time_limit, reply_node_limit)
+        reply, depth = iterative_deepening(expected, table=table, control=control)
+        if control.stopped:
+            return
+        self._pondered_reply = (expected.key(), expected.move_to_rc(reply) if reply is not None else None)
+
+        # Then keep deepening the hint until the human moves
+        def improve_hint(depth, score, move, nodes):
+            self._ponder_hint = position.move_to_rc(move)
+        control.reset()
+        iterative_deepening(position, table=table, control=control, callback=improve_hint)
+
+    def busy(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def cancel(self):
+        # Stops the running search, if any, and waits for its thread to finish
+        if self._thread is not None:
+            self._control.stop()
+            self._thread.join()
+            self._thread = None
+            self._control = None
+
+    def close(self):
+        # Stops the running search; there is nothing else to shut down, unlike EngineClient.close()
+        self.cancel()
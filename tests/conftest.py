@@ -0,0 +1,54 @@
+# The game and its engine package are imported the way main.py imports them,
+# from the main_game_file directory.
+
+import os
+import random
+import sys
+import time
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'main_game_file'))
+
+from engine.bitboard import BitBoard, rc_to_square
+
+
+def position_from_rows(rows, player=1):
+    # A BitBoard from 8 strings with r/R for red men/kings, w/W for white men/kings and . for empty squares
+    masks = {'r': 0, 'R': 0, 'w': 0, 'W': 0}
+    for row, text in enumerate(rows):
+        for col, cell in enumerate(text):
+            if cell != '.':
+                masks[cell] |= 1 << rc_to_square(row, col)
+    return BitBoard(masks['r'], masks['R'], masks['w'], masks['W'], player)
+
+
+def random_game(seed, plies=200):
+    # The positions and moves of a game of random moves from the start position, until it ends or after plies
+    rng = random.Random(seed)
+    position = BitBoard.initial()
+    positions, moves = [], []
+    for _ in range(plies):
+        legal = position.legal_moves()
+        if not legal:
+            break
+        move = rng.choice(legal)
+        positions.append(position.copy())
+        moves.append(move)
+        position.make_move(move)
+    return positions, moves
+
+
+@pytest.fixture(params=range(10))
+def game(request):
+    return random_game(request.param)
+
+
+def wait_for_event(event_type, timeout=30):
+    # The next pygame event of event_type, e.g. the result of a background search
+    import pygame
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        for event in pygame.event.get(event_type):
+            return event
+        time.sleep(0.01)
+    raise AssertionError('no event %d in %d s' % (event_type, timeout))
@@ -0,0 +1,47 @@
+import pytest
+from conftest import position_from_rows
+from engine.arena import ArenaPlayer, elo, elo_estimate, parse_player, play_game, ratings, run_arena
+from engine.game_record import GameRecord, read_records
+
+
+def test_parse_player():
+    assert parse_player('5') == (None, 5)
+    path, level = parse_player('/tmp/other:3')
+    assert path.endswith('other') and level == 3
+
+
+def test_player_plays_the_searched_capture_sequence():
+    position = position_from_rows(
+        ['...r....', '........', '.W.w.w..', '..R.....', '...w.w..', '..w...r.', '........', '........'])
+    assert ArenaPlayer((None, 3)).move(position) == (13, 4, 395008)
+
+
+def test_game_is_recorded_and_replays():
+    record = GameRecord()
+    result, plies = play_game((None, 1), (None, 1), 7, max_plies=40, record=record)
+    assert result in (1, 0, -1) and record.result == result
+    # The opening moves are in the record too; replaying checks every move is legal
+    assert len(list(record.replay())) == len(record) <= 4 + 40
+
+
+def test_elo():
+    assert elo(0.5) == 0 and elo(0.75) == pytest.approx(190.8, abs=0.1) and elo(0.25) == pytest.approx(-elo(0.75))
+    difference, error = elo_estimate([1, 1, 0.5, 0])
+    assert difference > 0 and error > 0
+
+
+def test_ratings_order_the_players():
+    players = ['a', 'b', 'c']
+    results = {('a', 'b'): [0, 0.5], ('b', 'a'): [1, 0.5], ('b', 'c'): [1, 1], ('c', 'b'): [0, 0],
+               ('a', 'c'): [1, 0.5], ('c', 'a'): [0, 0.5]}
+    rating = ratings(players, results)
+    assert rating['a'] == 0 and rating['b'] > rating['a'] > rating['c']
+
+
+def test_run_arena(tmp_path):
+    path = str(tmp_path / 'games.ckgr')
+    players = [(None, 1), (None, 2)]
+    results = run_arena(players, openings=1, workers=1, max_plies=20, record_path=path)
+    assert len(results[tuple(players)]) == 2
+    assert [a + b for a, b in zip(results[tuple(players)], results[tuple(players[::-1])])] == [1, 1]
+    assert len(list(read_records(path))) == 2
@@ -0,0 +1,33 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from engine.batch import PositionBatch, _byte_tables, check, random_positions
+from engine.bitboard import BitBoard
+from engine.evaluation import Evaluation
+
+
+def test_batch_matches_bitboard():
+    assert check(300, seed=3) == []
+
+
+def test_positions_round_trip():
+    batch = random_positions(50, seed=5)
+    assert PositionBatch.from_positions(batch.positions()).positions() == batch.positions()
+    assert batch[np.arange(len(batch)) % 2 == 0].positions() == batch.positions()[::2]
+
+
+def test_evaluate_with_other_weights():
+    batch = random_positions(100, seed=7)
+    evaluation = Evaluation(man=90, king=200, mobility=0)
+    expected = [BitBoard(p.red_men, p.red_kings, p.white_men, p.white_kings, p.player, evaluation).evaluate()
+                for p in batch.positions()]
+    assert list(batch.evaluate(evaluation)) == expected
+    # The tables are built once per Evaluation
+    assert _byte_tables(evaluation) is _byte_tables(evaluation)
+
+
+def test_children_of_the_start_position():
+    children, parents = PositionBatch.from_positions([BitBoard.initial()] * 3).children()
+    assert len(children) == 3 * 7 and list(parents) == [0] * 7 + [1] * 7 + [2] * 7
+    assert children.positions()[:7] == [BitBoard.initial().apply(move) for move in BitBoard.initial().legal_moves()]
@@ -0,0 +1,34 @@
+import copy
+import json
+import pytest
+from engine.benchmark import MIN_COMPARE_TIME, benchmark_positions, compare, run_benchmark
+
+
+@pytest.fixture(scope='module')
+def results():
+    return run_benchmark(levels=[1], depths=(2,), measure_memory=False)
+
+
+def test_results_cover_every_position(results):
+    assert json.loads(json.dumps(results)) == results
+    assert set(results['summary']) == {'level-1', 'depth-2'}
+    assert len(results['results']) == 2 * len(benchmark_positions())
+    # Positions with a single legal move are not searched
+    assert all(record['move'] for record in results['results'])
+    assert all(entry['nodes'] > 0 for entry in results['summary'].values())
+
+
+def test_compare_flags_slowdowns(results):
+    # Slowdowns of short runs are noise
+    slower = copy.deepcopy(results)
+    for entry in slower['summary'].values():
+        entry['nodes_per_second'] //= 2
+    assert not any(regression for message, regression in compare(results, slower))
+    longer = copy.deepcopy(results)
+    for entry in longer['summary'].values():
+        entry['time'] = MIN_COMPARE_TIME
+    slower = copy.deepcopy(longer)
+    for entry in slower['summary'].values():
+        entry['nodes_per_second'] //= 2
+    assert not any(regression for message, regression in compare(longer, longer))
+    assert [regression for message, regression in compare(longer, slower)] == [True, True]
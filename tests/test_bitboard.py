@@ -0,0 +1,89 @@
+from conftest import position_from_rows
+from engine.bitboard import BitBoard
+from engine.state import GameState, create_checkerboard_array
+
+CAPTURES = ['...r....', '........', '.W.w.w..', '..R.....', '...w.w..', '..w...r.', '........', '........']
+
+
+def test_initial_position_matches_the_grid():
+    position = GameState(create_checkerboard_array()).to_bitboard()
+    assert position == BitBoard.initial()
+    assert position.hash == BitBoard.initial().hash
+    assert position.count(1) == position.count(-1) == 12
+
+
+def test_legal_moves_match_the_grid(game):
+    state = GameState(create_checkerboard_array())
+    for position in game[0][::5]:
+        state.load_bitboard(position)
+        assert sorted(position.move_to_rc(move)[:4] for move in position.legal_moves()) == \
+            sorted(tuple(move[:4]) for move in state.legal_moves(position.player))
+
+
+def test_apply_leaves_position_untouched():
+    position = BitBoard.initial()
+    move = position.legal_moves()[0]
+    child = position.apply(move)
+    assert position == BitBoard.initial()
+    assert child.player == -1 and child != position
+
+
+def test_move_rc_round_trip(game):
+    for position, move in zip(*game):
+        assert position.move_from_rc(position.move_to_rc(move)) == move
+
+
+def test_make_unmake_round_trip(game):
+    positions, moves = game
+    position = BitBoard.initial()
+    undos = []
+    for before, move in zip(positions, moves):
+        assert position.key() == before.key()
+        undos.append((position.copy(), position.make_move(move)))
+        # The hash and score kept up to date by make_move match those computed from scratch
+        assert position.hash == position.compute_hash()
+        assert position.score == position.evaluation.score(position)
+    for before, undo in reversed(undos):
+        position.unmake_move(undo)
+        assert position.key() == before.key()
+        assert position.hash == before.hash
+        assert position.score == before.score
+
+
+def test_unmake_restores_every_move():
+    for position in (BitBoard.initial(), position_from_rows(CAPTURES)):
+        for move in position.legal_moves():
+            copy = position.copy()
+            copy.unmake_move(copy.make_move(move))
+            assert copy.key() == position.key() and copy.hash == position.hash and copy.score == position.score
+
+
+def test_grid_make_unmake_round_trip(game):
+    state = GameState(create_checkerboard_array())
+    for position in game[0][::5]:
+        state.load_bitboard(position)
+        for move in state.legal_moves():
+            undo = state.make_move(move)
+            state.unmake_move(undo)
+            assert state.to_bitboard() == position
+
+
+def test_capture_sequences_are_single_moves():
+    position = position_from_rows(CAPTURES)
+    # Two capture sequences join the same squares; a man that captures the king is crowned
+    assert sorted(position.legal_moves()) == [(13, 4, 256), (13, 4, 395008)]
+    assert position.move_to_rc((13, 4, 395008)) == (3, 2, 1, 0, ((1, 4), (3, 6), (5, 4), (3, 2), (1, 0)))
+    child = position.apply((13, 4, 395008))
+    assert child.count(-1) == 1 and child.red_kings >> 4 & 1
+
+
+def test_capture_path_is_the_one_played():
+    position = position_from_rows(CAPTURES)
+    for move in position.legal_moves():
+        state = GameState(create_checkerboard_array())
+        state.load_bitboard(position)
+        valid, _, _, next_player, _ = state.play_ai_move(position.move_to_rc(move), 1)
+        assert valid
+        state.current_player = next_player
+        assert state.to_bitboard() == position.apply(move)
+        assert state.count(-1) == position.apply(move).count(-1)
@@ -0,0 +1,67 @@
+import pytest
+from conftest import position_from_rows
+from engine.algorithm import WIN_BOUND, _from_table, _to_table, minimax_alpha_beta
+from engine.bitboard import BitBoard
+from engine.endgame_tables import EndgameTables, DRAW, LOSS, WIN, WIN_SCORE, _turn
+
+tables = EndgameTables.default()
+needs_tables = pytest.mark.skipif(tables is None, reason='the endgame tables are not built')
+
+# Two red kings against a white king: red to move wins
+KINGS = ['........', '........', '...R....', '........', '...R....', '........', '........', '......W.']
+# Red to move has no move and has lost (see test_search.py)
+BLOCKED = ['........', '........', '........', '........', '........', '....w...', '.r......', 'w.w.....']
+
+
+def turned(position):
+    # The same position with the board turned round, the colours swapped and the other side to move
+    return BitBoard(_turn(position.white_men), _turn(position.white_kings), _turn(position.red_men),
+                    _turn(position.red_kings), -position.player)
+
+
+def test_turn_maps_square_to_its_opposite():
+    for sq in range(32):
+        assert _turn(1 << sq) == 1 << (31 - sq)
+    assert _turn(_turn(0x12345678)) == 0x12345678
+
+
+@needs_tables
+def test_colours_are_symmetric(game):
+    for position in game[0]:
+        entry = tables.probe(position)
+        assert entry == tables.probe(turned(position))
+        if entry is not None:
+            assert tables.score(position) == -tables.score(turned(position))
+
+
+@needs_tables
+def test_four_pieces_are_covered():
+    assert tables.max_pieces >= 4
+    result, distance = tables.probe(position_from_rows(BLOCKED))
+    assert (result, distance) == (LOSS, 0)
+    position = position_from_rows(['........', '...w....', '........', '..R.....', '........', '..r.....', '........',
+                                   '...W....'])
+    assert tables.probe(position)[0] in (WIN, LOSS, DRAW)
+
+
+@needs_tables
+def test_faster_wins_score_higher():
+    position = position_from_rows(KINGS)
+    result, distance = tables.probe(position)
+    assert result == WIN and distance % 2 == 1
+    assert tables.score(position) == WIN_SCORE - distance
+    assert tables.score(position, 4) == WIN_SCORE - 4 - distance
+    # White to move loses too, and scores are from red's point of view
+    assert tables.score(position_from_rows(KINGS, -1), 4) > WIN_BOUND
+
+
+def test_loss_without_moves_is_scored_by_ply():
+    position = position_from_rows(BLOCKED)
+    assert minimax_alpha_beta(position, 3, -float('inf'), float('inf'), True, ply=5) == -(WIN_SCORE - 5)
+
+
+def test_table_scores_are_counted_from_the_position():
+    for score in (WIN_SCORE - 7, -(WIN_SCORE - 7), 120, -35, 0):
+        assert _from_table(_to_table(score, 5), 5) == score
+    # A win 7 plies from the root found 5 plies deep is 2 plies from the position, wherever it is reached
+    assert _from_table(_to_table(WIN_SCORE - 7, 5), 1) == WIN_SCORE - 3
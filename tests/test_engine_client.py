@@ -0,0 +1,107 @@
+import os
+import time
+import pytest
+
+pygame = pytest.importorskip('pygame')
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+from conftest import wait_for_event
+from engine.state import GameState, create_checkerboard_array
+from engine_client import EngineClient
+from search_executor import AI_MOVE_EVENT, HINT_READY_EVENT
+
+
+@pytest.fixture(scope='module', autouse=True)
+def display():
+    pygame.display.init()
+    yield
+    pygame.display.quit()
+
+
+@pytest.fixture(scope='module')
+def client():
+    client = EngineClient()
+    yield client
+    client.close()
+
+
+@pytest.fixture(autouse=True)
+def clear_events(client):
+    pygame.event.clear()
+    yield
+    client.cancel()
+
+
+def legal(state, move):
+    return tuple(move[:4]) in [tuple(legal[:4]) for legal in state.legal_moves()]
+
+
+def test_search_in_the_engine(client):
+    state = GameState(create_checkerboard_array())
+    search_id = client.submit(AI_MOVE_EVENT, state, 1, node_limit=2000)
+    event = wait_for_event(AI_MOVE_EVENT)
+    assert event.search_id == search_id and legal(state, event.move) and event.stats.nodes > 0
+
+
+def ponder_and_play(client, state, hit):
+    # Ponders state, then plays the hint when hit or another move otherwise, as the human
+    client.ponder(state, reply_node_limit=2000, reply_time_limit=5)
+    hint = wait_for_event(HINT_READY_EVENT).move
+    move = hint if hit else next(move for move in state.legal_moves() if tuple(move[:4]) != tuple(hint[:4]))
+    state.play_ai_move(move, state.current_player)
+    state.current_player = -state.current_player
+
+
+def test_ponder_hit_becomes_the_next_search(client):
+    state = GameState(create_checkerboard_array())
+    ponder_and_play(client, state, True)
+    # Let the ponder search finish; its move is only posted once a submit() takes it over
+    time.sleep(0.5)
+    assert client.pondered_reply(state) is None
+    assert client._ponder_hit and not pygame.event.get(AI_MOVE_EVENT)
+    search_id = client.submit(AI_MOVE_EVENT, state, state.current_player, node_limit=2000)
+    event = wait_for_event(AI_MOVE_EVENT, 10)
+    assert event.search_id == search_id and legal(state, event.move)
+
+
+def test_ponder_miss_stops_the_search(client):
+    state = GameState(create_checkerboard_array())
+    ponder_and_play(client, state, False)
+    client.pondered_reply(state)
+    assert not client.busy()
+    search_id = client.submit(AI_MOVE_EVENT, state, state.current_player, node_limit=2000)
+    event = wait_for_event(AI_MOVE_EVENT)
+    assert event.search_id == search_id and legal(state, event.move)
+
+
+def test_engine_is_restarted_when_it_dies(client):
+    client._process.kill()
+    client._process.wait()
+    state = GameState(create_checkerboard_array())
+    client.submit(AI_MOVE_EVENT, state, 1, node_limit=2000)
+    assert legal(state, wait_for_event(AI_MOVE_EVENT).move)
+    assert client._process.poll() is None
+
+
+def test_engine_that_cannot_start():
+    with pytest.raises((OSError, EOFError)):
+        EngineClient(['false'])
+
+
+def test_engine_that_fails_for_good_is_replaced_once(capsys):
+    client = EngineClient()
+    try:
+        client.command = ['false']
+        client._process.kill()
+        client._process.wait()
+        state = GameState(create_checkerboard_array())
+        client.submit(AI_MOVE_EVENT, state, 1, node_limit=2000)
+        assert legal(state, wait_for_event(AI_MOVE_EVENT).move)
+        assert capsys.readouterr().out.startswith('Could not start the engine')
+        # Later searches go to a SearchExecutor without trying the engine again
+        search_id = client.submit(AI_MOVE_EVENT, state, 1, node_limit=2000)
+        event = wait_for_event(AI_MOVE_EVENT)
+        assert event.search_id == search_id and legal(state, event.move)
+        assert client._fallback is not None and capsys.readouterr().out == ''
+    finally:
+        client.close()
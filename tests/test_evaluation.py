@@ -0,0 +1,36 @@
+from engine.algorithm import generate_best_move, iterative_deepening
+from engine.bitboard import BitBoard
+from engine.evaluation import DEFAULT_EVALUATION, Evaluation
+from engine.state import GameState, create_checkerboard_array
+from engine.transposition import TranspositionTable
+
+
+def test_incremental_score_matches_a_full_count(game):
+    for position, move in zip(*game):
+        child = position.apply(move)
+        assert child.score == DEFAULT_EVALUATION.score(child)
+
+
+def test_fractional_weights_are_rounded():
+    evaluation = Evaluation(man=99.6, king=150.4, centre=2.5, mobility=1.7)
+    assert all(type(value) is int for table in evaluation.tables for value in table)
+    assert evaluation.tables[0][0] == 106 and evaluation.mobility == 2
+    # Scores of the evaluation can be stored in the transposition table
+    move = generate_best_move(BitBoard.initial(), 3, table=TranspositionTable(1), evaluation=evaluation)
+    assert move in BitBoard.initial().legal_moves()
+
+
+def test_search_uses_the_evaluation_given():
+    # Pieces worth nothing: every position near the start scores 0, so the search keeps the first move
+    flat = Evaluation(man=0, king=0, advancement=(0,) * 8, centre=0, king_centre=0, back_rank=0, mobility=0)
+    scores = []
+    state = GameState(create_checkerboard_array())
+    move, depth = iterative_deepening(state, max_depth=3, evaluation=flat,
+                                      callback=lambda depth, score, move, nodes: scores.append(score))
+    assert scores == [0, 0, 0] and move == BitBoard.initial().legal_moves()[0]
+    position = BitBoard.initial()
+    assert generate_best_move(position, 4, evaluation=flat) == position.legal_moves()[0]
+    assert position.evaluation is DEFAULT_EVALUATION
+    scores = []
+    iterative_deepening(state, max_depth=3, callback=lambda depth, score, move, nodes: scores.append(score))
+    assert scores != [0, 0, 0]
@@ -0,0 +1,106 @@
+import pytest
+from conftest import position_from_rows, random_game
+from engine.bitboard import BitBoard
+from engine.game_record import (
+    MAX_TAG_KEY, MAX_TAG_VALUE, GameRecord, GameRecordWriter, PdnWriter, encode_record, fen, jump_path,
+    parse_pdn, parse_pdn_move, pdn, pdn_move, position_from_fen, read_pdn, read_records,
+)
+
+CAPTURES = ['...r....', '........', '.W.w.w..', '..R.....', '...w.w..', '..w...r.', '........', '........']
+
+
+def record_of(game, result=None):
+    positions, moves = game
+    return GameRecord(moves=moves, times=[ply * 37 if ply % 3 else None for ply in range(len(moves))],
+                      result=result, tags={'Event': 'test "game"', 'Black': 'level 5'})
+
+
+def test_pdn_round_trip(game):
+    record = record_of(game, 1)
+    read = parse_pdn(pdn(record))
+    assert read.moves == record.moves
+    assert read.times == record.times
+    assert read.result == 1
+    # Double quotes cannot be written in a tag value
+    assert read.tags == {'Event': "test 'game'", 'Black': 'level 5'}
+
+
+def test_pdn_round_trip_from_a_fen():
+    start = position_from_rows(CAPTURES, -1)
+    move = start.legal_moves()[0]
+    record = GameRecord(start, [move])
+    text = pdn(record)
+    assert '[FEN "%s"]' % fen(start) in text and '1...' in text
+    read = parse_pdn(text)
+    assert read.start == start and read.moves == [move] and read.result is None
+
+
+def test_archive_round_trip(tmp_path, game):
+    path = str(tmp_path / 'games.ckgr')
+    records = [record_of(game, None), record_of(random_game(99), -1)]
+    with GameRecordWriter(path) as writer:
+        writer.write(records[0])
+    with GameRecordWriter(path, append=True) as writer:
+        writer.write(records[1])
+    read = list(read_records(path))
+    assert [(r.start, r.moves, r.times, r.result, r.tags) for r in read] == \
+        [(r.start, r.moves, r.times, r.result, r.tags) for r in records]
+    assert [r.moves for r in read_records(path, moves=False)] == [[], []]
+
+
+def test_read_pdn_file(tmp_path):
+    path = str(tmp_path / 'games.pdn')
+    records = [record_of(random_game(seed)) for seed in range(3)]
+    with PdnWriter(path) as writer:
+        for record in records:
+            writer.write(record)
+    assert [r.moves for r in read_pdn(path)] == [r.moves for r in records]
+
+
+def test_tags_too_long_for_the_archive():
+    encode_record(GameRecord(tags={'k' * MAX_TAG_KEY: 'v' * MAX_TAG_VALUE}))
+    with pytest.raises(ValueError):
+        encode_record(GameRecord(tags={'k' * (MAX_TAG_KEY + 1): 'v'}))
+    with pytest.raises(ValueError):
+        encode_record(GameRecord(tags={'k': 'v' * (MAX_TAG_VALUE + 1)}))
+
+
+def test_illegal_move_is_reported():
+    record = GameRecord(moves=[(0, 4, 0)])
+    with pytest.raises(ValueError):
+        pdn(record)
+    with pytest.raises(ValueError):
+        parse_pdn('1. 1-5 *')
+
+
+def test_pdn_moves():
+    position = position_from_rows(CAPTURES)
+    short, long = sorted(position.legal_moves(), key=lambda move: bin(move[2]).count('1'))
+    assert pdn_move(short, position) == '14x5'
+    assert pdn_move(long, position) == '14x7x16x23x14x5'
+    # A capture given by its ends only stands for the first sequence joining them
+    assert parse_pdn_move('14x7x16x23x14x5', position) == long
+    assert parse_pdn_move('14x5', position) == short
+    assert parse_pdn_move('11-15', BitBoard.initial()) == (10, 14, 0)
+    for text in ('1-5', '40-44', '0-4', '9x0', '15', '11-x'):
+        with pytest.raises(ValueError):
+            parse_pdn_move(text, BitBoard.initial())
+
+
+def test_jump_path_needs_a_sequence_of_jumps():
+    position = position_from_rows(CAPTURES)
+    move = max(position.legal_moves(), key=lambda move: move[2])
+    assert jump_path(move) == jump_path(move, position) == [6, 15, 22, 13, 4]
+    with pytest.raises(ValueError):
+        jump_path((13, 4, 1 << 31))
+    with pytest.raises(ValueError):
+        # With a piece on square 23 the sequence cannot land there
+        jump_path(move, position_from_rows(CAPTURES[:5] + ['..w.r.r.'] + CAPTURES[6:]))
+
+
+def test_fen_round_trip(game):
+    for position in game[0][::7]:
+        assert position_from_fen(fen(position)) == position
+    assert position_from_fen('B:W21-32:B1-12') == BitBoard.initial()
+    with pytest.raises(ValueError):
+        position_from_fen('X:W21:B1')
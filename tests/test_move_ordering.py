@@ -0,0 +1,34 @@
+from conftest import position_from_rows
+from engine.bitboard import BitBoard
+from engine.move_ordering import KILLER_SLOTS, MoveOrdering
+
+
+def test_table_move_then_captures_first():
+    position = position_from_rows(
+        ['...r....', '........', '.W.w.w..', '..R.....', '...w.w..', '..w...r.', '........', '........'])
+    moves = position.legal_moves()
+    ordering = MoveOrdering()
+    # Capturing a king comes before capturing men only
+    assert ordering.order(position, list(moves), 0)[0][2] & position.white_kings
+    assert ordering.order(position, list(moves), 0, tt_move=moves[0])[0] == moves[0]
+
+
+def test_killers_and_history():
+    position = BitBoard.initial()
+    moves = position.legal_moves()
+    ordering = MoveOrdering()
+    ordering.record_cutoff(position, moves[-1], 3, 4)
+    assert ordering.order(position, list(moves), 3)[0] == moves[-1]
+    # Killers only count at their ply; elsewhere the history score sorts the move first
+    assert ordering.order(position, list(moves), 1)[0] == moves[-1]
+    for move in moves[:KILLER_SLOTS + 1]:
+        ordering.record_cutoff(position, move, 3, 1)
+    assert len(ordering.killers[3]) == KILLER_SLOTS
+
+
+def test_history_is_kept_per_player():
+    position = BitBoard.initial()
+    move = position.legal_moves()[-1]
+    ordering = MoveOrdering()
+    ordering.record_cutoff(position, move, 0, 3)
+    assert ordering.history[0][move[0] << 5 | move[1]] == 9 and not any(ordering.history[1])
@@ -0,0 +1,41 @@
+import pytest
+from engine.bitboard import BitBoard
+from engine.opening_book import BOOK_MIN_LEVEL, OpeningBook, build_book
+from engine.state import GameState, create_checkerboard_array
+
+
+@pytest.fixture(scope='module')
+def book(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('book') / 'book.bin')
+    # The start position and the replies to its book move, except those that leave a single move
+    assert 1 < build_book(path, plies=4, depth=2) <= 1 + 7
+    book = OpeningBook(path)
+    yield book
+    book.close()
+
+
+def test_every_position_of_the_book_has_a_legal_move(book):
+    position = BitBoard.initial()
+    move = book.lookup(position)
+    assert move in position.legal_moves()
+    for reply in position.apply(move).legal_moves():
+        child = position.apply(move).apply(reply)
+        if len(child.legal_moves()) > 1:
+            assert book.lookup(child) in child.legal_moves()
+    # The book only plays for red
+    assert book.lookup(position.apply(move)) is None
+
+
+def test_missing_or_foreign_file_is_no_book(tmp_path):
+    assert OpeningBook.load(str(tmp_path / 'missing.bin')) is None
+    path = tmp_path / 'other.bin'
+    path.write_bytes(b'CKGR' + bytes(16))
+    assert OpeningBook.load(str(path)) is None
+
+
+def test_book_is_used_from_its_level_on():
+    state = GameState(create_checkerboard_array())
+    assert state.book_move(1, BOOK_MIN_LEVEL - 1) is None
+    if OpeningBook.default() is not None:
+        move = state.book_move(1, BOOK_MIN_LEVEL)
+        assert tuple(move[:4]) in [tuple(legal[:4]) for legal in state.legal_moves(1)]
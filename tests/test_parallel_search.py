@@ -0,0 +1,31 @@
+from conftest import position_from_rows
+from engine.algorithm import SearchControl, generate_best_move, iterative_deepening
+from engine.bitboard import BitBoard
+from engine.evaluation import Evaluation
+from engine.parallel_search import parallel_search_root
+
+CAPTURES = ['...r....', '........', '.W.w.w..', '..R.....', '...w.w..', '..w...r.', '........', '........']
+
+
+def test_same_move_as_the_serial_search(game):
+    for position in game[0][10:40:10]:
+        if position.legal_moves():
+            assert generate_best_move(position, 3, workers=2) == generate_best_move(position, 3)
+
+
+def test_budget_stops_the_workers():
+    control = SearchControl(node_limit=3000)
+    move, depth = iterative_deepening(BitBoard.initial(), control=control, workers=2)
+    assert move in BitBoard.initial().legal_moves() and depth >= 1
+
+
+def test_capture_sequence_at_the_root():
+    position = position_from_rows(CAPTURES)
+    score, move = parallel_search_root(2, position, 3)
+    assert move == (13, 4, 395008) and score > position.evaluate()
+
+
+def test_workers_use_the_evaluation_given():
+    flat = Evaluation(man=0, king=0, advancement=(0,) * 8, centre=0, king_centre=0, back_rank=0, mobility=0)
+    position = BitBoard.initial()
+    assert generate_best_move(position, 3, workers=2, evaluation=flat) == position.legal_moves()[0]
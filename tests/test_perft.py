@@ -0,0 +1,23 @@
+import pytest
+from engine.perft import REFERENCE_COUNTS, PerftCounter, perft, start_position
+
+
+@pytest.mark.parametrize('depth', range(1, 7))
+def test_reference_counts(depth):
+    assert perft(start_position(), depth)[0] == REFERENCE_COUNTS[depth - 1]
+
+
+def test_grid_rules_match_reference_counts():
+    assert perft(start_position(grid=True), 4)[0] == REFERENCE_COUNTS[3]
+
+
+def test_generators_agree_move_by_move():
+    bitboard = PerftCounter(start_position()).divide(4)
+    assert bitboard == PerftCounter(start_position(grid=True)).divide(4)
+    assert sum(nodes for move, nodes in bitboard) == REFERENCE_COUNTS[3]
+
+
+def test_position_is_restored():
+    position = start_position()
+    nodes, generated, seconds = perft(position, 3)
+    assert position == start_position() and generated >= nodes
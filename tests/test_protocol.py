@@ -0,0 +1,96 @@
+import io
+import time
+from conftest import position_from_rows
+from engine.bitboard import BitBoard
+from engine.game_record import fen, parse_pdn_move
+from engine.protocol import ENGINE_NAME, EngineServer
+
+
+def serve(*lines, own_book=False):
+    # An EngineServer that has handled lines, with the book off unless own_book
+    server = EngineServer(io.StringIO())
+    server.own_book = own_book
+    for line in lines:
+        server.handle(line)
+    return server
+
+
+def answers(server):
+    return server.output.getvalue().splitlines()
+
+
+def best_move(server):
+    # The move of the bestmove answer, once the search has ended
+    server.stop()
+    return [line.split()[1] for line in answers(server) if line.startswith('bestmove')][-1]
+
+
+def test_uci_handshake():
+    server = serve('uci', 'isready')
+    assert answers(server) == ['id name %s' % ENGINE_NAME, 'option name OwnBook type check default true',
+                               'uciok', 'readyok']
+    assert not serve('quit').handle('quit')
+
+
+def test_position_with_moves():
+    server = serve('position startpos moves 11-15 22-18 15x22')
+    expected = BitBoard.initial()
+    for text in ('11-15', '22-18', '15x22'):
+        expected.make_move(parse_pdn_move(text, expected))
+    assert server.position == expected
+    position = position_from_rows(
+        ['...r....', '........', '.W.w.w..', '..R.....', '...w.w..', '..w...r.', '........', '........'])
+    assert serve('position fen %s' % fen(position)).position == position
+
+
+def test_bad_commands_are_reported():
+    server = serve('position startpos moves 1-5', 'position startpos moves 40-44', 'position fen X:1', 'position', 'go depth', 'go fast',
+                   'setoption name Hash value 16', 'setoption OwnBook', 'fly')
+    lines = answers(server)
+    assert len(lines) == 9 and all(line.startswith('info string') for line in lines)
+    assert server.position == BitBoard.initial() and server.thread is None
+
+
+def test_go_depth():
+    server = serve('position startpos', 'go depth 3')
+    move = best_move(server)
+    assert parse_pdn_move(move, BitBoard.initial()) in BitBoard.initial().legal_moves()
+    infos = [line.split() for line in answers(server) if line.startswith('info depth')]
+    assert [int(words[2]) for words in infos] == [1, 2, 3]
+    assert infos[-1][-1] == move
+
+
+def test_capture_sequence_is_sent_in_full():
+    position = position_from_rows(
+        ['...r....', '........', '.W.w.w..', '..R.....', '...w.w..', '..w...r.', '........', '........'])
+    assert best_move(serve('position fen %s' % fen(position), 'go nodes 20000')) == '14x7x16x23x14x5'
+
+
+def test_own_book():
+    server = serve('setoption name OwnBook value true', 'position startpos', 'go depth 1')
+    assert server.own_book
+    if server.book is not None:
+        best_move(server)
+        assert 'info string book move' in answers(server)
+    server = serve('setoption name OwnBook value true', 'setoption name OwnBook value false', 'go depth 1')
+    best_move(server)
+    assert 'info string book move' not in answers(server)
+
+
+def test_ponder_waits_for_ponderhit():
+    server = serve('position startpos', 'go ponder depth 2')
+    deadline = time.monotonic() + 30
+    while not any(line.startswith('info depth 2') for line in answers(server)) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    # The search has ended, but its move waits for ponderhit
+    time.sleep(0.1)
+    assert server.thread.is_alive() and not any(line.startswith('bestmove') for line in answers(server))
+    server.handle('ponderhit')
+    server.thread.join()
+    assert best_move(server)
+
+
+def test_stop_sends_the_best_move_so_far():
+    server = serve('position startpos', 'go infinite')
+    move = best_move(server)
+    assert parse_pdn_move(move, BitBoard.initial()) in BitBoard.initial().legal_moves()
@@ -0,0 +1,86 @@
+import time
+from conftest import position_from_rows
+from engine.algorithm import (
+    SearchControl, SearchStats, generate_best_move, iterative_deepening, minimax_alpha_beta, quiescence,
+)
+from engine.bitboard import BitBoard
+from engine.transposition import TranspositionTable
+
+CAPTURES = ['...r....', '........', '.W.w.w..', '..R.....', '...w.w..', '..w...r.', '........', '........']
+# Red's man is hemmed in on the last row but one and white has a man to spare, so red to move has no
+# move and has lost
+BLOCKED = ['........', '........', '........', '........', '........', '....w...', '.r......', 'w.w.....']
+
+
+def test_returns_a_legal_move_within_the_node_budget():
+    position = BitBoard.initial()
+    control = SearchControl(node_limit=2000)
+    move, depth = iterative_deepening(position, table=TranspositionTable(1), control=control)
+    assert move in position.legal_moves() and depth >= 1
+    # The iteration that ran out of nodes is abandoned straight away
+    assert control.nodes <= 2001
+    assert position == BitBoard.initial()
+
+
+def test_stops_at_the_time_limit():
+    start = time.perf_counter()
+    move, depth = iterative_deepening(BitBoard.initial(), time_limit=0.2)
+    assert move is not None and depth >= 1
+    assert time.perf_counter() - start < 1.0
+
+
+def test_runs_every_depth_up_to_max_depth():
+    depths = []
+    move, depth = iterative_deepening(BitBoard.initial(), max_depth=4,
+                                      callback=lambda depth, score, move, nodes: depths.append(depth))
+    assert depths == [1, 2, 3, 4] and depth == 4
+    assert move in BitBoard.initial().legal_moves()
+
+
+def test_stopped_search_returns_no_move():
+    control = SearchControl()
+    control.stop()
+    assert iterative_deepening(BitBoard.initial(), control=control) == (None, 0)
+
+
+def test_stats_count_the_search():
+    stats = SearchStats()
+    move, depth = iterative_deepening(BitBoard.initial(), max_depth=5, stats=stats)
+    assert [entry[0] for entry in stats.depths] == [1, 2, 3, 4, 5]
+    assert stats.nodes == sum(entry[2] for entry in stats.depths)
+    assert 0 < stats.first_move_cutoffs <= stats.cutoffs and stats.leaf_evaluations > 0
+    assert stats.max_ply >= 5 and stats.branching_factor() > 1
+    assert stats.as_dict()['depths'][-1]['depth'] == 5 and 'depth 5' in stats.summary()
+
+
+def test_stats_are_the_same_with_and_without_counting():
+    # Collecting statistics does not change the search
+    assert iterative_deepening(BitBoard.initial(), max_depth=4, stats=SearchStats()) == \
+        iterative_deepening(BitBoard.initial(), max_depth=4)
+
+
+def test_side_without_moves_is_game_over(game):
+    for position in game[0] + [position_from_rows(BLOCKED)]:
+        assert position.has_moves() == bool(position.legal_moves())
+    position = position_from_rows(BLOCKED)
+    assert position.count(1) and position.is_game_over()
+    assert iterative_deepening(position) == (None, 0)
+    assert generate_best_move(position, 3) is None
+
+
+def test_horizon_captures_are_searched_to_a_quiet_position():
+    position = position_from_rows(CAPTURES)
+    stats = SearchStats()
+    score = minimax_alpha_beta(position.copy(), 0, -float('inf'), float('inf'), True, stats=stats)
+    assert stats.quiescence_nodes > 0
+    assert score == quiescence(position.copy(), -float('inf'), float('inf'), True)
+    # Red takes five pieces, a king among them, and stands far better than before the capture
+    assert score > position.evaluate() + 400
+    quiet = BitBoard.initial()
+    assert minimax_alpha_beta(quiet, 0, -float('inf'), float('inf'), True) == quiet.evaluate()
+
+
+def test_search_returns_the_whole_capture_sequence():
+    position = position_from_rows(CAPTURES)
+    move, depth = iterative_deepening(position, node_limit=20000)
+    assert move == (13, 4, 395008) and depth > 0
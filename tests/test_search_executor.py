@@ -0,0 +1,81 @@
+import os
+import sys
+import time
+import pytest
+
+pygame = pytest.importorskip('pygame')
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+from conftest import wait_for_event
+from engine.state import GameState, create_checkerboard_array
+from search_executor import AI_MOVE_EVENT, HINT_READY_EVENT, SearchExecutor, search_switch_interval
+
+
+@pytest.fixture(scope='module', autouse=True)
+def display():
+    # Events are posted to the queue of a display
+    pygame.display.init()
+    yield
+    pygame.display.quit()
+
+
+@pytest.fixture
+def executor():
+    executor = SearchExecutor()
+    pygame.event.clear()
+    yield executor
+    executor.cancel()
+
+
+def test_result_is_posted_as_an_event(executor):
+    state = GameState(create_checkerboard_array())
+    search_id = executor.submit(AI_MOVE_EVENT, state, 1, node_limit=2000)
+    event = wait_for_event(AI_MOVE_EVENT)
+    assert event.search_id == search_id
+    assert tuple(event.move[:4]) in [tuple(move[:4]) for move in state.legal_moves(1)]
+    assert event.depth >= 1 and event.stats.nodes > 0
+
+
+def test_cancelled_search_posts_nothing(executor):
+    executor.submit(AI_MOVE_EVENT, GameState(create_checkerboard_array()), 1)
+    assert executor.busy()
+    executor.cancel()
+    assert not executor.busy() and not pygame.event.get(AI_MOVE_EVENT)
+
+
+
+def pondered(executor, state, hit):
+    # Ponders state, waits for the reply search, then plays the hint when hit or another move otherwise
+    executor.ponder(state, reply_node_limit=2000)
+    hint = wait_for_event(HINT_READY_EVENT).move
+    assert hint == executor.ponder_hint()
+    deadline = time.monotonic() + 30
+    while executor._pondered_reply is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    move = hint if hit else next(move for move in state.legal_moves() if tuple(move[:4]) != tuple(hint[:4]))
+    state.play_ai_move(move, state.current_player)
+    state.current_player = -state.current_player
+    return executor.pondered_reply(state)
+
+
+def test_ponder_reply_is_ready_after_the_expected_move(executor):
+    state = GameState(create_checkerboard_array())
+    reply = pondered(executor, state, True)
+    assert reply is not None
+    assert state.to_bitboard().move_from_rc(reply) in state.to_bitboard().legal_moves()
+    assert not executor.busy()
+
+
+def test_ponder_reply_is_dropped_after_another_move(executor):
+    state = GameState(create_checkerboard_array())
+    assert pondered(executor, state, False) is None
+    assert not executor.busy()
+
+
+def test_switch_interval_is_restored():
+    interval = sys.getswitchinterval()
+    with search_switch_interval():
+        with search_switch_interval():
+            assert sys.getswitchinterval() < interval
+        assert sys.getswitchinterval() < interval
+    assert sys.getswitchinterval() == interval
@@ -0,0 +1,46 @@
+from engine.bitboard import BitBoard
+from engine.state import GameState, create_checkerboard_array
+
+
+def counts(state):
+    return dict(state.men), dict(state.kings)
+
+
+def test_counts_follow_the_moves_played(game):
+    state = GameState(create_checkerboard_array())
+    for position, move in zip(*game):
+        valid, _, _, next_player, _ = state.play_ai_move(position.move_to_rc(move), position.player)
+        assert valid
+        state.current_player = next_player
+        child = position.apply(move)
+        assert state.to_bitboard() == child
+        assert state.count(1) == child.count(1) and state.count(-1) == child.count(-1)
+        kept = counts(state)
+        state.recount_pieces()
+        assert counts(state) == kept
+
+
+def test_counts_after_make_unmake_and_load(game):
+    state = GameState(create_checkerboard_array())
+    for position in game[0][::5]:
+        state.load_bitboard(position)
+        loaded = counts(state)
+        assert state.count(1) == position.count(1) and state.count(-1) == position.count(-1)
+        for move in state.legal_moves():
+            undo = state.make_move(move)
+            kept = counts(state)
+            state.recount_pieces()
+            assert counts(state) == kept
+            state.unmake_move(undo)
+            assert counts(state) == loaded
+    state.load_bitboard(BitBoard.initial())
+    assert state.count_pieces() == {1: 12, -1: 12}
+
+
+def test_side_to_move_and_lazy_table():
+    state = GameState(create_checkerboard_array(), -1)
+    assert state.current_player == -1 and state.to_bitboard().player == -1
+    # The transposition table is only allocated when a search asks for it
+    assert state._transposition_table is None
+    table = state.transposition_table
+    assert table is not None and state.transposition_table is table
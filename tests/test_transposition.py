@@ -0,0 +1,52 @@
+from engine.algorithm import generate_best_move
+from engine.bitboard import BitBoard
+from engine.transposition import EXACT, LOWER_BOUND, NO_MOVE, UPPER_BOUND, TranspositionTable, decode_move, encode_move
+
+
+def test_store_and_probe():
+    table = TranspositionTable(1)
+    position = BitBoard.initial()
+    move = position.legal_moves()[2]
+    assert table.probe(position.hash) is None
+    table.store(position.hash, 4, 37, EXACT, move)
+    depth, score, bound, code = table.probe(position.hash)
+    assert (depth, score, bound) == (4, 37, EXACT)
+    assert decode_move(code, position.legal_moves()) == move
+    assert table.hits == 1 and table.probes == 2
+
+
+def test_keeps_best_move_and_deepest_entry():
+    table = TranspositionTable(1)
+    key = BitBoard.initial().hash
+    move = BitBoard.initial().legal_moves()[0]
+    table.store(key, 6, 10, LOWER_BOUND, move)
+    # A store without a move keeps the move of the same position
+    table.store(key, 6, 12, UPPER_BOUND)
+    assert table.probe(key) == (6, 12, UPPER_BOUND, encode_move(move))
+    # A shallower result of another position in the bucket goes in the second entry
+    other = key + table.mask + 1
+    table.store(other, 2, 5, EXACT)
+    assert table.probe(key)[0] == 6
+    assert table.probe(other) == (2, 5, EXACT, NO_MOVE)
+
+
+def test_replaces_entries_of_earlier_searches():
+    table = TranspositionTable(1)
+    key = BitBoard.initial().hash
+    table.store(key, 8, 1, EXACT)
+    table.new_search()
+    other = key + table.mask + 1
+    table.store(other, 1, 2, EXACT)
+    assert table.probe(other) == (1, 2, EXACT, NO_MOVE)
+    table.clear()
+    assert table.probe(other) is None and table.usage() == 0
+
+
+def test_search_with_a_table_finds_the_same_move():
+    position = BitBoard.initial()
+    table = TranspositionTable(1)
+    assert generate_best_move(position, 4, table=table) == generate_best_move(position, 4)
+    assert table.stores and table.usage() > 0
+    # A second search starts from the results of the first
+    generate_best_move(position, 4, table=table)
+    assert table.hits